@@ -302,3 +302,96 @@ out:
  return -1;
 
 }
+
+
+/*-------------------------------------------------------------------------
+ * Function: H5ARRAYOread_readRanges
+ *
+ * Purpose: Read several ranges of the rows of an index array at once.
+ *
+ * Return: Success: 0, Failure: -1
+ *
+ * Comments:
+ *
+ *   - The [starts[i], stops[i]) range of row irows[i] is read for
+ *     every i < nranges, with a single selection of all of them.  The
+ *     ranges must be ordered by row and start and must not overlap, so
+ *     that the elements of every range are put in data one after the
+ *     other and in the same order.
+ *
+ *-------------------------------------------------------------------------
+ */
+
+herr_t H5ARRAYOread_readRanges( hid_t dataset_id,
+                                hid_t type_id,
+                                hsize_t nranges,
+                                hsize_t *irows,
+                                hsize_t *starts,
+                                hsize_t *stops,
+                                void *data )
+{
+ hid_t    space_id = -1;
+ hid_t    mem_space_id = -1;
+ hsize_t  count[2];
+ hsize_t  offset[2];
+ hsize_t  stride[2] = {1, 1};
+ hsize_t  nelements = 0;
+ hsize_t  i;
+
+
+ if ( nranges == 0 )
+   return 0;
+
+ /* Get the dataspace handle */
+ if ( (space_id = H5Dget_space( dataset_id )) < 0 )
+  goto out;
+
+ /* Select the union of the ranges in the dataset */
+ if ( H5Sselect_none( space_id ) < 0 )
+   goto out;
+ count[0] = 1;
+ for ( i = 0; i < nranges; i++ ) {
+   if ( stops[i] <= starts[i] )
+     continue;
+   offset[0] = irows[i];
+   offset[1] = starts[i];
+   count[1] = stops[i] - starts[i];
+   if ( H5Sselect_hyperslab( space_id, H5S_SELECT_OR,
+                             offset, stride, count, NULL ) < 0 )
+     goto out;
+   nelements += count[1];
+ }
+ if ( nelements == 0 ) {
+   H5Sclose( space_id );
+   return 0;
+ }
+
+ /* Create a memory dataspace handle for all the elements */
+ if ( (mem_space_id = H5Screate_simple( 1, &nelements, NULL )) < 0 )
+   goto out;
+
+ /* Read */
+ if ( H5Dread( dataset_id, type_id, mem_space_id, space_id, H5P_DEFAULT, data ) < 0 )
+   goto out;
+
+ /* Terminate access to the memory dataspace */
+ if ( H5Sclose( mem_space_id ) < 0 )
+   goto out;
+ mem_space_id = -1;
+
+ /* Terminate access to the dataspace */
+ if ( H5Sclose( space_id ) < 0 )
+   goto out;
+
+ return 0;
+
+out:
+ H5E_BEGIN_TRY {
+   if ( mem_space_id >= 0 )
+     H5Sclose( mem_space_id );
+   if ( space_id >= 0 )
+     H5Sclose( space_id );
+ } H5E_END_TRY;
+ return -1;
+
+}
@@ -34,3 +34,10 @@ herr_t H5ARRAYOreadSliceLR( hid_t dataset_id,
                             hsize_t stop,
                             void *data );
 
+herr_t H5ARRAYOread_readRanges( hid_t dataset_id,
+                                hid_t type_id,
+                                hsize_t nranges,
+                                hsize_t *irows,
+                                hsize_t *starts,
+                                hsize_t *stops,
+                                void *data );
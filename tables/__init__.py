@@ -124,7 +124,7 @@ from tables.file import File, open_file, copy_file, openFile, copyFile
 from tables.node import Node
 from tables.group import Group
 from tables.leaf import Leaf
-from tables.table import Table, Cols, Column
+from tables.table import Table, Cols, Column, GroupBy
 from tables.array import Array
 from tables.carray import CArray
 from tables.earray import EArray
@@ -151,6 +151,7 @@ __all__ = [
     'silence_hdf5_messages',
     # Helper classes:
     'IsDescription', 'Description', 'Filters', 'Cols', 'Column',
+    'GroupBy',
     # Types:
     'Enum',
     # Atom types:
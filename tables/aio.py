@@ -0,0 +1,370 @@
+# -*- coding: utf-8 -*-
+
+########################################################################
+#
+# License: BSD
+# Created: October 16, 2026
+#
+# $Id$
+#
+########################################################################
+
+"""Asynchronous access to PyTables files for asyncio applications.
+
+Every PyTables call blocks the calling thread until HDF5 is done with
+it, which stalls the event loop of asyncio based services.  This module
+offers a thin facade where the costly operations return awaitable
+futures instead, while the work is done in a background thread::
+
+    f = yield from tables.aio.open_file('data.h5', 'a')
+    table = yield from f.get_node('/detector/readout')
+    rows = yield from table.read_where('energy > 10')
+    yield from table.append(more_rows)
+    yield from f.close()
+
+(or the same with ``await`` inside ``async def`` coroutines).
+
+Every open file gets its own executor with a single thread, so the
+operations on a file are run one at a time and in the order they were
+requested, while operations on different files may overlap (calls into
+HDF5 are still serialized, as it is not thread-safe, but the GIL is
+released while in them).  Table operations are split in I/O buffers and
+cancelling their futures stops them at the next buffer boundary.
+
+Objects in the wrapped file should not be used directly while there are
+pending operations on it.  This module requires Python 3.4 or later.
+
+"""
+
+import threading
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy
+
+import tables
+from tables.table import Table
+from tables.leaf import Leaf
+from tables.flavor import internal_to_flavor
+from tables.utils import hdf5_lock as _hdf5_lock
+from tables.utilsextension import get_nested_field
+
+
+__docformat__ = 'reStructuredText'
+"""The format of documentation strings in this module."""
+
+__all__ = ['open_file', 'AsyncFile', 'AsyncLeaf']
+
+def _check_cancelled(cancelled):
+    """Stop the current operation if its future has been cancelled."""
+
+    if cancelled.is_set():
+        raise asyncio.CancelledError()
+
+
+def _submit(loop, executor, func, *args):
+    """Run ``func(cancelled, *args)`` in `executor`.
+
+    An asyncio future for the result is returned.  `cancelled` is a
+    `threading.Event` which is set when this future gets cancelled, so
+    that `func` can stop early (see `_check_cancelled()`).
+
+    """
+
+    cancelled = threading.Event()
+
+    def call():
+        _check_cancelled(cancelled)
+        return func(cancelled, *args)
+
+    def on_done(future):
+        if future.cancelled():
+            cancelled.set()
+
+    future = loop.run_in_executor(executor, call)
+    future.add_done_callback(on_done)
+    return future
+
+
+def _then(loop, future, func):
+    """Get a future for ``func(result)`` where `result` is `future`'s.
+
+    `func` is called in the thread of the event `loop`.
+
+    """
+
+    result = loop.create_future()
+
+    def on_done(future):
+        if result.cancelled():
+            return
+        if future.cancelled():
+            result.cancel()
+        elif future.exception() is not None:
+            result.set_exception(future.exception())
+        else:
+            result.set_result(func(future.result()))
+
+    future.add_done_callback(on_done)
+    return result
+
+
+def _collect_batches(cancelled, batches, dtype, field):
+    """Concatenate the `batches` of a table read into a single array.
+
+    The iteration is stopped between batches if the operation gets
+    cancelled.  If `field` is given, only that column is returned.
+
+    """
+
+    blocks = []
+    while True:
+        _check_cancelled(cancelled)
+        with _hdf5_lock:
+            batch = next(batches, None)
+        if batch is None:
+            break
+        blocks.append(batch)
+    if blocks:
+        result = numpy.concatenate(blocks)
+    else:
+        result = numpy.empty(0, dtype=dtype)
+    if field:
+        result = get_nested_field(result, field)
+    return result
+
+
+def open_file(filename, mode="r", title="", root_uep="/", filters=None,
+              loop=None, **kwargs):
+    """Open a PyTables (or generic HDF5) file for asynchronous access.
+
+    The arguments have the same meaning as in :func:`tables.open_file`,
+    and `loop` is the event loop in which the returned futures are
+    resolved (the current one by default).  A future for the new
+    :class:`AsyncFile` instance is returned.
+
+    """
+
+    if loop is None:
+        loop = asyncio.get_event_loop()
+    executor = ThreadPoolExecutor(max_workers=1)
+
+    def open_(cancelled):
+        with _hdf5_lock:
+            return tables.open_file(filename, mode, title, root_uep, filters,
+                                    **kwargs)
+
+    def wrap(h5file):
+        return AsyncFile(h5file, loop, executor)
+
+    def on_done(future):
+        if future.cancelled() or future.exception() is not None:
+            executor.shutdown(wait=False)
+
+    future = _submit(loop, executor, open_)
+    future.add_done_callback(on_done)
+    return _then(loop, future, wrap)
+
+
+class AsyncFile(object):
+    """An open file whose costly operations return asyncio futures.
+
+    Instances are created with :func:`open_file`.  They can also be used
+    as asynchronous context managers, closing the file on exit.
+
+    """
+
+    def __init__(self, h5file, loop, executor):
+        self.file = h5file
+        """The wrapped :class:`tables.File` instance."""
+        self._loop = loop
+        self._executor = executor
+
+    def _submit(self, func, *args):
+        """Run ``func(cancelled, *args)`` in the executor of the file."""
+
+        return _submit(self._loop, self._executor, func, *args)
+
+    def _run(self, method, *args, **kwargs):
+        """Run ``method(*args, **kwargs)`` as a single HDF5 operation."""
+
+        def call(cancelled):
+            with _hdf5_lock:
+                return method(*args, **kwargs)
+
+        return self._submit(call)
+
+    def get_node(self, where, name=None, classname=None):
+        """Get a future for a node in the file.
+
+        The arguments have the same meaning as in
+        :meth:`tables.File.get_node`.  Leaves are wrapped in
+        :class:`AsyncLeaf` instances, while groups and other nodes are
+        returned as they are.
+
+        """
+
+        def wrap(node):
+            if isinstance(node, Leaf):
+                return AsyncLeaf(node, self)
+            return node
+
+        future = self._run(self.file.get_node, where, name, classname)
+        return _then(self._loop, future, wrap)
+
+    def flush(self):
+        """Get a future for flushing all the buffers of the file."""
+
+        return self._run(self.file.flush)
+
+    def close(self):
+        """Get a future for closing the file.
+
+        The executor of the file is shut down afterwards, so no more
+        operations can be requested.
+
+        """
+
+        future = self._run(self.file.close)
+        future.add_done_callback(
+            lambda future: self._executor.shutdown(wait=False))
+        return future
+
+    def __aenter__(self):
+        return self._submit(lambda cancelled: self)
+
+    def __aexit__(self, *exc_info):
+        return _then(self._loop, self.close(), lambda result: False)
+
+    def __repr__(self):
+        return "<%s for %r>" % (self.__class__.__name__, self.file)
+
+
+class AsyncLeaf(object):
+    """A leaf whose reads and appends return asyncio futures.
+
+    The operations are run in the executor of the :class:`AsyncFile`
+    holding the leaf.  Table reads and appends are done one I/O buffer
+    at a time (see :meth:`tables.Table.iter_batches`), and they stop at
+    the next buffer when their future is cancelled (rows already
+    appended are kept).  The operations on other leaves can only be
+    cancelled before they start.
+
+    """
+
+    def __init__(self, node, afile):
+        self.node = node
+        """The wrapped :class:`tables.Leaf` instance."""
+        self._afile = afile
+
+    def read(self, start=None, stop=None, step=None, field=None):
+        """Get a future for the result of :meth:`tables.Leaf.read`.
+
+        The meaning of the arguments is the same as in the ``read()``
+        method of the wrapped leaf.
+
+        """
+
+        node = self.node
+        if not isinstance(node, Table):
+            return self._afile._run(node.read, start, stop, step)
+
+        def read(cancelled):
+            with _hdf5_lock:
+                (start_, stop_, step_) = node._process_range_read(
+                    start, stop, step)
+                fields, dtype = self._get_fields(field)
+                batches = node.iter_batches(fields=fields, start=start_,
+                                            stop=stop_, step=step_)
+            result = _collect_batches(cancelled, batches, dtype, field)
+            return internal_to_flavor(result, node.flavor)
+
+        return self._afile._submit(read)
+
+    def read_where(self, condition, condvars=None, field=None,
+                   start=None, stop=None, step=None):
+        """Get a future for the result of :meth:`tables.Table.read_where`.
+
+        The meaning of the arguments is the same as in the
+        ``read_where()`` method of the wrapped table.  The variables in
+        the condition are looked up when this method is called.
+
+        """
+
+        node = self.node
+        # The namespace of the caller is not available in the executor
+        condvars = node._required_expr_vars(condition, condvars, depth=2)
+
+        def read_where(cancelled):
+            with _hdf5_lock:
+                fields, dtype = self._get_fields(field)
+                batches = node.iter_batches(
+                    condition=condition, condvars=condvars, fields=fields,
+                    start=start, stop=stop, step=step)
+            result = _collect_batches(cancelled, batches, dtype, field)
+            return internal_to_flavor(result, node.flavor)
+
+        return self._afile._submit(read_where)
+
+    def read_coordinates(self, coords, field=None):
+        """Get a future for the result of ``read_coordinates()``.
+
+        The meaning of the arguments is the same as in the
+        ``read_coordinates()`` method of the wrapped leaf.
+
+        """
+
+        node = self.node
+        if not isinstance(node, Table):
+            return self._afile._run(node.read_coordinates, coords, field)
+
+        def read_coordinates(cancelled):
+            with _hdf5_lock:
+                coords_ = node._point_selection(coords)
+                fields, dtype = self._get_fields(field)
+            nrowsinbuf = node.nrowsinbuf
+            batches = (node._read_coordinates(coords_[i:i + nrowsinbuf],
+                                              fields=fields)
+                       for i in range(0, len(coords_), nrowsinbuf))
+            result = _collect_batches(cancelled, batches, dtype, field)
+            return internal_to_flavor(result, node.flavor)
+
+        return self._afile._submit(read_coordinates)
+
+    def append(self, rows):
+        """Get a future for appending `rows` to the wrapped leaf.
+
+        The meaning of `rows` is the same as in the ``append()`` method
+        of the wrapped leaf.
+
+        """
+
+        node = self.node
+        if not isinstance(node, Table):
+            return self._afile._run(node.append, rows)
+
+        def append(cancelled):
+            with _hdf5_lock:
+                records = node._conv_to_recarr(rows)
+            nrowsinbuf = node.nrowsinbuf
+            for i in range(0, len(records), nrowsinbuf):
+                _check_cancelled(cancelled)
+                with _hdf5_lock:
+                    node.append(records[i:i + nrowsinbuf])
+
+        return self._afile._submit(append)
+
+    def flush(self):
+        """Get a future for flushing the buffers of the wrapped leaf."""
+
+        return self._afile._run(self.node.flush)
+
+    def _get_fields(self, field):
+        """Get the fields to read from a table and the dtype of reads."""
+
+        if not field:
+            return None, self.node._v_dtype
+        return [field], self.node._get_projected_dtype([field])
+
+    def __repr__(self):
+        return "<%s for %r>" % (self.__class__.__name__, self.node)
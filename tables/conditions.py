@@ -20,17 +20,22 @@ Classes:
 
 `CompileCondition`
     Container for a compiled condition.
+`MembershipTest`
+    Membership test of a column in a set of values.
 
 Functions:
 
 `compile_condition`
     Compile a condition and extract usable index conditions.
+`split_membership_tests`
+    Replace the membership tests in a condition with variables.
 `call_on_recarr`
     Evaluate a function over a structured array.
 
 """
 
 import re
+import numpy
 from numexpr.necompiler import typecode_to_kind
 from numexpr.necompiler import expressionToAST, typeCompileAst
 from numexpr.necompiler import stringToExpression, NumExpr
@@ -41,6 +46,11 @@ from tables.utils import lazyattr
 _no_matching_opcode = re.compile(r"[^a-z]([a-z]+)_([a-z]+)[^a-z]")
 # E.g. "gt" and "bfc" from "couldn't find matching opcode for 'gt_bfc'".
 
+_membership_call = re.compile(
+    r"\bisin\s*\(\s*([A-Za-z_]\w*)\s*,\s*([A-Za-z_]\w*)\s*\)")
+# E.g. "col" and "values" from "isin(col, values)".
+_membership_name = '_isin_%d_'
+
 
 def _unsupported_operation_error(exception):
     """Make the \"no matching opcode\" Numexpr `exception` more clear.
@@ -370,6 +380,63 @@ class CompiledCondition(object):
         return newcc
 
 
+class MembershipTest(object):
+    """Membership test of a column in a set of values.
+
+    This is the value taken by the variables which replace the
+    ``isin(column, values)`` calls in a condition (see
+    `split_membership_tests()`).  When the condition is evaluated over
+    a structured array, the variable is a boolean array telling which
+    rows have a value of `column` in `values`.
+
+    """
+
+    def __init__(self, column, values):
+        self.column = column
+        """The column whose values are tested."""
+        self.values = numpy.unique(values)
+        """The sorted set of values to look for."""
+
+    def __repr__(self):
+        return "isin(%s, %r)" % (self.column.pathname, self.values)
+
+    def evaluate(self, recarr):
+        """Evaluate the membership test over the `recarr` rows."""
+
+        values = get_nested_field(recarr, self.column.pathname)
+        return numpy.in1d(values, self.values)
+
+
+def split_membership_tests(condition):
+    """Replace the membership tests in `condition` with variables.
+
+    Every ``isin(column, values)`` call in the `condition` string is
+    replaced by a new boolean variable, the same one for repeated
+    calls.  A tuple with the new condition and a list of ``(variable,
+    column, values)`` tuples (with the names of the variables) is
+    returned.
+
+    """
+
+    tests = []
+
+    def replace(match):
+        test = match.groups()
+        for var, column, values in tests:
+            if (column, values) == test:
+                return var
+        var = _membership_name % len(tests)
+        tests.append((var,) + test)
+        return var
+
+    newcondition = _membership_call.sub(replace, condition)
+    if re.search(r"\bisin\s*\(", newcondition):
+        raise ValueError("the arguments of ``isin()`` must be the names "
+                         "of a column and a variable in condition ``%s``"
+                         % condition)
+    return newcondition, tests
+
+
 def _get_variable_names(expression):
     """Return the list of variable names in the Numexpr `expression`."""
 
@@ -398,8 +465,25 @@ def compile_condition(condition, typemap, indexedcols):
     instance is a Numexpr function object, and the ``parameters`` list
     indicates the order of its parameters.
 
+    Membership tests like ``isin(c1, values)`` are replaced by boolean
+    parameters (see `split_membership_tests()`).  When ``c1`` is in
+    `indexedcols`, they are also extracted as index conditions in the
+    form ``(c1, ('isin',), ((values,),))``, unless they are negated.
+
     """
 
+    # Replace membership tests with boolean variables, which are
+    # indexable as long as their columns are.
+    condition, memberships = split_membership_tests(condition)
+    if memberships:
+        typemap = typemap.copy()
+        memberidx = {}
+        for var, column, values in memberships:
+            typemap[var] = bool
+            if column in indexedcols:
+                memberidx[var] = (column, values)
+        indexedcols = indexedcols.union(memberidx)
+
     # Get the expression tree and extract index conditions.
     expr = stringToExpression(condition, typemap, {})
     if expr.astKind != 'bool':
@@ -416,6 +500,20 @@ def compile_condition(condition, typemap, indexedcols):
     # Get rid of the unneccessary list wrapper for strexpr
     strexpr = strexpr[0]
 
+    # Turn indexable membership tests into lookups of their columns.
+    if memberships and idxexprs:
+        idxexprs2 = []
+        for var, ops, limits in idxexprs:
+            if var in memberidx:
+                if limits != (True,):
+                    # Negated membership tests are not indexable.
+                    idxexprs2, strexpr = [], ''
+                    break
+                column, values = memberidx[var]
+                var, ops, limits = column, ('isin',), ((values,),)
+            idxexprs2.append((var, ops, limits))
+        idxexprs = idxexprs2
+
     # Get the variable names used in the condition.
     # At the same time, build its signature.
     varnames = _get_variable_names(expr)
@@ -440,7 +538,8 @@ def call_on_recarr(func, params, recarr, param2arg=None):
     The `param2arg` function, when specified, is used to get an argument
     given a parameter name; otherwise, the parameter itself is used as
     an argument.  When the argument is a `Column` object, the proper
-    column from `recarr` is used as its value.
+    column from `recarr` is used as its value.  When it is a
+    `MembershipTest`, it is evaluated over `recarr`.
 
     """
 
@@ -452,5 +551,7 @@ def call_on_recarr(func, params, recarr, param2arg=None):
             arg = param
         if hasattr(arg, 'pathname'):  # looks like a column
             arg = get_nested_field(recarr, arg.pathname)
+        elif isinstance(arg, MembershipTest):
+            arg = arg.evaluate(recarr)
         args.append(arg)
     return func(*args)
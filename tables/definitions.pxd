@@ -363,6 +363,7 @@ cdef extern from "hdf5.h" nogil:
   # Operations for compound data types
   int    H5Tget_nmembers(hid_t type_id)
   char  *H5Tget_member_name(hid_t type_id, unsigned membno)
+  int    H5Tget_member_index(hid_t type_id, char *name)
   hid_t  H5Tget_member_type(hid_t type_id, unsigned membno)
   hid_t  H5Tget_native_type(hid_t type_id, H5T_direction_t direction)
   herr_t H5Tget_member_value(hid_t type_id, int membno, void *value)
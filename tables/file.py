@@ -778,6 +778,12 @@ class File(hdf5extension.File, object):
         if params['MAX_BLOSC_THREADS'] is None:
             params['MAX_BLOSC_THREADS'] = detect_number_of_cores()
 
+        if params['MAX_QUERY_THREADS'] is None:
+            params['MAX_QUERY_THREADS'] = detect_number_of_cores()
+
+        if params['MAX_INDEX_THREADS'] is None:
+            params['MAX_INDEX_THREADS'] = detect_number_of_cores()
+
         self.params = params
 
         # Now, it is time to initialize the File extension
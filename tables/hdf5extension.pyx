@@ -1183,7 +1183,11 @@ cdef class Leaf(Node):
       shape = list(self.shape)
       shape[self.maindim] = SizeType(size)
       self.shape = tuple(shape)
-    elif classname in ('Table', 'VLArray'):
+    elif classname == 'Table':
+      self.nrows = size
+      # Cached data of the removed rows must not be used anymore
+      self._dirtycache = True
+    elif classname == 'VLArray':
       self.nrows = size
     else:
       raise ValueError("Unexpected classname: %s" % classname)
@@ -19,7 +19,10 @@ import os
 import os.path
 import tempfile
 import math
+import bisect
 import warnings
+import threading
+import Queue
 
 import numpy
 
@@ -28,7 +31,7 @@ from tables.idxutils import (calc_chunksize, calcoptlevels,
 
 from tables import indexesextension
 from tables.node import NotLoggedMixin
-from tables.atom import UIntAtom, Atom
+from tables.atom import UIntAtom, Int64Atom, StringAtom, Atom
 from tables.earray import EArray
 from tables.carray import CArray
 from tables.leaf import Filters
@@ -64,6 +67,10 @@ if profile:
 defsort = "quicksort"
 # defsort = "mergesort"
 
+# The maximum number of ranges of indices read at once when computing
+# chunkmaps, as building HDF5 selections with many hyperslabs gets slow.
+max_ranges_per_read = 1024
+
 # Default policy for automatically updating indexes after a table
 # append operation, or automatically reindexing after an
 # index-invalidating operation like removing or modifying table rows.
@@ -102,6 +109,158 @@ def _table_column_pathname_of_index(indexpathname):
 _tableColumnPathnameOfIndex = previous_api(_table_column_pathname_of_index)
 
 
+def _merge_ranges(starts, stops):
+    """Merge the overlapping ``[start, stop)`` ranges in a slice.
+
+    The ranges must be sorted by `starts`, as the ones found for values
+    looked up in ascending order.  Empty ranges are dropped, and a list
+    of ``(start, stop)`` tuples is returned.
+
+    """
+
+    nonempty = stops > starts
+    starts, stops = starts[nonempty], stops[nonempty]
+    if len(starts) <= 1:
+        return zip(starts, stops)
+    stops = numpy.maximum.accumulate(stops)
+    # A range starting past the end of the previous ones opens a new one
+    first = numpy.empty(len(starts), dtype=bool)
+    first[0] = True
+    first[1:] = starts[1:] > stops[:-1]
+    last = numpy.empty(len(starts), dtype=bool)
+    last[:-1] = first[1:]
+    last[-1] = True
+    return zip(starts[first], stops[last])
+
+
+def _merge_slice_ranges(starts, stops):
+    """Merge the overlapping ranges in every slice of an index.
+
+    `starts` and `stops` are 2-dimensional, with a ``[start, stop)``
+    range per value looked up (sorted like in `_merge_ranges()`) in
+    every row and a column per slice.  A tuple of ``uint64`` arrays with
+    the slices, starts and stops of the merged ranges is returned,
+    ordered by slice and start.
+
+    """
+
+    nvalues, nslices = starts.shape
+    slices = numpy.repeat(numpy.arange(nslices, dtype=numpy.uint64), nvalues)
+    starts = starts.T.ravel().astype(numpy.uint64)
+    stops = stops.T.ravel().astype(numpy.uint64)
+    nonempty = stops > starts
+    slices, starts, stops = slices[nonempty], starts[nonempty], stops[nonempty]
+    if nvalues == 1 or len(starts) == 0:
+        return (slices, starts, stops)
+    # Shift the ranges of every slice past the ones of the previous
+    # slices, so that all of them are merged in one go
+    shift = slices * (stops.max() + numpy.uint64(1))
+    starts, stops = starts + shift, numpy.maximum.accumulate(stops + shift)
+    first = numpy.empty(len(starts), dtype=bool)
+    first[0] = True
+    first[1:] = starts[1:] > stops[:-1]
+    last = numpy.empty(len(starts), dtype=bool)
+    last[:-1] = first[1:]
+    last[-1] = True
+    shift = shift[first]
+    return (slices[first], starts[first] - shift, stops[last] - shift)
+
+
+def _set_bits(bitmaps, rows, bits):
+    """Set the `bits` in the `rows` of the 2-dimensional `bitmaps`.
+
+    Bitmaps are packed in bytes as with ``numpy.packbits()``, i.e. the
+    first bit is the highest one of the first byte.  The same bit must
+    not be repeated in a row.
+
+    """
+
+    nbytes, nbits = bits >> 3, bits & 7
+    # A single bit per byte is set at a time, so that they are not lost
+    for nbit in xrange(8):
+        selected = nbits == nbit
+        bitmaps[rows[selected], nbytes[selected]] |= numpy.uint8(0x80 >> nbit)
+
+
+def _clear_bits(bitmaps, bits):
+    """Clear the `bits` in every row of the 2-dimensional `bitmaps`.
+
+    The bits are numbered like in `_set_bits()` and they must not be
+    repeated.
+
+    """
+
+    nbytes, nbits = bits >> 3, bits & 7
+    for nbit in xrange(8):
+        bitmaps[:, nbytes[nbits == nbit]] &= numpy.uint8(~(0x80 >> nbit) & 0xff)
+
+
+
+def _sortable_bytes(values):
+    """Get the bytes of `values` in an order preserving encoding.
+
+    A 2-dimensional ``uint8`` array with the bytes of a value per row is
+    returned, which compare (byte by byte) like the values do.  Numbers
+    are written big-endian, with the sign bit flipped for integers and
+    all the bits flipped for negative floats, while strings keep their
+    bytes.
+
+    """
+
+    values = numpy.ascontiguousarray(values)
+    nvalues, kind = len(values), values.dtype.kind
+    if kind == 'S':
+        return values.view(numpy.uint8).reshape(
+            nvalues, values.dtype.itemsize)
+    values = values.astype(values.dtype.newbyteorder('='))
+    if kind == 'b':
+        values, kind = values.view(numpy.uint8), 'u'
+    itemsize = values.dtype.itemsize
+    utype = numpy.dtype('u%d' % itemsize)
+    signbit = utype.type(1 << (8 * itemsize - 1))
+    if kind == 'u':
+        bits = values
+    elif kind == 'i':
+        bits = values.view(utype) ^ signbit
+    elif kind == 'f':
+        # Adding zero turns -0.0 into 0.0, which must get the same key
+        bits = (values + values.dtype.type(0)).view(utype)
+        bits = numpy.where(bits & signbit, ~bits, bits | signbit)
+    else:
+        raise TypeError("values of type ``%s`` can not be part of a "
+                        "composite index" % values.dtype)
+    bits = bits.astype(utype.newbyteorder('>'))
+    return bits.view(numpy.uint8).reshape(nvalues, itemsize)
+
+
+def _composite_keys(columns):
+    """Get the keys of a composite index for some rows.
+
+    `columns` is a sequence with the values of every indexed column for
+    the rows, in key order.  An array of fixed-length strings is returned,
+    whose order (NumPy compares them byte by byte) is the lexicographic
+    order of the values.
+
+    """
+
+    keybytes = numpy.hstack([_sortable_bytes(values) for values in columns])
+    return keybytes.view('S%d' % keybytes.shape[1]).ravel()
+
+
+def _limit_value(dtype, value):
+    """Convert the query limit `value` into a one-element `dtype` array.
+
+    Integer limits out of the range of `dtype` are clipped, and other
+    conversions just truncate or round the limit, so the rows selected
+    with the converted limits are always a superset of the right ones.
+
+    """
+
+    if dtype.kind in 'iu':
+        info = numpy.iinfo(dtype)
+        value = min(max(value, info.min), info.max)
+    return numpy.array([value], dtype=dtype)
+
 class Index(NotLoggedMixin, indexesextension.Index, Group):
     """Represents the index of a column in a table.
 
@@ -194,6 +353,10 @@ class Index(NotLoggedMixin, indexesextension.Index, Group):
         are not usable.
         """)
 
+    ndelta = property(
+        lambda self: len(self.read_delta()[1]), None, None,
+        "The number of modified rows kept in the delta of this index.")
+
     def _getcolumn(self):
         tablepath, columnpath = _table_column_pathname_of_index(
             self._v_pathname)
@@ -279,6 +442,9 @@ class Index(NotLoggedMixin, indexesextension.Index, Group):
         if self.indsize < 8:
             # An index that is not full cannot be completely sorted
             return False
+        if self.ndelta > 0:
+            # The values of some rows have changed since they were sorted
+            return False
         # Try with the 'is_csi' attribute
         if 'is_csi' in self._v_attrs:
             return self._v_attrs.is_csi
@@ -394,6 +560,11 @@ class Index(NotLoggedMixin, indexesextension.Index, Group):
         sorted index. -1 means that this number is not computed yet."""
         self.tprof = 0
         """Time counter for benchmarking purposes."""
+        self.deltacoords = numpy.empty(0, dtype=numpy.int64)
+        """The coordinates of the rows in the delta found by the last
+        search."""
+        self._delta = None
+        """The values and coordinates in the delta (see `read_delta()`)."""
 
         from tables.file import open_file
         self._openFile = open_file
@@ -564,12 +735,23 @@ class Index(NotLoggedMixin, indexesextension.Index, Group):
             tref = time()
         if profile:
             show_stats("Entering initial_append", tref)
-        arr = xarr.pop()
+        arr, idx = self._prepare_slice(xarr.pop(), nrow, self.nelementsILR)
+        larr, arr, idx = self._sort_slice(arr, idx, reduction)
+        if profile:
+            show_stats("Exiting initial_append", tref)
+        return larr, arr, idx
+
+    def _prepare_slice(self, arr, nrow, nelementsILR):
+        """Get the values and initial indices of slice `nrow` to be sorted.
+
+        The values in the last row index (`nelementsILR` of them) are
+        read at the beginning of the slice.  This does I/O, so it has
+        to be called from the thread owning the file.
+
+        """
+
         indsize = self.indsize
         slicesize = self.slicesize
-        nelementsILR = self.nelementsILR
-        if profile:
-            show_stats("Before creating idx", tref)
         if indsize == 8:
             idx = numpy.arange(0, len(arr), dtype="uint64") + nrow * slicesize
         elif indsize == 4:
@@ -612,28 +794,27 @@ class Index(NotLoggedMixin, indexesextension.Index, Group):
             assert len(arr) > nelementsILR
             self.read_slice_lr(self.sortedLR, arr[:nelementsILR])
             self.read_slice_lr(self.indicesLR, idx[:nelementsILR])
+        # A completely sorted index is not longer possible after an
+        # append of an index with already one slice.
+        if nrow > 0:
+            self._v_attrs.is_csi = False
+        return arr, idx
+
+    def _sort_slice(self, arr, idx, reduction):
+        """Sort a prepared slice and get its last value and reduction.
+
+        No I/O is done here (and the GIL is released while sorting), so
+        different slices can be sorted by different threads.
+
+        """
+
         # In-place sorting
-        if profile:
-            show_stats("Before keysort", tref)
         indexesextension.keysort(arr, idx)
         larr = arr[-1]
         if reduction > 1:
             # It's important to do a copy() here in order to ensure that
             # sorted._append() will receive a contiguous array.
-            if profile:
-                show_stats("Before reduction", tref)
-            reduc = arr[::reduction].copy()
-            if profile:
-                show_stats("After reduction", tref)
-            arr = reduc
-            if profile:
-                show_stats("After arr <-- reduc", tref)
-        # A completely sorted index is not longer possible after an
-        # append of an index with already one slice.
-        if nrow > 0:
-            self._v_attrs.is_csi = False
-        if profile:
-            show_stats("Exiting initial_append", tref)
+            arr = arr[::reduction].copy()
         return larr, arr, idx
 
     def final_idx32(self, idx, offset):
@@ -663,13 +844,103 @@ class Index(NotLoggedMixin, indexesextension.Index, Group):
             tref = time()
         if profile:
             show_stats("Entering append", tref)
+        where, reduction = self._append_target(update)
+        nrows = where.sorted.nrows  # before sorted.append()
+        larr, arr, idx = self.initial_append(xarr, nrows, reduction)
+        self._write_slice(where, nrows, larr, arr, idx, reduction)
+        if profile:
+            show_stats("Exiting append", tref)
+
+    def append_slices(self, arrays, update=False, nthreads=1):
+        """Append several complete slices to the index objects.
+
+        `arrays` is an iterable with the values of each slice, which is
+        consumed from the calling thread.  When `nthreads` is greater
+        than 1, the slices are sorted by that many worker threads while
+        the calling thread reads the next slices and saves the sorted
+        ones in order (HDF5 is not thread-safe).  At most two slices per
+        thread are kept in memory.
+
+        """
+
+        if nthreads <= 1:
+            for arr in arrays:
+                self.append([arr], update=update)
+            return
+
+        where, reduction = self._append_target(update)
+        nelementsILR = self.nelementsILR
+        tasks = Queue.Queue()
+        results = {}
+        done = threading.Condition()
+
+        def sort_slices():
+            while True:
+                task = tasks.get()
+                if task is None:
+                    break
+                nrow, arr, idx = task
+                try:
+                    result = self._sort_slice(arr, idx, reduction)
+                except Exception as exc:
+                    result = exc
+                with done:
+                    results[nrow] = result
+                    done.notify()
+
+        def write_next_slice(nrow):
+            with done:
+                while nrow not in results:
+                    done.wait()
+                result = results.pop(nrow)
+            if isinstance(result, Exception):
+                raise result
+            larr, arr, idx = result
+            self._write_slice(where, nrow, larr, arr, idx, reduction)
+
+        workers = [threading.Thread(target=sort_slices)
+                   for i in xrange(nthreads)]
+        for worker in workers:
+            worker.daemon = True
+            worker.start()
+        nwritten = nrow = where.sorted.nrows
+        try:
+            for arr in arrays:
+                # Only the first slice gets the values in the last row
+                arr, idx = self._prepare_slice(arr, nrow, nelementsILR)
+                nelementsILR = 0
+                tasks.put((nrow, arr, idx))
+                del arr, idx
+                nrow += 1
+                if nrow - nwritten >= 2 * nthreads:
+                    write_next_slice(nwritten)
+                    nwritten += 1
+            while nwritten < nrow:
+                write_next_slice(nwritten)
+                nwritten += 1
+        finally:
+            for worker in workers:
+                tasks.put(None)
+            for worker in workers:
+                worker.join()
+
+    def _append_target(self, update):
+        """Get the index objects where slices are saved and the reduction."""
+
         if not update and self.temp_required:
-            where = self.tmp
             # The reduction will take place *after* the optimization process
-            reduction = 1
-        else:
-            where = self
-            reduction = self.reduction
+            return self.tmp, 1
+        return self, self.reduction
+
+    def _write_slice(self, where, nrows, larr, arr, idx, reduction):
+        """Save a sorted slice in the `where` index objects.
+
+        `nrows` is the number of slices already in `where`.
+
+        """
+
+        if profile:
+            tref = time()
         sorted = where.sorted
         indices = where.indices
         ranges = where.ranges
@@ -680,8 +951,6 @@ class Index(NotLoggedMixin, indexesextension.Index, Group):
         zbounds = where.zbounds
         sortedLR = where.sortedLR
         indicesLR = where.indicesLR
-        nrows = sorted.nrows  # before sorted.append()
-        larr, arr, idx = self.initial_append(xarr, nrows, reduction)
         # Save the sorted array
         sorted.append(arr.reshape(1, arr.size))
         cs = self.chunksize // reduction
@@ -719,7 +988,7 @@ class Index(NotLoggedMixin, indexesextension.Index, Group):
         indicesLR.attrs.nelements = self.nelementsILR
         self.dirtycache = True   # the cache is dirty now
         if profile:
-            show_stats("Exiting append", tref)
+            show_stats("Exiting _write_slice", tref)
 
     def append_last_row(self, xarr, update=False):
         """Append the array to the last row index objects."""
@@ -771,12 +1040,15 @@ class Index(NotLoggedMixin, indexesextension.Index, Group):
 
     appendLastRow = previous_api(append_last_row)
 
-    def optimize(self, verbose=False):
+    def optimize(self, verbose=False, progress=None):
         """Optimize an index so as to allow faster searches.
 
         verbose
             If True, messages about the progress of the
             optimization process are printed out.
+        progress
+            If given, it is called while the index is brought into a
+            completely sorted state (see :meth:`Index.do_complete_sort`).
 
         """
 
@@ -835,7 +1107,7 @@ class Index(NotLoggedMixin, indexesextension.Index, Group):
         # does not take too much memory).
         if self.want_complete_sort:
             if self.noverlaps > 0:
-                self.do_complete_sort()
+                self.do_complete_sort(progress)
             # Check that we have effectively achieved the complete sort
             if self.noverlaps > 0:
                 warnings.warn(
@@ -846,110 +1118,147 @@ class Index(NotLoggedMixin, indexesextension.Index, Group):
         self.cleanup_temp()
         return
 
-    def do_complete_sort(self):
-        """Bring an already optimized index into a complete sorted state."""
+    def do_complete_sort(self, progress=None):
+        """Bring an already optimized index into a complete sorted state.
+
+        The slices (and the last row), which are already sorted, are
+        merged in a single pass into the secondary temporaries, which
+        are swapped with the primary ones afterwards.  At most about
+        ``INDEX_SORT_MEMORY`` bytes of values are kept in memory.  If
+        given, `progress` is called as ``progress(nmerged, total)`` after
+        every batch of merged elements.
+
+        """
 
         if self.verbose:
             t1 = time()
             c1 = clock()
         ss = self.slicesize
+        cs = self.chunksize
         tmp = self.tmp
-        ranges = tmp.ranges[:]
         nslices = self.nslices
-
         nelementsLR = self.nelementsILR
-        if nelementsLR > 0:
-            # Add the ranges corresponding to the last row
-            rangeslr = numpy.array([self.bebounds[0], self.bebounds[-1]])
-            ranges = numpy.concatenate((ranges, [rangeslr]))
-            nslices += 1
-
         sorted = tmp.sorted
         indices = tmp.indices
         sortedLR = tmp.sortedLR
         indicesLR = tmp.indicesLR
-        sremain = numpy.array([], dtype=self.dtype)
-        iremain = numpy.array([], dtype='u%d' % self.indsize)
-        starts = numpy.zeros(shape=nslices, dtype=numpy.int_)
-        for i in xrange(nslices):
-            # Find the overlapping elements for slice i
-            sover = numpy.array([], dtype=self.dtype)
-            iover = numpy.array([], dtype='u%d' % self.indsize)
-            prev_end = ranges[i, 1]
-            for j in xrange(i + 1, nslices):
-                stj = starts[j]
-                if ((j < self.nslices and stj == ss) or
-                        (j == self.nslices and stj == nelementsLR)):
-                    # This slice has been already dealt with
-                    continue
-                if j < self.nslices:
-                    assert stj < ss, \
-                        "Two slices cannot overlap completely at this stage!"
-                    next_beg = sorted[j, stj]
-                else:
-                    assert stj < nelementsLR, \
-                        "Two slices cannot overlap completely at this stage!"
-                    next_beg = sortedLR[stj]
-                next_end = ranges[j, 1]
-                if prev_end > next_end:
-                    # Complete overlapping case
-                    if j < self.nslices:
-                        sover = numpy.concatenate((sover, sorted[j, stj:]))
-                        iover = numpy.concatenate((iover, indices[j, stj:]))
-                        starts[j] = ss
-                    else:
-                        n = nelementsLR
-                        sover = numpy.concatenate((sover, sortedLR[stj:n]))
-                        iover = numpy.concatenate((iover, indicesLR[stj:n]))
-                        starts[j] = nelementsLR
-                elif prev_end > next_beg:
-                    idx = self.search_item_lt(tmp, prev_end, j, ranges[j], stj)
-                    if j < self.nslices:
-                        sover = numpy.concatenate((sover, sorted[j, stj:idx]))
-                        iover = numpy.concatenate((iover, indices[j, stj:idx]))
-                    else:
-                        sover = numpy.concatenate((sover, sortedLR[stj:idx]))
-                        iover = numpy.concatenate((iover, indicesLR[stj:idx]))
-                    starts[j] = idx
-            # Build the extended slices to sort out
-            if i < self.nslices:
-                ssorted = numpy.concatenate(
-                    (sremain, sorted[i, starts[i]:], sover))
-                sindices = numpy.concatenate(
-                    (iremain, indices[i, starts[i]:], iover))
-            else:
-                ssorted = numpy.concatenate(
-                    (sremain, sortedLR[starts[i]:nelementsLR], sover))
-                sindices = numpy.concatenate(
-                    (iremain, indicesLR[starts[i]:nelementsLR], iover))
-            # Sort the extended slices
-            indexesextension.keysort(ssorted, sindices)
-            # Save the first elements of extended slices in the slice i
-            if i < self.nslices:
-                sorted[i] = ssorted[:ss]
-                indices[i] = sindices[:ss]
-                # Update caches for this slice
-                self.update_caches(i, ssorted[:ss])
-                # Save the remaining values in a separate array
-                send = len(sover) + len(sremain)
-                sremain = ssorted[ss:ss + send]
-                iremain = sindices[ss:ss + send]
+        dtype = self.dtype
+        idtype = numpy.dtype('u%d' % self.indsize)
+
+        # The runs to be merged are the slices plus the last row
+        lengths = [ss] * nslices
+        if nelementsLR > 0:
+            lengths.append(nelementsLR)
+        nruns = len(lengths)
+        total = sum(lengths)
+        # Half of the memory goes to the buffers of the runs, the other
+        # half to the batches being merged (at least a chunk per run)
+        budget = self._v_file.params['INDEX_SORT_MEMORY']
+        nbuf = budget // (2 * nruns * (dtype.itemsize + idtype.itemsize))
+        nbuf = max(nbuf // cs, 1) * cs
+        starts = [0] * nruns
+
+        def read_run(j):
+            start = starts[j]
+            svalues = numpy.empty(min(nbuf, lengths[j] - start), dtype=dtype)
+            ivalues = numpy.empty(len(svalues), dtype=idtype)
+            if j < nslices:
+                self.read_slice(sorted, j, svalues, start)
+                self.read_slice(indices, j, ivalues, start)
             else:
-                # Still some elements remain for the last row
-                n = len(ssorted)
-                assert n == nelementsLR
-                send = 0
-                sortedLR[:n] = ssorted
-                indicesLR[:n] = sindices
-                # Update the caches for last row
-                sortedlr = sortedLR[:nelementsLR]
-                bebounds = numpy.concatenate(
-                    (sortedlr[::self.chunksize], [sortedlr[-1]]))
-                sortedLR[nelementsLR:nelementsLR + len(bebounds)] = bebounds
-                self.bebounds = bebounds
+                self.read_slice_lr(sortedLR, svalues, start)
+                self.read_slice_lr(indicesLR, ivalues, start)
+            starts[j] = start + len(svalues)
+            return svalues, ivalues
+
+        buffers = [read_run(j) for j in xrange(nruns)]
+        # The first and last values in buffers, and whether runs have
+        # values in their buffer or still to be read
+        firsts = numpy.array([buf[0][0] for buf in buffers], dtype=dtype)
+        lasts = numpy.array([buf[0][-1] for buf in buffers], dtype=dtype)
+        inbuffer = numpy.ones(nruns, dtype=numpy.bool_)
+        unread = numpy.array([starts[j] < lengths[j] for j in xrange(nruns)])
 
-        # Verify that we have dealt with all the remaining values
-        assert send == 0
+        tmp_sorted = tmp.sorted2
+        tmp_indices = tmp.indices2
+        spending = numpy.empty(0, dtype=dtype)
+        ipending = numpy.empty(0, dtype=idtype)
+        nslice = 0
+        nmerged = 0
+        while inbuffer.any():
+            # Every buffered value up to the smallest last value in the
+            # runs with values still to be read can be merged now
+            limit = None
+            candidates = lasts[unread]
+            if dtype.kind == 'f':
+                # NaNs are sorted last
+                candidates = candidates[~numpy.isnan(candidates)]
+            if len(candidates) > 0:
+                limit = candidates.min()
+                runs = (inbuffer & (firsts <= limit)).nonzero()[0]
+            else:
+                runs = inbuffer.nonzero()[0]
+            sbatch = [spending]
+            ibatch = [ipending]
+            for j in runs:
+                svalues, ivalues = buffers[j]
+                if limit is None:
+                    n = len(svalues)
+                else:
+                    n = svalues.searchsorted(limit, side='right')
+                sbatch.append(svalues[:n])
+                ibatch.append(ivalues[:n])
+                if n < len(svalues):
+                    svalues, ivalues = svalues[n:], ivalues[n:]
+                elif unread[j]:
+                    svalues, ivalues = read_run(j)
+                    lasts[j] = svalues[-1]
+                    unread[j] = starts[j] < lengths[j]
+                else:
+                    inbuffer[j] = False
+                    continue
+                buffers[j] = (svalues, ivalues)
+                firsts[j] = svalues[0]
+            # The pending values are already sorted and smaller than the
+            # ones in the batch, so just the latter need to be sorted
+            nmerged += sum(len(values) for values in sbatch[1:])
+            sbatch = numpy.concatenate(sbatch)
+            ibatch = numpy.concatenate(ibatch)
+            npending = len(spending)
+            indexesextension.keysort(sbatch[npending:], ibatch[npending:])
+            # Save the complete slices
+            nfull = len(sbatch) // ss
+            for i in xrange(nfull):
+                ssorted = sbatch[i * ss:(i + 1) * ss]
+                self.write_slice(tmp_sorted, nslice, ssorted)
+                self.write_slice(tmp_indices, nslice,
+                                 ibatch[i * ss:(i + 1) * ss])
+                # Update caches for this slice
+                self.update_caches(nslice, ssorted)
+                nslice += 1
+            spending = sbatch[nfull * ss:].copy()
+            ipending = ibatch[nfull * ss:].copy()
+            del sbatch, ibatch
+            if progress is not None:
+                progress(nmerged, total)
+
+        # Verify that we have dealt with all the values
+        assert nslice == nslices and len(spending) == nelementsLR
+        if nelementsLR > 0:
+            # The remaining values go to the last row
+            self.write_sliceLR(sortedLR, spending)
+            self.write_sliceLR(indicesLR, ipending)
+            # Update the caches for last row
+            bebounds = numpy.concatenate((spending[::cs], [spending[-1]]))
+            sortedLR[nelementsLR:nelementsLR + len(bebounds)] = bebounds
+            self.bebounds = bebounds
+
+        # Swap the primary and secondary temporaries
+        for name in ['sorted', 'indices']:
+            node = tmp._f_get_child(name)
+            node._f_rename(name + '3')
+            tmp._f_get_child(name + '2')._f_rename(name)
+            node._f_rename(name + '2')
 
         # Compute the overlaps in order to verify that we have achieved
         # a complete sort.  This has to be executed always (and not only
@@ -1829,7 +2138,20 @@ class Index(NotLoggedMixin, indexesextension.Index, Group):
         self.dirtycache = False
 
     def search(self, item):
-        """Do a binary search in this index for an item."""
+        """Do a binary search in this index for an item.
+
+        The values of the rows modified after being indexed are looked up
+        in the delta too (see `append_delta()`), and the coordinates found
+        there are kept in `deltacoords` for `get_chunkmap()`.
+
+        """
+
+        tlen = self._search_slices(item)
+        self.deltacoords = self._search_delta(item)
+        return tlen + len(self.deltacoords)
+
+    def _search_slices(self, item):
+        """Do a binary search in the slices of this index for an item."""
 
         if profile:
             tref = time()
@@ -1928,6 +2250,91 @@ class Index(NotLoggedMixin, indexesextension.Index, Group):
             show_stats("Exiting search", tref)
         return tlen
 
+    def search_values(self, values):
+        """Do a binary search in this index for every item in `values`.
+
+        The values are looked up in ascending order, with duplicates
+        removed.  A ``(tlen, starts, lengths)`` tuple is returned, where
+        `tlen` is the total number of elements found and `starts` and
+        `lengths` have a row with the ranges found for every value (see
+        `get_chunkmap()`).
+
+        """
+
+        values = numpy.unique(numpy.asarray(values)).tolist()
+        starts = numpy.zeros(shape=(len(values), self.nrows),
+                             dtype=numpy.int32)
+        lengths = numpy.zeros(shape=(len(values), self.nrows),
+                              dtype=numpy.int32)
+        tlen = 0
+        deltacoords = [self.deltacoords[:0]]
+        for i, value in enumerate(values):
+            tlen += self.search((value, value))
+            starts[i] = self.starts
+            lengths[i] = self.lengths
+            deltacoords.append(self.deltacoords)
+        self.deltacoords = numpy.concatenate(deltacoords)
+        return (tlen, starts, lengths)
+
+    def _search_delta(self, item):
+        """Get the coordinates of the rows in the delta within `item`."""
+
+        values, coords = self.read_delta()
+        if len(coords) == 0 or not item or item[0] > item[1]:
+            return coords[:0]
+        start = values.searchsorted(item[0], side='left')
+        stop = values.searchsorted(item[1], side='right')
+        return coords[start:stop]
+
+    def read_delta(self):
+        """Get the new values of the rows modified after being indexed.
+
+        A ``(values, coords)`` tuple with the values (in ascending order)
+        and the coordinates of the rows is returned (see
+        `append_delta()`).
+
+        """
+
+        if self._delta is None:
+            if 'sortedDelta' in self:
+                self._delta = (self.sortedDelta[:], self.indicesDelta[:])
+            else:
+                self._delta = (numpy.empty(0, dtype=self.dtype),
+                               numpy.empty(0, dtype=numpy.int64))
+        return self._delta
+
+    def append_delta(self, coords, values):
+        """Keep aside the new `values` of the indexed rows at `coords`.
+
+        Instead of being invalidated, the index keeps the current values
+        of modified rows in a small delta, which is looked up by
+        `search()` as well.  The entries in the slices for these rows are
+        stale, but queries check the rows selected by indexes anyway.
+        The values given before for the same rows are replaced.
+
+        """
+
+        coords = numpy.asarray(coords, dtype=numpy.int64)
+        values = numpy.asarray(values, dtype=self.dtype)
+        dvalues, dcoords = self.read_delta()
+        keep = ~numpy.in1d(dcoords, coords)
+        values = numpy.concatenate((dvalues[keep], values))
+        coords = numpy.concatenate((dcoords[keep], coords))
+        order = numpy.lexsort((coords, values))
+        values, coords = values[order], coords[order]
+        if 'sortedDelta' not in self:
+            EArray(self, 'sortedDelta', Atom.from_dtype(self.dtype), (0,),
+                   "Delta sorted values", self.filters,
+                   byteorder=self.byteorder, _log=False)
+            EArray(self, 'indicesDelta', Int64Atom(), (0,),
+                   "Delta row coordinates", self.filters,
+                   byteorder=self.byteorder, _log=False)
+        for array, data in [(self.sortedDelta, values),
+                            (self.indicesDelta, coords)]:
+            array.truncate(0)
+            array.append(data)
+        self._delta = (values, coords)
+
     # This is an scalar version of search. It works with strings as well.
     def search_scalar(self, item, sorted):
         """Do a binary search in this index for an item."""
@@ -2013,8 +2420,49 @@ class Index(NotLoggedMixin, indexesextension.Index, Group):
 
     searchLastRow = previous_api(search_last_row)
 
-    def get_chunkmap(self):
-        """Compute a map with the interesting chunks in index."""
+    def _read_index_ranges(self, slices, starts, stops):
+        """Read the indices in some ranges of the slices, a batch at a time.
+
+        The arguments are like the return value of `_merge_slice_ranges()`.
+        The ranges in every batch are read at once (see
+        `IndexArray._read_index_ranges()`), and tuples with the indices
+        read and the slices and lengths of their ranges are yielded.
+
+        """
+
+        indsize = self.indsize
+        lengths = (stops - starts).astype('int_')
+        maxelements = max(self._v_file.params['IO_BUFFER_SIZE'] // indsize, 1)
+        # The ranges in the last row are kept in another array
+        nlast = long(slices.searchsorted(self.nslices))
+        first = 0
+        while first < nlast:
+            # Add ranges up to the size of the I/O buffer (but one at least)
+            stop = min(first + max_ranges_per_read, nlast)
+            nelements = numpy.cumsum(lengths[first:stop])
+            last = first + max(nelements.searchsorted(maxelements, 'right'), 1)
+            idx = numpy.empty(shape=lengths[first:last].sum(),
+                              dtype='u%d' % indsize)
+            self.indices._read_index_ranges(
+                slices[first:last], starts[first:last], stops[first:last], idx)
+            yield (idx, slices[first:last], lengths[first:last])
+            first = last
+        for nrange in xrange(nlast, len(slices)):
+            idx = numpy.empty(shape=lengths[nrange], dtype='u%d' % indsize)
+            self.indicesLR._read_index_slice(
+                long(starts[nrange]), long(stops[nrange]), idx)
+            yield (idx, slices[nrange:nrange + 1], lengths[nrange:nrange + 1])
+
+    def get_chunkmap(self, starts=None, lengths=None):
+        """Compute a map with the interesting chunks in index.
+
+        The ranges found by the last search are used, unless `starts`
+        and `lengths` are given.  These may have several rows (see
+        `search_values()`), whose ranges in every slice are merged so
+        that the indices in them are read only once.  The ranges of many
+        slices are read together (see `_read_index_ranges()`).
+
+        """
 
         if profile:
             tref = time()
@@ -2022,39 +2470,35 @@ class Index(NotLoggedMixin, indexesextension.Index, Group):
             show_stats("Entering get_chunkmap", tref)
         ss = self.slicesize
         nsb = self.nslicesblock
-        nslices = self.nslices
         lbucket = self.lbucket
         indsize = self.indsize
         bucketsinblock = float(self.blocksize) / lbucket
         nchunks = long(math.ceil(float(self.nelements) / lbucket))
         chunkmap = numpy.zeros(shape=nchunks, dtype="bool")
         reduction = self.reduction
-        starts = (self.starts - 1) * reduction + 1
-        stops = (self.starts + self.lengths) * reduction
+        if starts is None:
+            starts, lengths = self.starts, self.lengths
+        stops = (starts + lengths) * reduction
+        starts = (starts - 1) * reduction + 1
         starts[starts < 0] = 0    # All negative values set to zero
-        indices = self.indices
-        for nslice in xrange(self.nrows):
-            start = starts[nslice]
-            stop = stops[nslice]
-            if stop > start:
-                idx = numpy.empty(shape=stop - start, dtype='u%d' % indsize)
-                if nslice < nslices:
-                    indices._read_index_slice(nslice, start, stop, idx)
-                else:
-                    self.indicesLR._read_index_slice(start, stop, idx)
-                if indsize == 8:
-                    idx //= lbucket
-                elif indsize == 2:
-                    # The chunkmap size cannot be never larger than 'int_'
-                    idx = idx.astype("int_")
-                    offset = long((nslice // nsb) * bucketsinblock)
-                    idx += offset
-                elif indsize == 1:
-                    # The chunkmap size cannot be never larger than 'int_'
-                    idx = idx.astype("int_")
-                    offset = (nslice * ss) // lbucket
-                    idx += offset
-                chunkmap[idx] = True
+        ranges = _merge_slice_ranges(numpy.atleast_2d(starts),
+                                     numpy.atleast_2d(stops))
+        for idx, slices, lengths in self._read_index_ranges(*ranges):
+            # The offset of the slice of every index, if any
+            offsets = None
+            if indsize == 8:
+                idx //= lbucket
+            elif indsize == 2:
+                offsets = (slices // nsb) * bucketsinblock
+            elif indsize == 1:
+                offsets = (slices * ss) // lbucket
+            if offsets is not None:
+                # The chunkmap size cannot be never larger than 'int_'
+                idx = idx.astype("int_")
+                idx += numpy.repeat(offsets.astype("int_"), lengths)
+            chunkmap[idx] = True
+        # The rows in the delta fulfilling the last search
+        chunkmap[self.deltacoords // lbucket] = True
         # The case lbucket < nrowsinchunk should only happen in tests
         nrowsinchunk = self.nrowsinchunk
         if lbucket != nrowsinchunk:
@@ -2176,6 +2620,756 @@ class Index(NotLoggedMixin, indexesextension.Index, Group):
         return retstr
 
 
+class CompositeIndex(NotLoggedMixin, Group):
+    """Represents an index over several columns of a table.
+
+    Rows are sorted by a key made of the values of the indexed columns,
+    which are compared in order (i.e. lexicographically).  Thus, the rows
+    with the same values in the leading columns and a range of values in
+    the next one have consecutive keys.  The sorted keys are kept in the
+    ``sorted`` array, and the coordinates of their rows in ``indices``.
+
+    Keys are sorted in runs (see `runs`), so that appended rows are
+    indexed without reading the keys already in the index.  The last
+    runs are merged when they hold as many keys as the run before them,
+    so every run is longer than all the following ones together, and a
+    search looks up a few runs only.  Runs are merged reading a buffer
+    of keys of every run at a time (see
+    :data:`tables.parameters.INDEX_SORT_MEMORY`).
+
+    Composite indexes are created with
+    :meth:`Table.create_composite_index`, and the rows appended to the
+    table after the ones they cover are searched without them.
+
+    .. note::
+
+        This class is mainly intended for internal use.
+
+    """
+
+    _c_classid = 'CMPINDEX'
+
+    def __init__(self, parentnode, name, columns=None, keysize=None,
+                 filters=None, expectedrows=0, new=True):
+        self.columns = None
+        """The pathnames of the indexed columns, in key order."""
+        if columns is not None:
+            self.columns = tuple(columns)
+        self.keysize = keysize
+        """The size in bytes of the keys."""
+        self.expectedrows = expectedrows
+        """The expected number of rows to be indexed."""
+        self._runs = None
+        """The cached value of `runs`."""
+        self._bounds = None
+        """Every ``blocksize``-th key of every run, to speed up searches."""
+
+        super(CompositeIndex, self).__init__(
+            parentnode, name, "Composite index", new, filters)
+
+    def _g_post_init_hook(self):
+        super(CompositeIndex, self)._g_post_init_hook()
+        if not self._v_new:
+            self.columns = tuple(str(colname)
+                                 for colname in self._v_attrs.COLUMNS)
+            self.keysize = self.sorted.atom.itemsize
+            return
+
+        self._v_attrs.COLUMNS = self.columns
+        self.runs = [0]
+        filters = self.filters
+        EArray(self, 'sorted', StringAtom(itemsize=self.keysize), (0,),
+               "Sorted keys", filters, self.expectedrows, _log=False)
+        EArray(self, 'indices', Int64Atom(), (0,), "Row coordinates",
+               filters, self.expectedrows, _log=False)
+
+    filters = property(
+        lambda self: self._v_filters, None, None,
+        """Filter properties for this index.""")
+
+    nelements = property(
+        lambda self: self.indices.nrows, None, None,
+        """The number of rows in the index.""")
+
+    blocksize = property(
+        lambda self: self.sorted.chunkshape[0], None, None,
+        """The number of keys read by a search.""")
+
+    nbuffer = property(
+        lambda self: max(self._v_file.params['INDEX_SORT_MEMORY'] //
+                         (self.keysize + 8), 1), None, None,
+        """The number of keys sorted or merged in memory at a time.""")
+
+    def _getruns(self):
+        if self._runs is None:
+            if 'RUNS' in self._v_attrs:
+                self._runs = [long(pos) for pos in self._v_attrs.RUNS]
+            else:
+                # All the keys in a single run
+                self._runs = [0L, self.nelements] if self.nelements else [0L]
+        return list(self._runs)
+
+    def _setruns(self, runs):
+        self._v_attrs.RUNS = numpy.array(runs, dtype=numpy.int64)
+        self._runs = [long(pos) for pos in runs]
+        self._bounds = None
+
+    runs = property(
+        _getruns, _setruns, None,
+        """The positions of the first key of every sorted run, followed by
+        the number of keys.""")
+
+    def _getdirty(self):
+        if 'DIRTY' not in self._v_attrs:
+            return False
+        return self._v_attrs.DIRTY
+
+    def _setdirty(self, dirty):
+        self._v_attrs.DIRTY = bool(dirty)
+
+    dirty = property(
+        _getdirty, _setdirty, None,
+        """Whether the index is dirty or not.
+
+        Dirty indexes are out of sync with column data, so they exist but
+        they are not usable.
+        """)
+
+    def _read_keys(self, table, start, stop):
+        """Get the keys and coordinates of rows from `start` to `stop`."""
+
+        columns = [table._read(start, stop, 1, colname)
+                   for colname in self.columns]
+        keys = _composite_keys(columns)
+        rows = numpy.arange(start, stop, dtype=numpy.int64)
+        order = keys.argsort(kind='mergesort')
+        return keys[order], rows[order]
+
+    def _add_runs(self, table, start, stop):
+        """Add the rows of `table` from `start` to `stop` as new runs.
+
+        Every run holds the keys of `nbuffer` rows at most.
+
+        """
+
+        runs = self.runs
+        nbuffer = self.nbuffer
+        for first in xrange(start, stop, nbuffer):
+            keys, rows = self._read_keys(table, first,
+                                         min(first + nbuffer, stop))
+            self.sorted.append(keys)
+            self.indices.append(rows)
+            runs.append(runs[-1] + len(keys))
+        self.runs = runs
+
+    def _merge_runs(self, first):
+        """Merge the runs from the `first` one on into a single run.
+
+        The runs are read a buffer at a time and the merged keys written
+        to new arrays, which replace the merged runs afterwards.  Keys
+        in earlier runs go before the same keys in later runs.
+
+        """
+
+        runs = self.runs
+        limits = zip(runs[first:-1], runs[first + 1:])
+        nruns = len(limits)
+        if nruns < 2:
+            return
+        sorted, indices = self.sorted, self.indices
+        # Half of the memory goes to the buffers of the runs, the other
+        # half to the batches being merged
+        nbuf = max(self.nbuffer // (2 * nruns), 1)
+        starts = [start for (start, stop) in limits]
+
+        def read_run(j):
+            start = starts[j]
+            stop = min(start + nbuf, limits[j][1])
+            starts[j] = stop
+            return sorted[start:stop], indices[start:stop]
+
+        newsorted = EArray(self, 'newsorted', sorted.atom, (0,),
+                           "Sorted keys", self.filters,
+                           chunkshape=sorted.chunkshape, _log=False)
+        newindices = EArray(self, 'newindices', indices.atom, (0,),
+                            "Row coordinates", self.filters,
+                            chunkshape=indices.chunkshape, _log=False)
+        buffers = [read_run(j) for j in xrange(nruns)]
+        active = range(nruns)
+        while active:
+            # Every buffered key up to the smallest last key in the runs
+            # with keys still to be read can be merged now
+            unread = [j for j in active if starts[j] < limits[j][1]]
+            limit = None
+            if unread:
+                limit = min(buffers[j][0][-1] for j in unread)
+            kbatch, rbatch = [], []
+            for j in active:
+                keys, rows = buffers[j]
+                if limit is None:
+                    n = len(keys)
+                else:
+                    n = keys.searchsorted(limit, 'right')
+                kbatch.append(keys[:n])
+                rbatch.append(rows[:n])
+                if n < len(keys):
+                    buffers[j] = (keys[n:], rows[n:])
+                elif starts[j] < limits[j][1]:
+                    buffers[j] = read_run(j)
+                else:
+                    buffers[j] = None
+            active = [j for j in active if buffers[j] is not None]
+            keys = numpy.concatenate(kbatch)
+            rows = numpy.concatenate(rbatch)
+            if len(keys):
+                order = keys.argsort(kind='mergesort')
+                newsorted.append(keys[order])
+                newindices.append(rows[order])
+            del kbatch, rbatch, keys, rows
+
+        if first == 0:
+            # The new arrays replace the old ones
+            for name in ['sorted', 'indices']:
+                self._f_get_child(name)._f_remove()
+                self._f_get_child('new' + name)._f_rename(name)
+        else:
+            # The merged keys replace the last ones
+            for array, newarray in [(sorted, newsorted),
+                                    (indices, newindices)]:
+                array.truncate(runs[first])
+                for start in xrange(0, newarray.nrows, self.nbuffer):
+                    array.append(newarray[start:start + self.nbuffer])
+                newarray._f_remove()
+        self.runs = runs[:first + 1] + runs[-1:]
+
+    def build(self, table):
+        """Index all the rows in `table` again.
+
+        The keys are sorted in runs of `nbuffer` rows, which are merged
+        afterwards.
+
+        """
+
+        self.sorted.truncate(0)
+        self.indices.truncate(0)
+        self.runs = [0]
+        self._add_runs(table, 0, table.nrows)
+        self._merge_runs(0)
+        self.dirty = False
+
+    def append_rows(self, table):
+        """Add the rows of `table` after the indexed ones to the index.
+
+        The new rows are sorted and merged in a new run, which is merged
+        with the previous runs while they hold as many keys as the runs
+        after them.
+
+        """
+
+        nruns = len(self.runs) - 1
+        self._add_runs(table, self.nelements, table.nrows)
+        runs = self.runs
+        first = min(nruns, len(runs) - 2)
+        while first > 0 and (runs[first] - runs[first - 1]
+                             <= runs[-1] - runs[first]):
+            first -= 1
+        self._merge_runs(first)
+
+    def get_lookup_range(self, dtypes, limits):
+        """Get the keys bounding the rows fulfilling some `limits`.
+
+        `limits` is a list with an inclusive ``(lower, upper)`` tuple of
+        limits (None meaning no limit) for every one of the leading
+        columns of the index, whose NumPy types are in `dtypes`.  All
+        the limits but the last ones must be equalities.  None is
+        returned if no row can fulfill the limits.
+
+        """
+
+        lower, upper = [], []
+        for dtype, (lolimit, uplimit) in zip(dtypes, limits):
+            if lolimit is None:
+                lower.append(b'\x00' * dtype.itemsize)
+            else:
+                lower.append(_composite_keys(
+                    [_limit_value(dtype, lolimit)])[0].ljust(
+                        dtype.itemsize, b'\x00'))
+            if uplimit is None:
+                upper.append(b'\xff' * dtype.itemsize)
+            else:
+                upper.append(_composite_keys(
+                    [_limit_value(dtype, uplimit)])[0].ljust(
+                        dtype.itemsize, b'\x00'))
+        lower = b''.join(lower).ljust(self.keysize, b'\x00')
+        upper = b''.join(upper).ljust(self.keysize, b'\xff')
+        if lower > upper:
+            return None
+        return (lower, upper)
+
+    def _search(self, nrun, key, side):
+        """Get the position of `key` in the `nrun` sorted run of keys.
+
+        The meaning of `side` is the same as in ``numpy.searchsorted()``.
+        Only a block of keys is read from disk.
+
+        """
+
+        blocksize = self.blocksize
+        runs = self.runs
+        if self._bounds is None:
+            self._bounds = [self.sorted[start:stop:blocksize]
+                            for (start, stop) in zip(runs[:-1], runs[1:])]
+        nblock = max(self._bounds[nrun].searchsorted(key, side) - 1, 0)
+        start = runs[nrun] + nblock * blocksize
+        block = self.sorted[start:min(start + blocksize, runs[nrun + 1])]
+        return start + int(block.searchsorted(key, side))
+
+    def search(self, lower, upper):
+        """Get the coordinates of the rows with keys in a range.
+
+        The coordinates of the rows whose keys are between the `lower`
+        and `upper` ones (both included) are returned in ascending order.
+
+        """
+
+        found = []
+        for nrun in xrange(len(self.runs) - 1):
+            start = self._search(nrun, lower, 'left')
+            stop = self._search(nrun, upper, 'right')
+            if start < stop:
+                found.append(self.indices[start:stop])
+        if not found:
+            return numpy.array([], dtype=numpy.int64)
+        rows = numpy.concatenate(found)
+        rows.sort()
+        return rows
+
+    def __repr__(self):
+        return "%s (CompositeIndex for columns %s)\n  nelements := %s\n" \
+               "  dirty := %s" % (self._v_pathname, self.columns,
+                                  self.nelements, self.dirty)
+
+
+class BitmapIndex(NotLoggedMixin, Group):
+    """Represents the bitmap index of a column in a table.
+
+    A bitmap of the rows holding every distinct value of the column is
+    kept, so lookups only read the bitmaps of the values fulfilling a
+    condition, and the bitmaps for several conditions are combined with
+    bitwise operations.  This suits columns with few distinct values
+    (like enumerated, boolean or status columns), for which the other
+    kinds of indexes yield long runs of rows to be mapped to chunks.
+
+    The distinct values are kept in ascending order in the ``values``
+    array and the number of rows with each of them in ``counts``.  The
+    bitmaps are the rows of the ``bitmaps`` array, with 8 table rows per
+    byte as in ``numpy.packbits()``, and they are compressed with the
+    filters of the index.
+
+    Bitmap indexes are created by passing ``kind='bitmap'`` to
+    :meth:`Column.create_index`.  Unlike other indexes, they are updated
+    in place when rows are modified.
+
+    .. note::
+
+        This class is mainly intended for internal use, but some of its
+        documented attributes and methods may be interesting for the
+        programmer.
+
+    """
+
+    _c_classid = 'BITMAPINDEX'
+
+    kind = property(
+        lambda self: 'bitmap', None, None,
+        "The kind of this index.")
+
+    reduction = 1
+    """Bitmaps tell the exact rows with a value."""
+
+    is_csi = False
+    """Bitmap indexes are never completely sorted."""
+
+    filters = Index.filters
+
+    dirty = Index.dirty
+
+    column = Index.column
+
+    table = Index.table
+
+    nelements = property(
+        lambda self: long(self._v_attrs.nelements), None, None,
+        "The number of currently indexed rows for this column.")
+
+    nvalues = property(
+        lambda self: self.values.nrows, None, None,
+        "The number of distinct values in the column.")
+
+    chunkbytes = property(
+        lambda self: int(self._v_attrs.chunkbytes), None, None,
+        "The number of bytes in every chunk of the bitmaps.")
+
+    def __init__(self, parentnode, name, atom=None, title="",
+                 optlevel=None, filters=None, expectedrows=0, new=True):
+        self.optlevel = optlevel
+        """The optimization level for this index (it has no effect on
+        bitmaps)."""
+        self.expectedrows = expectedrows
+        """The expected number of rows to be indexed."""
+        if atom is not None:
+            self.dtype = atom.dtype.base
+            """The type of the values in the column."""
+        self.selection = numpy.empty(0, dtype=numpy.intp)
+        """The bitmaps of the values found by the last search."""
+        self._values = None
+        """The distinct values (see `read_values()`)."""
+        self._counts = None
+        """The number of rows with every distinct value."""
+
+        super(BitmapIndex, self).__init__(parentnode, name, title, new,
+                                          filters)
+
+    def _g_post_init_hook(self):
+        super(BitmapIndex, self)._g_post_init_hook()
+        attrs = self._v_attrs
+        if not self._v_new:
+            self.optlevel = int(attrs.optlevel)
+            self.dtype = self.values.atom.dtype
+            return
+
+        attrs.optlevel = self.optlevel
+        attrs.nelements = 0
+        # Small tables get small chunks, so that modifying a row does
+        # not rewrite a lot of bytes
+        attrs.chunkbytes = min(max(self.expectedrows // 64, 1), 8 * 1024)
+        EArray(self, 'values', Atom.from_dtype(self.dtype), (0,),
+               "Distinct values", self.filters, _log=False)
+        EArray(self, 'counts', Int64Atom(), (0,), "Rows with every value",
+               self.filters, _log=False)
+
+    def _get_colpathname(self):
+        return _table_column_pathname_of_index(self._v_pathname)[1]
+
+    def read_values(self):
+        """Get the distinct values in the column, in ascending order."""
+
+        if self._values is None:
+            self._values = self.values.read()
+            self._counts = self.counts.read()
+        return self._values
+
+    def read_counts(self):
+        """Get the number of rows with every value in `read_values()`."""
+
+        self.read_values()
+        return self._counts
+
+    def _write_counts(self, counts):
+        self.counts[:] = counts
+        self._counts = counts
+
+    def _add_values(self, newvalues):
+        """Add bitmaps for the `newvalues` not in the index yet.
+
+        The bitmaps are copied to a new array with empty bitmaps for the
+        new values in their place, a chunk of every bitmap at a time.
+
+        """
+
+        values = self.read_values()
+        newvalues = numpy.setdiff1d(newvalues, values)
+        if len(newvalues) == 0:
+            return
+        allvalues = numpy.union1d(values, newvalues).astype(self.dtype)
+        maxvalues = self._v_file.params['BITMAP_INDEX_MAX_VALUES']
+        if len(values) <= maxvalues < len(allvalues):
+            warnings.warn("the column of bitmap index ``%s`` has more than "
+                          "%d distinct values now; other kinds of indexes "
+                          "would be faster and smaller"
+                          % (self._v_pathname, maxvalues),
+                          PerformanceWarning)
+        oldrows = allvalues.searchsorted(values)
+        chunkbytes = self.chunkbytes
+        nbytes = (self.nelements + 7) // 8
+        bitmaps = EArray(self, 'newbitmaps', UIntAtom(itemsize=1),
+                         (len(allvalues), 0), "Bitmaps of rows",
+                         self.filters, chunkshape=(1, chunkbytes),
+                         _log=False)
+        for start in xrange(0, nbytes, chunkbytes):
+            stop = min(start + chunkbytes, nbytes)
+            block = numpy.zeros((len(allvalues), stop - start),
+                                dtype=numpy.uint8)
+            block[oldrows] = self.bitmaps[:, start:stop]
+            bitmaps.append(block)
+        counts = numpy.zeros(len(allvalues), dtype=numpy.int64)
+        counts[oldrows] = self.read_counts()
+        if 'bitmaps' in self:
+            self.bitmaps._f_remove()
+        bitmaps._f_rename('bitmaps')
+        for array, data in [(self.values, allvalues), (self.counts, counts)]:
+            array.truncate(0)
+            array.append(data)
+        self._values, self._counts = allvalues, counts
+
+    def _count(self, positions):
+        """Get the number of `positions` of every value."""
+
+        counts = numpy.zeros(len(self._values), dtype=numpy.int64)
+        found = numpy.bincount(positions)
+        counts[:len(found)] = found
+        return counts
+
+    def append(self, arr):
+        """Add the `arr` values of the rows after the indexed ones."""
+
+        arr = numpy.asarray(arr, dtype=self.dtype)
+        if len(arr) == 0:
+            return
+        self._add_values(numpy.unique(arr))
+        positions = self.read_values().searchsorted(arr)
+        nelements = self.nelements
+        # The new bits start in the last byte if it is not full
+        first, offset = divmod(nelements, 8)
+        block = numpy.zeros((len(self._values), (offset + len(arr) + 7) // 8),
+                            dtype=numpy.uint8)
+        bitmaps = self.bitmaps
+        if offset:
+            block[:, :1] = bitmaps[:, first:first + 1]
+        _set_bits(block, positions, numpy.arange(offset, offset + len(arr)))
+        if offset:
+            bitmaps[:, first:first + 1] = block[:, :1]
+            block = block[:, 1:]
+        if block.shape[1]:
+            bitmaps.append(block)
+        self._write_counts(self.read_counts() + self._count(positions))
+        self._v_attrs.nelements = nelements + len(arr)
+
+    def append_rows(self, table, stop):
+        """Add the rows of `table` after the indexed ones up to `stop`."""
+
+        colpathname = self._get_colpathname()
+        nrowsinbuf = table.nrowsinbuf
+        for start in xrange(self.nelements, stop, nrowsinbuf):
+            self.append(table._read(start, min(start + nrowsinbuf, stop), 1,
+                                    colpathname))
+        return self.nelements
+
+    def build(self, table):
+        """Index all the rows in `table`.
+
+        The distinct values in the column are collected first, so that
+        the bitmaps are created just once.  A ValueError is raised if
+        there are more than :data:`tables.parameters.BITMAP_INDEX_MAX_VALUES`
+        of them.
+
+        """
+
+        colpathname = self._get_colpathname()
+        maxvalues = self._v_file.params['BITMAP_INDEX_MAX_VALUES']
+        nrowsinbuf = table.nrowsinbuf
+        values = numpy.empty(0, dtype=self.dtype)
+        for start in xrange(0, table.nrows, nrowsinbuf):
+            values = numpy.union1d(values, table._read(
+                start, min(start + nrowsinbuf, table.nrows), 1, colpathname))
+            if len(values) > maxvalues:
+                raise ValueError(
+                    "column ``%s`` has more than %d distinct values; "
+                    "please use another kind of index for it"
+                    % (colpathname, maxvalues))
+        self._add_values(values)
+        return self.append_rows(table, table.nrows)
+
+    def update_rows(self, coords, values):
+        """Change the bits of the rows at `coords` to their new `values`.
+
+        `coords` must be sorted, with no repeated rows.  Rows not indexed
+        yet are skipped.  Only the chunks of the bitmaps holding the rows
+        are read and written back.
+
+        """
+
+        values = numpy.asarray(values, dtype=self.dtype)
+        indexed = coords < self.nelements
+        coords, values = coords[indexed], values[indexed]
+        if len(coords) == 0:
+            return
+        self._add_values(numpy.unique(values))
+        positions = self.read_values().searchsorted(values)
+        counts = self.read_counts() + self._count(positions)
+        bitmaps = self.bitmaps
+        chunkbytes = self.chunkbytes
+        nbytes = (self.nelements + 7) // 8
+        nchunks = coords // (8 * chunkbytes)
+        chunks = numpy.unique(nchunks)
+        starts = nchunks.searchsorted(chunks, 'left')
+        stops = nchunks.searchsorted(chunks, 'right')
+        for nchunk, cstart, cstop in zip(chunks, starts, stops):
+            start = nchunk * chunkbytes
+            block = bitmaps[:, start:min(start + chunkbytes, nbytes)]
+            bits = coords[cstart:cstop] - start * 8
+            # The old values of the rows are not counted anymore
+            masks = (0x80 >> (bits & 7)).astype(numpy.uint8)
+            counts -= ((block[:, bits >> 3] & masks) != 0).sum(axis=1)
+            _clear_bits(block, bits)
+            _set_bits(block, positions[cstart:cstop], bits)
+            bitmaps[:, start:start + block.shape[1]] = block
+        self._write_counts(counts)
+
+    def get_lookup_range(self, ops, limits):
+        """Get the range of distinct values fulfilling a comparison.
+
+        `ops` and `limits` are like in `Index.get_lookup_range()`.  The
+        ``(start, stop)`` range of the values (in `read_values()`) is
+        returned.
+
+        """
+
+        # Python comparisons work for limits of any numeric type
+        values = self.read_values().tolist()
+        start, stop = 0, len(values)
+        for op, limit in zip(ops, limits):
+            if op in ('gt', 'ge', 'eq'):
+                if op == 'gt':
+                    first = bisect.bisect_right(values, limit)
+                else:
+                    first = bisect.bisect_left(values, limit)
+                start = max(start, first)
+            if op in ('lt', 'le', 'eq'):
+                if op == 'lt':
+                    last = bisect.bisect_left(values, limit)
+                else:
+                    last = bisect.bisect_right(values, limit)
+                stop = min(stop, last)
+        return (start, max(start, stop))
+
+    def search(self, item):
+        """Select the values in the `item` range for `get_chunkmap()`.
+
+        `item` is a range got from `get_lookup_range()`.  The number of
+        rows with the selected values is returned.
+
+        """
+
+        start, stop = item
+        self.selection = numpy.arange(start, stop)
+        return long(self.read_counts()[start:stop].sum())
+
+    def search_values(self, values):
+        """Select the given `values` for `get_chunkmap()`.
+
+        A ``(tlen, selection, None)`` tuple is returned, where `tlen` is
+        the number of rows with the `values` and `selection` holds the
+        positions of the values found in `read_values()` (see
+        `Index.search_values()`).
+
+        """
+
+        allvalues = self.read_values().tolist()
+        selection = []
+        for value in numpy.unique(numpy.asarray(values)).tolist():
+            pos = bisect.bisect_left(allvalues, value)
+            if pos < len(allvalues) and allvalues[pos] == value:
+                selection.append(pos)
+        self.selection = numpy.array(selection, dtype=numpy.intp)
+        tlen = long(self.read_counts()[self.selection].sum())
+        return (tlen, self.selection, None)
+
+    def get_blocks(self, nelements=None):
+        """Get the ranges of bytes of the bitmaps to process at a time.
+
+        A list of ``(start, stop)`` tuples covering the bitmaps of the
+        first `nelements` rows (the indexed ones by default) is
+        returned.  Blocks have a whole number of chunks, and their rows
+        fit in an I/O buffer.
+
+        """
+
+        if nelements is None:
+            nelements = self.nelements
+        nbytes = (nelements + 7) // 8
+        chunkbytes = self.chunkbytes
+        iobuffer = self._v_file.params['IO_BUFFER_SIZE']
+        blockbytes = chunkbytes * max(iobuffer // (8 * chunkbytes), 1)
+        return [(start, min(start + blockbytes, nbytes))
+                for start in xrange(0, nbytes, blockbytes)]
+
+    def read_bitmap(self, selection, start, stop):
+        """Get the union of the bitmaps of the `selection` of values.
+
+        Only the bytes from `start` to `stop` of the bitmaps are read,
+        and the bitmaps of consecutive values are read together (as many
+        as fit in an I/O buffer).
+
+        """
+
+        bitmap = numpy.zeros(stop - start, dtype=numpy.uint8)
+        if len(selection) == 0:
+            return bitmap
+        bitmaps = self.bitmaps
+        iobuffer = self._v_file.params['IO_BUFFER_SIZE']
+        step = max(iobuffer // max(stop - start, 1), 1)
+        for first, last in _merge_ranges(selection, selection + 1):
+            for nrow in xrange(first, last, step):
+                block = bitmaps[nrow:min(nrow + step, last), start:stop]
+                bitmap |= numpy.bitwise_or.reduce(block, axis=0)
+        return bitmap
+
+    def get_coords(self, bitmap, start):
+        """Get the coordinates of the rows set in a `bitmap`.
+
+        `bitmap` holds the bits from byte `start` on (see
+        `read_bitmap()`).  Rows not indexed are never returned.
+
+        """
+
+        coords = numpy.unpackbits(bitmap).nonzero()[0] + long(start) * 8
+        return coords[coords < self.nelements]
+
+    def get_chunkmap(self, starts=None, lengths=None):
+        """Compute a map with the chunks holding the rows found.
+
+        The values selected by the last search are used, unless another
+        selection of them is given in `starts` (see `search_values()`);
+        `lengths` is not used.
+
+        """
+
+        if starts is None:
+            starts = self.selection
+        nrowsinchunk = self.table.chunkshape[0]
+        nchunks = long(math.ceil(float(self.nelements) / nrowsinchunk))
+        chunkmap = numpy.zeros(shape=nchunks, dtype="bool")
+        for start, stop in self.get_blocks():
+            coords = self.get_coords(self.read_bitmap(starts, start, stop),
+                                     start)
+            chunkmap[coords // nrowsinchunk] = True
+        return chunkmap
+
+    def _f_remove(self, recursive=False):
+        """Remove this BitmapIndex object."""
+
+        # Index removal is always recursive,
+        # no matter what `recursive` says.
+        super(BitmapIndex, self)._f_remove(True)
+
+    def __str__(self):
+        """This provides a more compact representation than __repr__"""
+
+        filters = ""
+        if self.filters.complevel:
+            if self.filters.shuffle:
+                filters += ", shuffle"
+            filters += ", %s(%s)" % (self.filters.complib,
+                                     self.filters.complevel)
+        return "BitmapIndex(%d values%s)" % (self.nvalues, filters)
+
+    def __repr__(self):
+        return "%s (BitmapIndex for column %s)\n  nelements := %s\n" \
+               "  nvalues := %s\n  dirty := %s" % (
+                   self._v_pathname, self._get_colpathname(),
+                   self.nelements, self.nvalues, self.dirty)
+
 class IndexesDescG(NotLoggedMixin, Group):
     _c_classid = 'DINDEX'
 
@@ -396,6 +396,7 @@ cdef class ObjectCache(BaseCache):
   # size can be the exact size of the value object or an estimation.
   cdef long setitem_(self, object key, object value, long size):
     cdef long nslot
+    cdef ObjectNode node
 
     if self.nslots == 0:   # The cache has been set to empty
       return -1
@@ -408,7 +409,12 @@ cdef class ObjectCache(BaseCache):
     if size > self.maxobjsize:  # Check if the object is too large
       return -1
     if self.checkhitratio():
-      nslot = self.nextslot
+      node = self.__dict.get(key)
+      if node is not <ObjectNode>None:
+        # Replace the existing item
+        nslot = node.nslot
+      else:
+        nslot = self.nextslot
       self.updateslot_(nslot, size, key, value)
     else:
       # Empty the cache because it is not effective and it is taking space
@@ -558,9 +564,9 @@ cdef class NumCache(BaseCache):
       if self.nextslot == self.nslots:
         # Get the least recently used slot
         nslot = self.atimes.argmin()
-        # Remove the slot from the dict
+        # Remove the slot from the dict (it may have been deleted already)
         key2 = self.keys[nslot]
-        del self.__dict[key2]
+        self.__dict.pop(key2, None)
         self.nextslot = self.nextslot - 1
       else:
         # Get the next slot available
@@ -598,6 +604,17 @@ cdef class NumCache(BaseCache):
   def getitem(self, long nslot, ndarray nparr, long start):
     self.getitem_(nslot, nparr.data, start)
 
+  def delitem(self, long long key):
+    """Remove the item with the given key from the cache (if there)."""
+
+    cdef object nslot
+
+    nslot = self.__dict.pop(key, None)
+    if nslot is not None:
+      self.keys[nslot] = -1
+      # Make this slot the first one to be reused
+      self.ratimes[nslot] = 0
+
   # This version copies data in cache to data+start.
   # The user should be responsible to provide a large enough data buffer
   # to keep all the data.
@@ -189,6 +189,15 @@ BUFFER_TIMES = 100
 """The maximum buffersize/rowsize ratio before issuing a
 :exc:`tables.PerformanceWarning`."""
 
+IO_PREFETCH = False
+"""Read the next I/O buffer in a background thread while the current one
+is being consumed by table iterators (see :meth:`tables.Table.iterrows`,
+:meth:`tables.Table.where` and :meth:`tables.Column.__iter__`), so that
+decompression overlaps with the processing of rows.  As HDF5 is not
+thread-safe, background reads are serialized with the ones of other
+iterators and of :mod:`tables.aio`, and they are waited for when the
+loop ends or is broken out of, and when the table is closed."""
+
 
 # Miscellaneous
 # -------------
@@ -227,6 +236,51 @@ your machine. In general, it is a good idea to set this to the number of
 cores in your machine or, when your machine has many of them (e.g. > 4),
 perhaps one less than this."""
 
+MAX_QUERY_THREADS = 1
+"""The maximum number of threads that PyTables should use for evaluating
+in-kernel queries (see :meth:`tables.Table.read_where` and
+:meth:`tables.Table.get_where_list`).  Each thread
+evaluates the condition on a different I/O buffer of the table and the
+results are merged in row order.  As neither HDF5 nor Numexpr are
+thread-safe, reads and evaluations are still serialized, so this mainly
+helps by reading a buffer while the condition is evaluated on another
+one (which Numexpr does with its own threads).  The default of 1
+disables parallel scans.  If `None`, it is automatically set
+to the number of cores in your machine."""
+
+MAX_INDEX_THREADS = 1
+"""The maximum number of threads that PyTables should use for sorting
+the slices of an index while it is being built (see
+:meth:`tables.Column.create_index`).  Slices are read and the results
+saved by a single thread, as HDF5 is not thread-safe, while the sorts
+run concurrently.  The default of 1 disables parallel builds.  If
+`None`, it is automatically set to the number of cores in your
+machine."""
+
+INDEX_SORT_MEMORY = 64 * _MB
+"""The approximate amount of memory (in bytes) used for merging the
+sorted slices of an index when it is brought into a completely sorted
+state (see :meth:`tables.Column.create_csindex`).  In any case, a chunk
+of every slice is kept in memory.  It also bounds the keys sorted and
+merged at a time by composite indexes (see
+:meth:`tables.Table.create_composite_index`)."""
+
+INDEX_DELTA_MAX_ELEMENTS = 10 * _KB
+"""The maximum number of modified rows whose new values are kept aside
+in an index, instead of invalidating it (see
+:meth:`tables.Table.modify_rows`).  When there is no room left for the
+rows being modified, the index is rebuilt (if the table has automatic
+indexing enabled) or marked as dirty.  Full indexes are always handled
+this way, as they are used for reading tables in sorted order."""
+
+BITMAP_INDEX_MAX_VALUES = 1024
+"""The maximum number of distinct values in a column for creating a
+bitmap index on it (see :meth:`tables.Column.create_index`).  Every
+distinct value takes a bitmap of the rows, so other kinds of indexes are
+faster and smaller for columns with more values than this.  A
+:exc:`tables.PerformanceWarning` is issued when rows appended to a
+column with a bitmap index bring it past this limit."""
+
 USER_BLOCK_SIZE = 0
 """Sets the user block size of a file.
 
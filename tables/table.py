@@ -15,6 +15,8 @@
 import sys
 import math
 import warnings
+import threading
+import itertools
 import os.path
 from time import time
 from functools import reduce as _reduce
@@ -25,13 +27,16 @@ import numexpr
 from tables import tableextension
 from tables.lrucacheextension import ObjectCache, NumCache
 from tables.atom import Atom
-from tables.conditions import compile_condition
+from tables.conditions import (compile_condition, call_on_recarr,
+                               split_membership_tests, MembershipTest)
 from numexpr.necompiler import (
     getType as numexpr_getType, double, is_cpu_amd_intel)
 from numexpr.expressions import functions as numexpr_functions
 from tables.flavor import flavor_of, array_as_internal, internal_to_flavor
-from tables.utils import is_idx, lazyattr, SizeType, NailedDict as CacheDict
+from tables.utils import (is_idx, lazyattr, SizeType, NailedDict as CacheDict,
+                          hdf5_lock, numexpr_lock)
 from tables.leaf import Leaf
+from tables.earray import EArray
 from tables.description import (
     IsDescription, Description, Col, descr_from_dtype)
 from tables.exceptions import (NodeError, HDF5ExtError, PerformanceWarning,
@@ -41,7 +46,7 @@ from tables.utilsextension import get_nested_field
 from tables.path import join_path, split_path
 from tables.index import (
     OldIndex, default_index_filters, default_auto_index, Index, IndexesDescG,
-    IndexesTableG)
+    IndexesTableG, CompositeIndex, BitmapIndex)
 
 profile = False
 # profile = True  # Uncomment for profiling
@@ -103,6 +108,19 @@ if hasattr(numpy, 'complex256'):
 # The NumPy scalar type corresponding to `SizeType`.
 _npsizetype = numpy.array(SizeType(0)).dtype.type
 
+# The reductions supported by `Table.aggregate_where()`.
+_reduction_ops = frozenset(['count', 'sum', 'min', 'max', 'mean'])
+
+# The ufuncs combining the partial results of reductions over groups.
+# Counts are kept apart and means are computed from sums.
+_reduction_ufuncs = {'sum': numpy.add, 'mean': numpy.add,
+                     'min': numpy.minimum, 'max': numpy.maximum}
+
+# The bits per row and the hash functions of Bloom filters for chunks
+# (about 1% of false positives).
+_bloom_bits_per_row = 10
+_bloom_nhashes = 7
+
 
 def _index_name_of(node):
     return '_i_%s' % node._v_name
@@ -122,6 +140,15 @@ def _index_pathname_of_column(table, colpathname):
 
 _indexPathnameOfColumn = previous_api(_index_pathname_of_column)
 
+
+def _composite_index_name_of(columns):
+    return '_composite_' + '__'.join(
+        colname.replace('/', '_') for colname in columns)
+
+
+def _chunkfilter_name_of(kind, colpathname):
+    return '_%s_%s' % (kind, colpathname.replace('/', '_'))
+
 # The next are versions that work with just paths (i.e. we don't need
 # a node instance for using them, which can be critical in certain
 # situations)
@@ -218,8 +245,70 @@ def restorecache(self):
     self._dirtycache = False
 
 
+def _table__seqcache_key(self, condition, condvars, start, stop, step):
+    """Get the key of a query in the sequence cache.
+
+    Queries reaching the end of the table get None as their `stop`, so
+    that their cached sequences can be extended after appending rows
+    (see `_table__extend_seq()`).
+
+    """
+
+    # Get the values in expression that are not columns
+    values = []
+    for key, value in condvars.iteritems():
+        if isinstance(value, numpy.ndarray):
+            if value.ndim == 0:
+                values.append((key, value.item()))
+            else:  # e.g. the values of a membership test
+                values.append((key, value.dtype.str, value.tostring()))
+    if stop == self.nrows:
+        stop = None
+    return (condition, tuple(values), (start, stop, step))
+
+
+def _table__extend_seq(self, compiled, condvars, seq, seqnrows,
+                       start, stop, step):
+    """Extend a cached sequence with the rows appended after it.
+
+    `seq` holds the coordinates of the rows fulfilling the condition up
+    to row `seqnrows`.  Only the rows from there to `stop` are scanned
+    (with an in-kernel query), and the complete sequence is returned.
+
+    """
+
+    # The first row in the new range which is also in the step
+    first = seqnrows + (start - seqnrows) % step
+    if first >= stop:
+        return seq
+    self._use_index = False
+    args = [condvars[param] for param in compiled.parameters]
+    self._where_condition = (compiled.function, args)
+    row = tableextension.Row(self)
+    row._iter(first, stop, step)
+    coords = [seq]
+    buf = row._next_buffer()
+    while buf is not None:
+        coords.append(buf[0].astype('int64'))
+        buf = row._next_buffer()
+    return numpy.concatenate(coords)
+
+
 def _table__where_indexed(self, compiled, condition, condvars,
-                          start, stop, step):
+                          start, stop, step, plan=None):
+    """Compute the chunkmap for the indexed part of a query.
+
+    A ``(chunkmap, seq)`` tuple is returned.  If the result of the query
+    is already known (i.e. it was found in the sequence cache or indexes
+    yield no candidates), `chunkmap` is None and `seq` is an array with
+    the matching row coordinates.  Otherwise, `seq` is None.
+
+    If a `plan` dictionary is given (see `Table.explain_where()`), the
+    sequence cache hit, the number of candidates of every index
+    expression and the density of the chunkmap are recorded in it.
+
+    """
+
     if profile:
         tref = time()
     if profile:
@@ -229,27 +318,32 @@ def _table__where_indexed(self, compiled, condition, condvars,
     if self._dirtycache:
         restorecache(self)
 
-    # Get the values in expression that are not columns
-    values = []
-    for key, value in condvars.iteritems():
-        if isinstance(value, numpy.ndarray):
-            values.append((key, value.item()))
     # Build a key for the sequence cache
-    seqkey = (condition, tuple(values), (start, stop, step))
+    seqkey = _table__seqcache_key(self, condition, condvars,
+                                  start, stop, step)
     # Do a lookup in sequential cache for this query
     nslot = self._seqcache.getslot(seqkey)
+    if plan is not None:
+        plan['seqcache_hit'] = nslot >= 0
     if nslot >= 0:
-        # Get the row sequence from the cache
-        seq = self._seqcache.getitem(nslot)
-        if len(seq) == 0:
-            return iter([])
+        # Get the row sequence from the cache, along with the number of
+        # rows in the table when it was computed
+        seqnrows, seq = self._seqcache.getitem(nslot)
         # seq is a list.
         seq = numpy.array(seq, dtype='int64')
+        if seqnrows < stop:
+            # Rows have been appended since, so only scan them
+            seq = _table__extend_seq(self, compiled, condvars, seq, seqnrows,
+                                     start, stop, step)
+            if len(seq) < self._v_file.params['ITERSEQ_MAX_ELEMENTS']:
+                self._seqcache.setitem(seqkey, (stop, seq), len(seq) * 8)
+        if len(seq) == 0:
+            return None, seq
         # Correct the ranges in cached sequence
         if (start, stop, step) != (0, self.nrows, 1):
             seq = seq[(seq >= start) & (
                 seq < stop) & ((seq - start) % step == 0)]
-        return self.itersequence(seq)
+        return None, seq
     else:
         # No luck.  self._seqcache will be populated
         # in the iterator if possible. (Row._finish_riterator)
@@ -257,10 +351,37 @@ def _table__where_indexed(self, compiled, condition, condvars,
 
     # Compute the chunkmap for every index in indexed expression
     idxexprs = compiled.index_expressions
+    if all(isinstance(condvars[idxexpr[0]].index, BitmapIndex)
+           for idxexpr in idxexprs):
+        # The bitmaps can be combined row by row
+        return _table__where_bitmaps(self, compiled, condvars, seqkey,
+                                     start, stop, step, plan)
+    chunkmap = _table__index_chunkmap(self, compiled, condvars, plan)
+    if chunkmap is None or not chunkmap.any():
+        # The chunkmap is all False, so the result is empty
+        self._seqcache.setitem(seqkey, (stop, []), 1)
+        return None, numpy.array([], dtype='int64')
+
+    if profile:
+        show_stats("Exiting table_whereIndexed", tref)
+    return chunkmap, None
+
+
+def _table__index_chunkmap(self, compiled, condvars, plan=None):
+    """Compute the chunkmap selected by the indexes of a query.
+
+    The indexes of the expressions in `compiled` are searched and their
+    chunkmaps are combined, but no rows are read.  None is returned if
+    the indexes yield no candidates at all.  If a `plan` dictionary is
+    given, the number of candidates of every index expression and the
+    density of the chunkmap are recorded in it.
+
+    """
+
     strexpr = compiled.string_expression
     cmvars = {}
     tcoords = 0
-    for i, idxexpr in enumerate(idxexprs):
+    for i, idxexpr in enumerate(compiled.index_expressions):
         var, ops, lims = idxexpr
         col = condvars[var]
         index = col.index
@@ -268,9 +389,16 @@ def _table__where_indexed(self, compiled, condition, condvars,
         assert not index.dirty, "the chosen column has a dirty index"
 
         # Get the number of rows that the indexed condition yields.
-        range_ = index.get_lookup_range(ops, lims)
-        ncoords = index.search(range_)
+        starts = lengths = None
+        if ops == ('isin',):
+            # A membership test is a batch of point lookups
+            ncoords, starts, lengths = index.search_values(lims[0])
+        else:
+            range_ = index.get_lookup_range(ops, lims)
+            ncoords = index.search(range_)
         tcoords += ncoords
+        if plan is not None:
+            plan['index_expressions'][i]['candidates'] = ncoords
         if index.reduction == 1 and ncoords == 0:
             # No values from index condition, thus the chunkmap should be empty
             nrowsinchunk = self.chunkshape[0]
@@ -278,27 +406,190 @@ def _table__where_indexed(self, compiled, condition, condvars,
             chunkmap = numpy.zeros(shape=nchunks, dtype="bool")
         else:
             # Get the chunkmap from the index
-            chunkmap = index.get_chunkmap()
+            chunkmap = index.get_chunkmap(starts, lengths)
         # Assign the chunkmap to the cmvars dictionary
         cmvars["e%d" % i] = chunkmap
 
     if index.reduction == 1 and tcoords == 0:
-        # No candidates found in any indexed expression component, so leave now
-        self._seqcache.setitem(seqkey, [], 1)
-        return iter([])
+        # No candidates found in any indexed expression component
+        return None
 
     # Compute the final chunkmap
     chunkmap = numexpr.evaluate(strexpr, cmvars)
+    if plan is not None:
+        nselected = int(chunkmap.sum())
+        plan['chunkmap'] = {
+            'nchunks': len(chunkmap),
+            'selected': nselected,
+            'density': float(nselected) / len(chunkmap),
+        }
+    return chunkmap
+
+_table__whereIndexed = previous_api(_table__where_indexed)
+
+
+def _combine_bitmaps(strexpr, bitmaps):
+    """Combine the `bitmaps` of index expressions as `strexpr` says.
+
+    `bitmaps` maps the variables of the expressions (``e0``, ``e1``...)
+    to their bitmaps.  The expression is built by
+    `conditions._get_idx_expr()` like ``((e0 & e1) | e2)``, i.e. the
+    operations are applied from left to right.
+
+    """
+
+    terms = strexpr.replace('(', ' ').replace(')', ' ').split()
+    bitmap = bitmaps[terms[0]]
+    for op, var in zip(terms[1::2], terms[2::2]):
+        if op == '&':
+            bitmap = bitmap & bitmaps[var]
+        elif op == '|':
+            bitmap = bitmap | bitmaps[var]
+        else:
+            raise ValueError("unsupported operator in index expression: %r"
+                             % op)
+    return bitmap
+
+
+def _table__where_bitmaps(self, compiled, condvars, seqkey,
+                          start, stop, step, plan=None):
+    """Compute the chunkmap for a query with just bitmap indexes.
+
+    This is the part of `_table__where_indexed()` for conditions whose
+    index expressions are all on columns with bitmap indexes (see
+    `BitmapIndex`).  The bitmaps of the values selected by every
+    expression are combined with the same AND and OR operations as the
+    expressions, a block of rows at a time, so only the chunks with rows
+    fulfilling the whole indexed part of the condition are selected.  If
+    these rows fit in an I/O buffer, the condition is checked on them
+    alone and their coordinates are returned instead.  The return value
+    is like in `_table__where_indexed()`.
+
+    """
+
+    maxcoords = self.nrowsinbuf
+    chunkmap, coords, nelements = _table__bitmaps_chunkmap(
+        self, compiled, condvars, plan, maxcoords)
     if not chunkmap.any():
         # The chunkmap is all False, so the result is empty
-        self._seqcache.setitem(seqkey, [], 1)
-        return iter([])
+        self._seqcache.setitem(seqkey, (stop, []), 1)
+        return None, numpy.array([], dtype='int64')
+    if coords is None:
+        return chunkmap, None
+
+    # Few rows, so they are read by their coordinates
+    self._seqcache_key = None
+    coords = coords[(coords >= start) & (coords < stop)
+                    & ((coords - start) % step == 0)]
+    seq = self._where_in_coords(compiled, condvars, coords)
+    # The rows appended after the indexed ones are scanned
+    seq = _table__extend_seq(self, compiled, condvars, seq,
+                             max(nelements, start), start, stop, step)
+    if len(seq) < self._v_file.params['ITERSEQ_MAX_ELEMENTS']:
+        self._seqcache.setitem(seqkey, (stop, seq), len(seq) * 8)
+    return None, seq
+
+
+def _table__bitmaps_chunkmap(self, compiled, condvars, plan=None,
+                             maxcoords=-1):
+    """Compute the chunkmap selected by the bitmap indexes of a query.
+
+    This is the part of `_table__where_bitmaps()` that only reads the
+    bitmaps.  A ``(chunkmap, coords, nelements)`` tuple is returned,
+    where `coords` holds the coordinates of the indexed rows selected by
+    the bitmaps if they are `maxcoords` at most (None otherwise), and
+    `nelements` is the number of indexed rows.  The `plan` argument is
+    like in `_table__index_chunkmap()`.
 
-    if profile:
-        show_stats("Exiting table_whereIndexed", tref)
-    return chunkmap
+    """
 
-_table__whereIndexed = previous_api(_table__where_indexed)
+    selections = []
+    for i, (var, ops, lims) in enumerate(compiled.index_expressions):
+        index = condvars[var].index
+        assert not index.dirty, "the chosen column has a dirty index"
+        if ops == ('isin',):
+            ncoords, selection, _ = index.search_values(lims[0])
+        else:
+            ncoords = index.search(index.get_lookup_range(ops, lims))
+            selection = index.selection
+        if plan is not None:
+            plan['index_expressions'][i]['candidates'] = ncoords
+        selections.append((index, selection))
+
+    nelements = min(index.nelements for index, selection in selections)
+    nrowsinchunk = self.chunkshape[0]
+    nchunks = long(math.ceil(float(self.nrows) / nrowsinchunk))
+    chunkmap = numpy.zeros(shape=nchunks, dtype="bool")
+    if nelements < self.nrows:
+        # The rows not indexed yet must be scanned
+        chunkmap[nelements // nrowsinchunk:] = True
+    ncoords = 0
+    coords = [numpy.array([], dtype=SizeType)]
+    cmvars = {}
+    first = selections[0][0]
+    for bstart, bstop in first.get_blocks(nelements):
+        for i, (index, selection) in enumerate(selections):
+            cmvars["e%d" % i] = index.read_bitmap(selection, bstart, bstop)
+        bitmap = _combine_bitmaps(compiled.string_expression, cmvars)
+        bcoords = first.get_coords(bitmap, bstart)
+        bcoords = bcoords[bcoords < nelements]
+        chunkmap[bcoords // nrowsinchunk] = True
+        if ncoords <= maxcoords:
+            coords.append(bcoords)
+            ncoords += len(bcoords)
+    if plan is not None:
+        nselected = int(chunkmap.sum())
+        plan['chunkmap'] = {
+            'nchunks': len(chunkmap),
+            'selected': nselected,
+            'density': float(nselected) / max(len(chunkmap), 1),
+        }
+    if ncoords > maxcoords:
+        return chunkmap, None, nelements
+    return chunkmap, numpy.concatenate(coords), nelements
+
+
+def _expand_ranges(starts, stops):
+    """Concatenate the ``arange(start, stop)`` for every range."""
+
+    lengths = stops - starts
+    offsets = numpy.arange(lengths.sum()) - numpy.repeat(
+        numpy.cumsum(lengths) - lengths, lengths)
+    return numpy.repeat(starts, lengths) + offsets
+
+
+def _join_records(lrecords, lkeys, rrecords, rkeys, how, dtype, rfields,
+                  rdflts):
+    """Pair every row in `lrecords` with the `rrecords` with its key.
+
+    `rkeys` must be sorted, and `rrecords` be in the same order.  The
+    joined rows are returned in a structured array with `dtype`, where
+    `rfields` is a list of ``(name, newname)`` tuples mapping the fields
+    of `rrecords` to their names.  If `how` is ``'left'``, rows without
+    a match get the `rdflts` record (zeros if None) in those fields.
+
+    """
+
+    lo = numpy.searchsorted(rkeys, lkeys, 'left')
+    hi = numpy.searchsorted(rkeys, lkeys, 'right')
+    counts = hi - lo
+    if how == 'left':
+        nmatches = numpy.maximum(counts, 1)
+    else:
+        nmatches = counts
+    ridx = _expand_ranges(lo, lo + nmatches)
+    matched = ridx < numpy.repeat(hi, nmatches)
+    lidx = numpy.repeat(numpy.arange(len(lkeys)), nmatches)
+    ridx = ridx[matched]
+    joined = numpy.zeros(len(lidx), dtype=dtype)
+    for name in lrecords.dtype.names:
+        joined[name] = lrecords[name][lidx]
+    for name, newname in rfields:
+        values = joined[newname]
+        values[matched] = rrecords[name][ridx]
+        if rdflts is not None and len(ridx) < len(lidx):
+            values[~matched] = rdflts[name][0]
+    return joined
 
 
 def create_indexes_table(table):
@@ -321,7 +612,7 @@ createIndexesDescr = previous_api(create_indexes_descr)
 
 
 def _column__create_index(self, optlevel, kind, filters, tmp_dir,
-                          blocksizes, verbose):
+                          blocksizes, verbose, nthreads=None, progress=None):
     name = self.name
     table = self.table
     dtype = self.dtype
@@ -344,6 +635,9 @@ def _column__create_index(self, optlevel, kind, filters, tmp_dir,
         raise TypeError("complex columns can not be indexed")
     if dtype.shape != ():
         raise TypeError("multidimensional columns can not be indexed")
+    if kind == 'bitmap' and dtype.kind not in 'biuS':
+        raise TypeError("bitmap indexes are only supported for integer, "
+                        "boolean and string columns")
 
     # Get the indexes group for table, and if not exists, create it
     try:
@@ -377,6 +671,23 @@ def _column__create_index(self, optlevel, kind, filters, tmp_dir,
     if table.nrows > expectedrows:
         expectedrows = table.nrows
 
+    if kind == 'bitmap':
+        index = BitmapIndex(
+            idgroup, name, atom=atom,
+            title="Bitmap index for %s column" % name,
+            optlevel=optlevel,
+            filters=filters,
+            expectedrows=expectedrows)
+        try:
+            indexedrows = index.build(table)
+        except ValueError:
+            index._f_remove()
+            raise
+        table._set_column_indexing(self.pathname, True)
+        table._indexedrows = indexedrows
+        table._unsaved_indexedrows = table.nrows - indexedrows
+        return indexedrows
+
     # Create the index itself
     index = Index(
         idgroup, name, atom=atom,
@@ -396,7 +707,8 @@ def _column__create_index(self, optlevel, kind, filters, tmp_dir,
     # Add rows to the index if necessary
     if table.nrows > 0:
         indexedrows = table._add_rows_to_index(
-            self.pathname, 0, table.nrows, lastrow=True, update=False)
+            self.pathname, 0, table.nrows, lastrow=True, update=False,
+            nthreads=nthreads)
     else:
         indexedrows = 0
     index.dirty = False
@@ -404,7 +716,7 @@ def _column__create_index(self, optlevel, kind, filters, tmp_dir,
     table._unsaved_indexedrows = table.nrows - indexedrows
 
     # Optimize the index that has been already filled-up
-    index.optimize(verbose=verbose)
+    index.optimize(verbose=verbose, progress=progress)
 
     # We cannot do a flush here because when reindexing during a
     # flush, the indexes are created anew, and that creates a nested
@@ -426,6 +738,252 @@ class _ColIndexes(dict):
         return '{\n  %s}' % (',\n  '.join(rep))
 
 
+class _ZoneMap(object):
+    """Minimum and maximum values of a column in every chunk of a table.
+
+    NaN values are ignored, so chunks full of them get NaN bounds and are
+    never selected by comparisons (see `get_chunkmap()`).  The bounds are
+    saved in an `EArray` with a row per chunk (see `save()`).
+
+    """
+
+    kind = 'zonemap'
+    """The kind of chunk filter (used in the names of their nodes)."""
+
+    def __init__(self, dtype):
+        self.mins = numpy.empty(0, dtype=dtype)
+        """The minimum values (only the first `nchunks` are used)."""
+        self.maxs = numpy.empty(0, dtype=dtype)
+        """The maximum values (only the first `nchunks` are used)."""
+        self.nchunks = 0
+        """The number of chunks covered."""
+        self.nsaved = 0
+        """The number of chunks saved and not changed since."""
+
+    def reset(self):
+        """Forget about all the chunks."""
+
+        self.__init__(self.mins.dtype)
+
+    def get_node_shape(self):
+        """Get the atom and shape of an empty node for saving the bounds."""
+
+        return Atom.from_dtype(self.mins.dtype), (0, 2)
+
+    def load(self, node):
+        """Load the bounds saved in `node`."""
+
+        bounds = node.read()
+        self.mins = bounds[:, 0].copy()
+        self.maxs = bounds[:, 1].copy()
+        self.nchunks = self.nsaved = len(bounds)
+
+    def save(self, node):
+        """Save the bounds of the chunks changed since the last save."""
+
+        if node.nrows > self.nsaved:
+            node.truncate(self.nsaved)
+        if self.nchunks > self.nsaved:
+            node.append(numpy.column_stack(
+                (self.mins[self.nsaved:self.nchunks],
+                 self.maxs[self.nsaved:self.nchunks])))
+        self.nsaved = self.nchunks
+
+    def update(self, nrow, values, chunksize):
+        """Merge the `values` of the rows starting at `nrow`.
+
+        The bounds of the chunks already covered are widened if needed,
+        so they stay valid (if not tight) after a truncation.  False is
+        returned if some rows before `nrow` are not covered.
+
+        """
+
+        first = nrow // chunksize
+        if nrow > self.nchunks * chunksize:
+            return False
+        if len(values) == 0:
+            return True
+        # Split the values at the chunk boundaries
+        bounds = numpy.arange(first * chunksize - nrow, len(values),
+                              chunksize)
+        bounds[0] = 0
+        mins = numpy.fmin.reduceat(values, bounds)
+        maxs = numpy.fmax.reduceat(values, bounds)
+        last = first + len(bounds)
+        if last > len(self.mins):
+            # Grow the arrays in a geometric way
+            size = max(last, 2 * len(self.mins))
+            for name in ('mins', 'maxs'):
+                old = getattr(self, name)
+                new = numpy.empty(size, dtype=old.dtype)
+                new[:self.nchunks] = old[:self.nchunks]
+                setattr(self, name, new)
+        nold = min(self.nchunks, last)
+        self.nsaved = min(self.nsaved, first)
+        self.mins[first:nold] = numpy.fmin(self.mins[first:nold],
+                                           mins[:nold - first])
+        self.maxs[first:nold] = numpy.fmax(self.maxs[first:nold],
+                                           maxs[:nold - first])
+        self.mins[nold:last] = mins[nold - first:]
+        self.maxs[nold:last] = maxs[nold - first:]
+        self.nchunks = max(self.nchunks, last)
+        return True
+
+    def get_chunkmap(self, ops, limits, nchunks):
+        """Get the chunks which may hold values fulfilling a comparison.
+
+        The `ops` and `limits` are like the ones of index expressions
+        (see ``compile_condition()`` in the ``conditions`` module).
+
+        """
+
+        mins, maxs = self.mins[:nchunks], self.maxs[:nchunks]
+        if ops == ('isin',):
+            values = numpy.unique(numpy.asarray(limits[0]))
+            return (numpy.searchsorted(values, mins, 'left') <
+                    numpy.searchsorted(values, maxs, 'right'))
+        chunkmap = numpy.ones(nchunks, dtype=bool)
+        for op, limit in zip(ops, limits):
+            if op == 'lt':
+                chunkmap &= mins < limit
+            elif op == 'le':
+                chunkmap &= mins <= limit
+            elif op == 'gt':
+                chunkmap &= maxs > limit
+            elif op == 'ge':
+                chunkmap &= maxs >= limit
+            else:  # eq
+                chunkmap &= (mins <= limit) & (maxs >= limit)
+        return chunkmap
+
+
+class _BloomFilter(object):
+    """Bloom filters of the values of a string column in every chunk.
+
+    Every chunk of the table gets a filter with `nbits` bits, where each
+    value sets the bits given by `_bloom_nhashes` hash functions.  A
+    chunk can only hold a value if all of its bits are set, so equality
+    comparisons can skip the rest of chunks (see `get_chunkmap()`).  The
+    filters are saved in an `EArray` with a row per chunk (see `save()`).
+
+    """
+
+    kind = 'bloomfilter'
+    """The kind of chunk filter (used in the names of their nodes)."""
+
+    def __init__(self, itemsize, chunksize):
+        self.itemsize = itemsize
+        """The size of the strings in the column."""
+        self.nbits = 8 * ((chunksize * _bloom_bits_per_row + 7) // 8)
+        """The number of bits in the filter of a chunk."""
+        self.reset()
+
+    def reset(self):
+        """Forget about all the chunks."""
+
+        self.bits = numpy.zeros((0, self.nbits // 8), dtype=numpy.uint8)
+        """The filters (only the first `nchunks` rows are used)."""
+        self.nchunks = 0
+        """The number of chunks covered."""
+        self.nsaved = 0
+        """The number of chunks saved and not changed since."""
+
+    def get_node_shape(self):
+        """Get the atom and shape of an empty node for saving the filters."""
+
+        return Atom.from_dtype(self.bits.dtype), (0, self.nbits // 8)
+
+    def load(self, node):
+        """Load the filters saved in `node`."""
+
+        self.bits = node.read()
+        self.nchunks = self.nsaved = len(self.bits)
+
+    def save(self, node):
+        """Save the filters of the chunks changed since the last save."""
+
+        if node.nrows > self.nsaved:
+            node.truncate(self.nsaved)
+        if self.nchunks > self.nsaved:
+            node.append(self.bits[self.nsaved:self.nchunks])
+        self.nsaved = self.nchunks
+
+    def _get_bits(self, values):
+        """Get the bytes and masks of the bits for each of the `values`.
+
+        Strings are padded (or truncated) to the size of the column
+        before hashing, so that they match the values as stored.  The
+        hash functions are derived from two FNV-1a hashes of them.
+
+        """
+
+        values = numpy.ascontiguousarray(values, dtype='S%d' % self.itemsize)
+        octets = values.view(numpy.uint8).reshape(len(values), self.itemsize)
+        h1 = numpy.empty(len(values), dtype=numpy.uint64)
+        h1.fill(numpy.uint64(14695981039346656037))
+        h2 = numpy.zeros(len(values), dtype=numpy.uint64)
+        prime = numpy.uint64(1099511628211)
+        for i in xrange(self.itemsize):
+            octet = octets[:, i].astype(numpy.uint64)
+            h1 = (h1 ^ octet) * prime
+            h2 = (h2 ^ octet) * prime + numpy.uint64(1)
+        nhashes = numpy.arange(_bloom_nhashes, dtype=numpy.uint64)
+        positions = ((h1[:, numpy.newaxis] + nhashes * h2[:, numpy.newaxis])
+                     % numpy.uint64(self.nbits))
+        octets = (positions // numpy.uint64(8)).astype(numpy.intp)
+        masks = numpy.left_shift(
+            numpy.uint8(1), (positions % numpy.uint64(8)).astype(numpy.uint8))
+        return octets, masks
+
+    def update(self, nrow, values, chunksize):
+        """Add the `values` of the rows starting at `nrow`.
+
+        False is returned if some rows before `nrow` are not covered.
+
+        """
+
+        first = nrow // chunksize
+        if nrow > self.nchunks * chunksize:
+            return False
+        if len(values) == 0:
+            return True
+        last = (nrow + len(values) - 1) // chunksize + 1
+        if last > len(self.bits):
+            # Grow the filters in a geometric way
+            bits = numpy.zeros((max(last, 2 * len(self.bits)),
+                                self.nbits // 8), dtype=numpy.uint8)
+            bits[:self.nchunks] = self.bits[:self.nchunks]
+            self.bits = bits
+        self.nsaved = min(self.nsaved, first)
+        chunks = numpy.arange(nrow, nrow + len(values)) // chunksize
+        octets, masks = self._get_bits(values)
+        numpy.bitwise_or.at(
+            self.bits, (numpy.repeat(chunks, _bloom_nhashes), octets.ravel()),
+            masks.ravel())
+        self.nchunks = max(self.nchunks, last)
+        return True
+
+    def get_chunkmap(self, ops, limits, nchunks):
+        """Get the chunks which may hold values fulfilling a comparison.
+
+        Only equality comparisons and membership tests can be checked;
+        all the chunks are selected for the rest.
+
+        """
+
+        if ops == ('eq',):
+            values = [limits[0]]
+        elif ops == ('isin',):
+            values = limits[0]
+        else:
+            return numpy.ones(nchunks, dtype=bool)
+        bits = self.bits[:nchunks]
+        chunkmap = numpy.zeros(nchunks, dtype=bool)
+        for octets, masks in zip(*self._get_bits(values)):
+            chunkmap |= ((bits[:, octets] & masks) == masks).all(axis=1)
+        return chunkmap
+
+
 class Table(tableextension.Table, Leaf):
     """This class represents heterogeneous datasets in an HDF5 file.
 
@@ -698,6 +1256,12 @@ class Table(tableextension.Table, Leaf):
         None, None,
         """Whether some index in table is dirty.""")
 
+    composite_indexes = property(
+        lambda self: sorted(self._get_composite_indexes()),
+        None, None,
+        """List with the tuples of columns of the composite indexes in the
+        table (see :meth:`Table.create_composite_index`).""")
+
     # Other methods
     # ~~~~~~~~~~~~~
     def __init__(self, parentnode, name,
@@ -789,6 +1353,12 @@ class Table(tableextension.Table, Leaf):
         """Is indexing enabled in queries?  *Use only for testing.*"""
         self._empty_array_cache = {}
         """Cache of empty arrays."""
+        self._compositeindexes = None
+        """Maps the columns of composite indexes to their node names (see
+        `_get_composite_indexes()`), or None if not looked up yet."""
+        self._prefetchers = set()
+        """Background reads of records not waited for yet (see
+        `tableextension.RecordsPrefetcher`)."""
 
         self._v_dtype = None
         """The NumPy datatype fopr this table."""
@@ -955,12 +1525,222 @@ class Table(tableextension.Table, Leaf):
                 key] = arr = numpy.empty(shape=0, dtype=key)
             return arr
 
+    def _invalidate_appended_cache(self, oldnrows):
+        """Keep the data caches usable after appending rows.
+
+        Rows below `oldnrows` have not changed, so only the cached chunk
+        holding the last of them (if it was partial) is discarded.
+        Cached sequences of queries are extended on lookup (see
+        `_table__where_indexed()`).
+
+        """
+
+        if self._dirtycache:
+            return  # the caches will be rebuilt anyway
+        chunksize = self._v_chunkshape[0]
+        if oldnrows % chunksize:
+            self._chunkcache.delitem(oldnrows // chunksize)
+
+    @lazyattr
+    def _chunkfilters(self):
+        """Zone maps or Bloom filters of columns (see `_get_chunkfilter()`).
+
+        They are loaded from the nodes where they are saved, in the group
+        of the indexes of the table (see `_create_chunkfilter()`).
+
+        """
+
+        chunkfilters = {}
+        try:
+            itgroup = self._v_file._get_node(_index_pathname_of(self))
+        except NoSuchNodeError:
+            return chunkfilters
+        chunksize = self._v_chunkshape[0]
+        for name in itgroup._v_children:
+            if not name.startswith(('_zonemap_', '_bloomfilter_')):
+                continue
+            node = itgroup._f_get_child(name)
+            colpathname = str(node._v_attrs.COLUMN)
+            dtype = self.cols._g_col(colpathname).dtype
+            if name.startswith('_zonemap_'):
+                chunkfilter = _ZoneMap(dtype)
+            else:
+                chunkfilter = _BloomFilter(dtype.itemsize, chunksize)
+            chunkfilter.load(node)
+            chunkfilters[colpathname] = chunkfilter
+        return chunkfilters
+
+    def _get_chunkfilter_node(self, colpathname):
+        """Get the node where the chunk filter of `colpathname` is saved."""
+
+        name = _chunkfilter_name_of(self._chunkfilters[colpathname].kind,
+                                    colpathname)
+        return self._v_file._get_node(
+            join_path(_index_pathname_of(self), name))
+
+    def _create_chunkfilter(self, colpathname, chunkfilter):
+        """Add a zone map or Bloom filter for `colpathname` to the table.
+
+        The filter is saved in a hidden node beside the indexes of the
+        table, which is updated as rows are appended (see
+        `_save_chunkfilter()`).
+
+        """
+
+        self._v_file._check_writable()
+        try:
+            itgroup = self._v_file._get_node(_index_pathname_of(self))
+        except NoSuchNodeError:
+            itgroup = create_indexes_table(self)
+        atom, shape = chunkfilter.get_node_shape()
+        node = EArray(itgroup, _chunkfilter_name_of(chunkfilter.kind,
+                                                    colpathname),
+                      atom, shape, "Chunk filter of column " + colpathname,
+                      _log=False)
+        node._v_attrs.COLUMN = colpathname
+        self._chunkfilters[colpathname] = chunkfilter
+
+    def _remove_chunkfilter(self, colpathname):
+        """Remove the zone map or Bloom filter of `colpathname`."""
+
+        self._v_file._check_writable()
+        self._get_chunkfilter_node(colpathname)._f_remove()
+        del self._chunkfilters[colpathname]
+
+    def _save_chunkfilter(self, colpathname):
+        """Save the changes of the chunk filter of `colpathname`.
+
+        Nothing is saved if the file is not writable.
+
+        """
+
+        if self._v_file._iswritable():
+            self._chunkfilters[colpathname].save(
+                self._get_chunkfilter_node(colpathname))
+
+    def _get_chunkfilter(self, colpathname):
+        """Get the zone map or Bloom filter of `colpathname`.
+
+        The filter is built (and saved) if it does not cover all the
+        chunks in the table, e.g. after being reset.
+
+        """
+
+        chunkfilter = self._chunkfilters[colpathname]
+        chunksize = self._v_chunkshape[0]
+        if chunkfilter.nchunks < (self.nrows - 1) // chunksize + 1:
+            chunkfilter.reset()
+            bufrows = max(self.nrowsinbuf // chunksize, 1) * chunksize
+            for start in xrange(0, self.nrows, bufrows):
+                stop = min(start + bufrows, self.nrows)
+                chunkfilter.update(
+                    start, self._read(start, stop, 1, colpathname), chunksize)
+            self._save_chunkfilter(colpathname)
+        return chunkfilter
+
+    def _update_chunkfilters(self, nrow, records):
+        """Update the chunk filters with the `records` appended at `nrow`."""
+
+        chunksize = self._v_chunkshape[0]
+        for colpathname, chunkfilter in self._chunkfilters.iteritems():
+            if not chunkfilter.update(
+                    nrow, get_nested_field(records, colpathname), chunksize):
+                chunkfilter.reset()
+            self._save_chunkfilter(colpathname)
+
+    def _invalidate_chunkfilters(self, colnames):
+        """Rebuild the chunk filters of `colnames` when they are used next.
+
+        The saved filters are emptied right away, so that they are not
+        used after reopening the file either.
+
+        """
+
+        for colname in colnames:
+            if colname in self._chunkfilters:
+                self._chunkfilters[colname].reset()
+                self._save_chunkfilter(colname)
+
+    def _get_chunkfilters_chunkmap(self, condition, condvars, plan=None):
+        """Compute the chunkmap of a query out of the chunk filters.
+
+        None is returned if no zone map or Bloom filter of columns can
+        discard chunks for `condition`.  If a `plan` dictionary is given,
+        the density of the chunkmap is recorded in it (see
+        `explain_where()`).
+
+        """
+
+        chunksize = self._v_chunkshape[0]
+        # The chunks in the map must fit in the I/O buffer
+        if not self._chunkfilters or self.nrowsinbuf < chunksize:
+            return None
+        compiled = self._compile_condition(condition, condvars,
+                                           chunkfilters=True)
+        if not compiled.index_expressions:
+            return None
+        nchunks = (self.nrows - 1) // chunksize + 1
+        cmvars = {}
+        for i, (var, ops, lims) in enumerate(compiled.index_expressions):
+            chunkfilter = self._get_chunkfilter(condvars[var].pathname)
+            cmvars["e%d" % i] = chunkfilter.get_chunkmap(ops, lims, nchunks)
+        chunkmap = numexpr.evaluate(compiled.string_expression, cmvars)
+        if chunkmap.all():
+            return None  # a sequential scan is faster
+        if plan is not None:
+            nselected = int(chunkmap.sum())
+            plan['chunkmap'] = {
+                'nchunks': len(chunkmap),
+                'selected': nselected,
+                'density': float(nselected) / len(chunkmap),
+            }
+        # Selected chunks are read through the chunk cache
+        if self._dirtycache:
+            restorecache(self)
+        return chunkmap
+
     def _get_container(self, shape):
         "Get the appropriate buffer for data depending on table nestedness."
 
         # This is *much* faster than the numpy.rec.array counterpart
         return numpy.empty(shape=shape, dtype=self._v_dtype)
 
+    def _get_projected_dtype(self, fields):
+        """Get the dtype of a buffer holding just the given `fields`.
+
+        The `fields` are column names, with nested columns specified as
+        paths (e.g. 'position/x').  The buffer holds the top level
+        columns containing the given ones, in table order.  Buffers with
+        this dtype can be passed to the read methods in the extension,
+        which will only read these columns from disk.
+
+        If all the top level columns are needed (or none is given), the
+        table dtype itself is returned.
+
+        """
+
+        names = set()
+        for field in fields:
+            self._check_column(field)
+            names.add(field.split('/')[0])
+        dtype = self._v_dtype
+        if len(names) in (0, len(dtype.names)):
+            return dtype
+        return numpy.dtype([(name, dtype.fields[name][0])
+                            for name in dtype.names if name in names])
+
+    def _get_condition_columns(self, compiled, condvars):
+        """Get the names of the columns referenced by a compiled condition."""
+
+        colnames = []
+        for param in compiled.parameters:
+            val = condvars[param]
+            if isinstance(val, MembershipTest):
+                val = val.column
+            if hasattr(val, 'pathname'):
+                colnames.append(val.pathname)
+        return colnames
+
     def _get_type_col_names(self, type_):
         """Returns a list containing 'type_' column names."""
 
@@ -1207,6 +1987,10 @@ class Table(tableextension.Table, Leaf):
         (`TypeError` and `ValueError` are raised, respectively).  Also,
         non-column variable values are converted to NumPy arrays.
 
+        The membership tests in the `expression` (see
+        ``split_membership_tests()`` in the ``conditions`` module) get
+        their variables defined as ``MembershipTest`` instances.
+
         `depth` specifies the depth of the frame in order to reach local
         or global variables.
 
@@ -1220,13 +2004,19 @@ class Table(tableextension.Table, Leaf):
                 # Remove 10 (arbitrary) elements from the cache
                 for k in exprvarscache.keys()[:10]:
                     del exprvarscache[k]
-            cexpr = compile(expression, '<string>', 'eval')
+            condition, memberships = split_membership_tests(expression)
+            testvars = [test[0] for test in memberships]
+            cexpr = compile(condition, '<string>', 'eval')
             exprvars = [var for var in cexpr.co_names
                         if var not in ['None', 'False', 'True']
-                        and var not in numexpr_functions]
-            exprvarscache[expression] = exprvars
+                        and var not in numexpr_functions
+                        and var not in testvars]
+            for var, column, values in memberships:
+                exprvars.extend([name for name in (column, values)
+                                 if name not in exprvars])
+            exprvarscache[expression] = (exprvars, memberships)
         else:
-            exprvars = exprvarscache[expression]
+            exprvars, memberships = exprvarscache[expression]
 
         # Get the local and global variable mappings of the user frame
         # if no mapping has been explicitly given for user variables.
@@ -1291,6 +2081,16 @@ class Table(tableextension.Table, Leaf):
                 else:
                     val = numpy.asarray(val)
             reqvars[var] = val
+
+        # Replace the membership tests with their variables.
+        for var, column, values in memberships:
+            if not hasattr(reqvars[column], 'pathname'):
+                raise TypeError("variable ``%s`` in ``isin()`` does not "
+                                "refer to a column" % column)
+            if reqvars[values].ndim != 1:
+                raise ValueError("variable ``%s`` in ``isin()`` is not "
+                                 "a unidimensional array" % values)
+            reqvars[var] = MembershipTest(reqvars[column], reqvars[values])
         return reqvars
 
     _requiredExprVars = previous_api(_required_expr_vars)
@@ -1309,6 +2109,8 @@ class Table(tableextension.Table, Leaf):
         # Column paths and types for each of the previous variable.
         colpaths, vartypes = [], []
         for (var, val) in condvars.iteritems():
+            if isinstance(val, MembershipTest):
+                continue  # implied by the condition and its variables
             if hasattr(val, 'pathname'):  # column
                 colnames.append(var)
                 colpaths.append(val.pathname)
@@ -1328,13 +2130,20 @@ class Table(tableextension.Table, Leaf):
 
     _getConditionKey = previous_api(_get_condition_key)
 
-    def _compile_condition(self, condition, condvars):
+    def _compile_condition(self, condition, condvars, chunkfilters=False,
+                           composite=None):
         """Compile the `condition` and extract usable index conditions.
 
         This method returns an instance of ``CompiledCondition``.  See
         the ``compile_condition()`` function in the ``conditions``
         module for more information about the compilation process.
 
+        If `chunkfilters` is true, the conditions usable with the zone
+        maps or Bloom filters of columns are extracted instead of the ones
+        usable with indexes.  Likewise, if `composite` is a list of
+        tuples of columns, the conditions on the columns of the composite
+        indexes over them are extracted.
+
         This method makes use of the condition cache when possible.
 
         """
@@ -1342,13 +2151,17 @@ class Table(tableextension.Table, Leaf):
         # Look up the condition in the condition cache.
         condcache = self._condition_cache
         condkey = self._get_condition_key(condition, condvars)
+        if chunkfilters:
+            condkey += (tuple(sorted(self._chunkfilters)),)
+        elif composite is not None:
+            condkey += ('composite', tuple(sorted(composite)))
         compiled = condcache.get(condkey)
         if compiled:
             return compiled.with_replaced_vars(condvars)  # bingo!
 
         # Bad luck, the condition must be parsed and compiled.
         # Fortunately, the key provides some valuable information. ;)
-        (condition, colnames, varnames, colpaths, vartypes) = condkey
+        (condition, colnames, varnames, colpaths, vartypes) = condkey[:5]
 
         # Extract more information from referenced columns.
         typemap = dict(zip(varnames, vartypes))  # start with normal variables
@@ -1360,8 +2173,16 @@ class Table(tableextension.Table, Leaf):
             coltype = col.dtype.type
             typemap[colname] = _nxtype_from_nptype[coltype]
 
-            # Get the set of columns with usable indexes.
-            if (self._enabled_indexing_in_queries  # no in-kernel searches
+            # Get the set of columns with usable indexes (or filters).
+            if chunkfilters:
+                if col.pathname in self._chunkfilters:
+                    indexedcols.append(colname)
+            elif composite is not None:
+                for columns in composite:
+                    if col.pathname in columns:
+                        indexedcols.append(colname)
+                        break
+            elif (self._enabled_indexing_in_queries  # no in-kernel searches
                     and self.colindexed[col.pathname] and not col.index.dirty):
                 indexedcols.append(colname)
 
@@ -1370,7 +2191,10 @@ class Table(tableextension.Table, Leaf):
         compiled = compile_condition(condition, typemap, indexedcols)
 
         # Check that there actually are columns in the condition.
-        if not set(compiled.parameters).intersection(set(colnames)):
+        colparams = [param for param in compiled.parameters
+                     if param in colnames
+                     or isinstance(condvars[param], MembershipTest)]
+        if not colparams:
             raise ValueError("there are no columns taking part "
                              "in condition ``%s``" % (condition,))
 
@@ -1388,14 +2212,22 @@ class Table(tableextension.Table, Leaf):
         method returns a frozenset with the path names of the columns whose
         index is usable. Otherwise, it returns an empty list.
 
+        If a composite index can be used (see
+        :meth:`Table.create_composite_index`), the path names of its
+        leading columns taking part in the query are returned.
+
         This method is mainly intended for testing. Keep in mind that changing
         the set of indexed columns or their dirtiness may make this method
         return different values for the same arguments at different times.
 
         """
 
-        # Compile the condition and extract usable index conditions.
         condvars = self._required_expr_vars(condition, condvars, depth=2)
+        lookup = self._get_composite_lookup(condition, condvars)
+        if lookup is not None:
+            cindex, limits = lookup[:2]
+            return frozenset(cindex.columns[:len(limits)])
+        # Compile the condition and extract usable index conditions.
         compiled = self._compile_condition(condition, condvars)
         # Return the columns in indexed expressions
         idxcols = [condvars[var].pathname for var in compiled.index_variables]
@@ -1403,8 +2235,126 @@ class Table(tableextension.Table, Leaf):
 
     willQueryUseIndexing = previous_api(will_query_use_indexing)
 
+    def explain_where(self, condition, condvars=None,
+                      start=None, stop=None, step=None, analyze=False):
+        """Describe how a query for the condition would be carried out.
+
+        The meaning of the condition, *condvars*, start, stop and step
+        arguments is the same as in the :meth:`Table.where` method.  A
+        dictionary with the following keys is returned:
+
+        indexed
+            Whether indexes are used to select the chunks to be scanned.
+            Otherwise the whole range is scanned (in-kernel query).
+        index_expressions
+            A list with a dictionary per indexed expression extracted from
+            the condition, holding its 'column', 'operators' and 'limits'.
+        index_combination
+            The expression combining the results of the index expressions
+            (e.g. ``'(e0 & e1)'``), or None.
+        composite_index
+            A dictionary with the 'columns' of the composite index used
+            instead of column indexes (see
+            :meth:`Table.create_composite_index`) and the number of
+            'candidates' rows it selects, or None.
+        seqcache_hit
+            Whether the matching rows are already in the sequence cache
+            of indexed queries.
+        chunkmap
+            A dictionary with the number of chunks in the table
+            ('nchunks'), the ones selected by the indexes or by the zone
+            maps or Bloom filters of columns (see
+            :meth:`Column.create_zonemap` and
+            :meth:`Column.create_bloomfilter`) as 'selected' and their
+            ratio ('density'), or None.
+        nrows
+            The number of rows fulfilling the condition.
+        timing
+            A dictionary with the seconds spent in the 'index' and 'scan'
+            phases of the query.
+
+        The query is only run when analyze is true.  Otherwise, the
+        'nrows' and 'timing' entries are None, but the number of rows
+        selected by every index (the 'candidates' entry of the index
+        expressions and of the composite index) and the chunkmap are
+        still computed from the indexes (or the zone maps and Bloom
+        filters), without reading any rows.  When the query is run and
+        its result comes from the sequence cache, the indexes are not
+        searched, so these entries are missing.
+
+        As with :meth:`Table.will_query_use_indexing`, the plan depends on
+        the set of indexed columns and their dirtiness at the time of the
+        call.
+
+        """
+
+        self._g_check_open()
+        (start, stop, step) = self._process_range_read(start, stop, step)
+        condvars = self._required_expr_vars(condition, condvars, depth=2)
+        lookup = self._get_composite_lookup(condition, condvars)
+        if lookup is None:
+            compiled = self._compile_condition(condition, condvars)
+            idxexprs = compiled.index_expressions
+        else:
+            idxexprs = []
+        plan = {
+            'indexed': bool(idxexprs) or lookup is not None,
+            'index_expressions': [
+                {'column': condvars[var].pathname, 'operators': ops,
+                 'limits': lims} for var, ops, lims in idxexprs],
+            'index_combination': None,
+            'composite_index': None,
+            'seqcache_hit': False,
+            'chunkmap': None,
+            'nrows': None,
+            'timing': None,
+        }
+        if idxexprs:
+            plan['index_combination'] = compiled.string_expression
+        if lookup is not None:
+            plan['composite_index'] = {'columns': lookup[0].columns}
+        if not analyze:
+            if lookup is not None:
+                plan['composite_index']['candidates'] = len(
+                    self._search_composite(lookup))
+            elif idxexprs:
+                if self._dirtycache:
+                    restorecache(self)
+                seqkey = _table__seqcache_key(self, condition, condvars,
+                                              start, stop, step)
+                plan['seqcache_hit'] = self._seqcache.getslot(seqkey) >= 0
+                # Only search the indexes, without reading any rows
+                if all(isinstance(condvars[var].index, BitmapIndex)
+                       for var, ops, lims in idxexprs):
+                    _table__bitmaps_chunkmap(self, compiled, condvars, plan)
+                else:
+                    _table__index_chunkmap(self, compiled, condvars, plan)
+            else:
+                self._get_chunkfilters_chunkmap(condition, condvars, plan)
+            return plan
+
+        nrows = 0
+        tref = time()
+        if start < stop:
+            row, seq = self._where_row(condition, condvars, start, stop,
+                                       step, fields=[], plan=plan)
+        else:
+            row, seq = None, numpy.array([], dtype=SizeType)
+        tindex = time()
+        if row is None:
+            nrows = len(seq)
+        else:
+            buf = row._next_buffer()
+            while buf is not None:
+                nrows += len(buf[0])
+                buf = row._next_buffer()
+        self._where_condition = None  # reset the conditions
+        plan['nrows'] = nrows
+        plan['timing'] = {'index': tindex - tref, 'scan': time() - tindex}
+        return plan
+
     def where(self, condition, condvars=None,
-              start=None, stop=None, step=None):
+              start=None, stop=None, step=None, fields=None, prefetch=None):
         """Iterate over values fulfilling a condition.
 
         This method returns a Row iterator (see :ref:`RowClassDescr`) which
@@ -1429,6 +2379,19 @@ class Table(tableextension.Table, Leaf):
         are used. The meaning of the start, stop and step parameters is the
         same as for Python slices.
 
+        The fields argument may be used to give the names of the columns
+        that will be accessed in the returned rows.  In this case, only
+        those columns (plus the ones appearing in the condition) are read
+        from disk when possible, which is much faster for wide tables.
+        Other columns may not be available in the rows, which can not be
+        updated either.
+
+        The prefetch argument tells whether the next I/O buffer is read in
+        a background thread while the rows in the current one are being
+        processed.  When None (the default), the value of the
+        :data:`tables.parameters.IO_PREFETCH` parameter is used.  Only
+        in-kernel queries without a step are read ahead.
+
         When possible, indexed columns participating in the condition will be
         used to speed up the search. It is recommended that you place the
         indexed columns as left and out in the condition as possible. Anyway,
@@ -1498,9 +2461,11 @@ class Table(tableextension.Table, Leaf):
 
         """
 
-        return self._where(condition, condvars, start, stop, step)
+        return self._where(condition, condvars, start, stop, step, fields,
+                           prefetch)
 
-    def _where(self, condition, condvars, start=None, stop=None, step=None):
+    def _where(self, condition, condvars, start=None, stop=None, step=None,
+               fields=None, prefetch=None):
         """Low-level counterpart of `self.where()`."""
 
         if profile:
@@ -1514,38 +2479,336 @@ class Table(tableextension.Table, Leaf):
             self._where_condition = None
             return iter([])
 
-        # Compile the condition and extract usable index conditions.
+        # Rows are yielded as they are found, so no worker threads are
+        # used here (see `_where_coords_threaded()`)
         condvars = self._required_expr_vars(condition, condvars, depth=3)
+        row, seq = self._where_row(condition, condvars, start, stop, step,
+                                   fields, prefetch=prefetch)
+        if row is None:
+            # The result is already known, so iterate over it
+            return self.itersequence(seq, fields)
+        if profile:
+            show_stats("Exiting table._where", tref)
+        return row
+
+    def _where_row(self, condition, condvars, start, stop, step,
+                   fields=None, plan=None, prefetch=False):
+        """Get a Row iterator for the rows fulfilling `condition`.
+
+        The `condvars` mapping must already hold the variables required
+        by the `condition` (see `_required_expr_vars()`) and the range
+        must already be processed.
+
+        If `fields` is not None, only those columns and the ones used in
+        the `condition` are read for in-kernel queries.  Indexed queries
+        always read full rows, as these come from the chunk cache.
+
+        The `plan` dictionary, if given, is filled with the details of the
+        index phase (see `explain_where()`).  The `prefetch` argument has
+        the same meaning as in `where()`.
+
+        A ``(row, seq)`` tuple is returned.  If the result of the query
+        is already known (e.g. it was found in the sequence cache),
+        `row` is None and `seq` is an array with the matching row
+        coordinates.  Otherwise, `seq` is None and `row` is a Row
+        instance ready to iterate over the matching rows.
+
+        """
+
+        # Can a composite index select the rows to evaluate?
+        seq = self._where_composite(condition, condvars, start, stop, step,
+                                    plan)
+        if seq is not None:
+            self._use_index = False
+            self._where_condition = None
+            return None, seq
+
+        # Compile the condition and extract usable index conditions.
         compiled = self._compile_condition(condition, condvars)
 
         # Can we use indexes?
         if compiled.index_expressions:
-            chunkmap = _table__where_indexed(
-                self, compiled, condition, condvars, start, stop, step)
-            if not isinstance(chunkmap, numpy.ndarray):
-                # If it is not a NumPy array it should be an iterator
+            chunkmap, seq = _table__where_indexed(
+                self, compiled, condition, condvars, start, stop, step, plan)
+            if chunkmap is None:
                 # Reset conditions
                 self._use_index = False
                 self._where_condition = None
-                # ...and return the iterator
-                return chunkmap
+                return None, seq
         else:
-            chunkmap = None  # default to an in-kernel query
+            # Zone maps may allow skipping some chunks
+            chunkmap = self._get_chunkfilters_chunkmap(condition, condvars,
+                                                       plan)
+            if chunkmap is not None:
+                if not chunkmap.any():
+                    self._where_condition = None
+                    return None, numpy.array([], dtype=SizeType)
+                self._use_index = True
+
+        dtype = None
+        if chunkmap is None and fields is not None:
+            dtype = self._get_projected_dtype(
+                list(fields) + self._get_condition_columns(compiled, condvars))
 
         args = [condvars[param] for param in compiled.parameters]
         self._where_condition = (compiled.function, args)
+        if prefetch is None:
+            prefetch = self._v_file.params['IO_PREFETCH']
         row = tableextension.Row(self)
-        if profile:
-            show_stats("Exiting table._where", tref)
-        return row._iter(start, stop, step, chunkmap=chunkmap)
+        return row._iter(start, stop, step, chunkmap=chunkmap,
+                         dtype=dtype, prefetch=prefetch), None
+
+    def _get_composite_lookup(self, condition, condvars):
+        """Choose the composite index to use in a query for `condition`.
+
+        The index with the most leading columns restricted by the
+        condition is chosen.  A ``(cindex, limits, compiled)`` tuple is
+        returned, where `limits` holds the bounds of these columns (see
+        `CompositeIndex.get_lookup_range()`) and `compiled` is the
+        compiled condition.  None is returned if no composite index can
+        be used, e.g. if the condition is not a conjunction of
+        comparisons.
+
+        """
+
+        if not self._enabled_indexing_in_queries:
+            return None
+        nrows = self.nrows
+        cindexes = dict(
+            (columns, cindex)
+            for (columns, cindex) in self._get_composite_indexes().iteritems()
+            if not cindex.dirty and cindex.nelements <= nrows)
+        if not cindexes:
+            return None
+        compiled = self._compile_condition(condition, condvars,
+                                           composite=list(cindexes))
+        if (not compiled.index_expressions
+                or '|' in compiled.string_expression):
+            return None
+
+        # Get inclusive bounds for every column out of its comparisons
+        bounds = {}
+        for var, ops, lims in compiled.index_expressions:
+            if ops == ('isin',):
+                continue
+            colbounds = bounds.setdefault(condvars[var].pathname,
+                                          [None, None])
+            for op, lim in zip(ops, lims):
+                if op in ('eq', 'ge', 'gt') and (
+                        colbounds[0] is None or lim > colbounds[0]):
+                    colbounds[0] = lim
+                if op in ('eq', 'le', 'lt') and (
+                        colbounds[1] is None or lim < colbounds[1]):
+                    colbounds[1] = lim
+
+        lookup = None
+        for columns, cindex in sorted(cindexes.iteritems()):
+            limits = []
+            for colname in columns:
+                if colname not in bounds:
+                    break
+                lower, upper = bounds[colname]
+                limits.append((lower, upper))
+                if lower is None or lower != upper:
+                    break  # the next columns are not sorted in the range
+            if limits and (lookup is None or len(limits) > len(lookup[1])):
+                lookup = (cindex, limits, compiled)
+        return lookup
+
+    def _search_composite(self, lookup):
+        """Get the coordinates of the rows selected by a composite index.
+
+        `lookup` is the tuple returned by `_get_composite_lookup()`.
+        Only the index is searched, so the rows are not checked against
+        the condition.
+
+        """
+
+        cindex, limits, compiled = lookup
+        dtypes = [self.cols._g_col(colname).dtype
+                  for colname in cindex.columns]
+        keyrange = cindex.get_lookup_range(dtypes, limits)
+        if keyrange is None:
+            return numpy.array([], dtype=SizeType)
+        return cindex.search(*keyrange)
+
+    def _where_composite(self, condition, condvars, start, stop, step,
+                         plan=None):
+        """Get the coordinates of the rows fulfilling `condition`.
+
+        The rows in the range selected by the composite index chosen by
+        `_get_composite_lookup()` are read to evaluate the condition on
+        them, and so are the rows appended after the indexed ones.  None
+        is returned if no composite index can be used.  If a `plan`
+        dictionary is given, the index and the number of rows it selects
+        are recorded in it (see `explain_where()`).
+
+        """
+
+        lookup = self._get_composite_lookup(condition, condvars)
+        if lookup is None:
+            return None
+        cindex, limits, compiled = lookup
+        coords = self._search_composite(lookup)
+        if plan is not None:
+            plan['composite_index'] = {'columns': cindex.columns,
+                                       'candidates': len(coords)}
+        coords = coords[(coords >= start) & (coords < stop)
+                        & ((coords - start) % step == 0)]
+        seq = self._where_in_coords(compiled, condvars, coords)
+        # The rows appended after the indexed ones are scanned
+        return _table__extend_seq(self, compiled, condvars, seq,
+                                  max(cindex.nelements, start),
+                                  start, stop, step)
+
+    def _where_in_coords(self, compiled, condvars, coords):
+        """Get the `coords` of the rows fulfilling a condition.
+
+        The `compiled` condition is evaluated on the rows at `coords`
+        (read an I/O buffer at a time), and the coordinates of the ones
+        fulfilling it are returned.
+
+        """
+
+        func = compiled.function
+        args = [condvars[param] for param in compiled.parameters]
+        fields = self._get_condition_columns(compiled, condvars)
+        nrowsinbuf = self.nrowsinbuf
+        seq = [numpy.array([], dtype=SizeType)]
+        for i in xrange(0, len(coords), nrowsinbuf):
+            bcoords = coords[i:i + nrowsinbuf]
+            records = self._read_coordinates(bcoords, fields=fields)
+            seq.append(bcoords[call_on_recarr(func, args, records)])
+        return numpy.concatenate(seq)
+
+    def _where_coords(self, condition, condvars,
+                      start=None, stop=None, step=None, nthreads=None):
+        """Get the coordinates of the rows fulfilling `condition`.
+
+        This is a bulk counterpart of ``[r.nrow for r in self._where()]``:
+        the coordinates are collected for a whole I/O buffer at a time,
+        so no Python-level work is done per matching row.  Only the
+        columns used in the condition are read for in-kernel queries.
+
+        """
+
+        (start, stop, step) = self._process_range_read(start, stop, step)
+        if start >= stop:  # empty range, reset conditions
+            self._use_index = False
+            self._where_condition = None
+            return numpy.array([], dtype=SizeType)
+
+        condvars = self._required_expr_vars(condition, condvars, depth=3)
+        seq = self._where_coords_threaded(condition, condvars,
+                                          start, stop, step, nthreads)
+        if seq is not None:
+            return seq
+        row, seq = self._where_row(condition, condvars, start, stop, step,
+                                   fields=[])
+        if row is None:
+            return seq
+
+        blocks = []
+        buf = row._next_buffer()
+        while buf is not None:
+            blocks.append(buf[0])
+            buf = row._next_buffer()
+        if not blocks:
+            return numpy.array([], dtype=SizeType)
+        return numpy.concatenate(blocks)
+
+    def _where_coords_threaded(self, condition, condvars,
+                               start, stop, step, nthreads):
+        """Get the coordinates fulfilling `condition` using worker threads.
+
+        The range (already processed) is split in I/O buffers which are
+        handed out to a pool of `nthreads` threads.  Each thread reads a
+        buffer (with just the columns used in the condition) into its own
+        container and evaluates the condition on it.  Neither HDF5 nor
+        Numexpr are thread-safe, so reads and evaluations are serialized
+        with a lock each, but a thread can read a buffer while another
+        one evaluates the condition (with the threads of Numexpr).  The
+        coordinates are merged in row order.
+
+        None is returned when the query should be run serially, i.e. when
+        only one thread is requested, or when indexes, the sequence cache
+        or the zone maps and Bloom filters of columns can be used.
+
+        """
+
+        if nthreads is None:
+            nthreads = self._v_file.params['MAX_QUERY_THREADS']
+        # Buffers always start on the step grid
+        nrowsinbuf = self.nrowsinbuf
+        bufrows = max(nrowsinbuf // step, 1) * step
+        nbufs = (stop - start - 1) // bufrows + 1
+        nthreads = min(nthreads, nbufs)
+        if nthreads <= 1:
+            return None
+        compiled = self._compile_condition(condition, condvars)
+        if (compiled.index_expressions or
+                self._get_composite_lookup(condition, condvars) is not None):
+            return None
+        if not self._dirtycache:
+            seqkey = _table__seqcache_key(self, condition, condvars,
+                                          start, stop, step)
+            if self._seqcache.getslot(seqkey) >= 0:
+                return None
+        if self._get_chunkfilters_chunkmap(condition, condvars) is not None:
+            return None
+
+        func = compiled.function
+        args = [condvars[param] for param in compiled.parameters]
+        dtype = self._get_projected_dtype(
+            self._get_condition_columns(compiled, condvars))
+        results = [None] * nbufs
+        errors = []
+        counter = itertools.count()
+
+        def evaluate_buffers():
+            iobuf = numpy.empty(shape=nrowsinbuf, dtype=dtype)
+            while not errors:
+                nbuf = next(counter)
+                if nbuf >= nbufs:
+                    break
+                bstart = start + nbuf * bufrows
+                # Read up to the last row in the step grid for this buffer
+                nrecords = min(bufrows - step + 1, stop - bstart)
+                try:
+                    with hdf5_lock:
+                        recout = self._read_records(bstart, nrecords, iobuf)
+                    with numexpr_lock:
+                        valid = call_on_recarr(func, args, iobuf[:recout])
+                    if step > 1:
+                        stepmask = numpy.zeros(recout, dtype=numpy.bool_)
+                        stepmask[::step] = True
+                        valid &= stepmask
+                    coords = valid.nonzero()[0].astype(SizeType)
+                    coords += bstart
+                    results[nbuf] = coords
+                except Exception as exc:
+                    errors.append(exc)
+
+        workers = [threading.Thread(target=evaluate_buffers)
+                   for i in xrange(nthreads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        if errors:
+            raise errors[0]
+        return numpy.concatenate(results)
 
     def read_where(self, condition, condvars=None, field=None,
-                   start=None, stop=None, step=None):
+                   start=None, stop=None, step=None, nthreads=None,
+                   fields=None):
         """Read table data fulfilling the given *condition*.
 
         This method is similar to :meth:`Table.read`, having their common
         arguments and return values the same meanings. However, only the rows
-        fulfilling the *condition* are included in the result.
+        fulfilling the *condition* are included in the result.  Only the
+        columns used in the *condition* are read from disk for evaluating it
+        (unless indexes are used).
 
         The meaning of the other arguments is the same as in the
         :meth:`Table.where` method.
@@ -1553,18 +2816,23 @@ class Table(tableextension.Table, Leaf):
         """
 
         self._g_check_open()
-        coords = [p.nrow for p in
-                  self._where(condition, condvars, start, stop, step)]
+        if field and fields is not None:
+            raise ValueError("the field and fields arguments can not be "
+                             "used at the same time")
+        coords = self._where_coords(condition, condvars, start, stop, step,
+                                    nthreads)
         self._where_condition = None  # reset the conditions
         if len(coords) > 1:
             cstart, cstop = coords[0], coords[-1] + 1
             if cstop - cstart == len(coords):
                 # Chances for monotonically increasing row values. Refine.
                 inc_seq = numpy.alltrue(
-                    numpy.arange(cstart, cstop) == numpy.array(coords))
+                    numpy.arange(cstart, cstop) == coords)
                 if inc_seq:
-                    return self.read(cstart, cstop, field=field)
-        return self.read_coordinates(coords, field)
+                    return self.read(cstart, cstop, field=field,
+                                     fields=fields)
+        result = self._read_coordinates(coords, field, fields)
+        return internal_to_flavor(result, self.flavor)
 
     readWhere = previous_api(read_where)
 
@@ -1578,6 +2846,10 @@ class Table(tableextension.Table, Leaf):
         :meth:`Table.where` method.
 
         The number of rows appended to dstTable is returned as a result.
+        The matching rows in every I/O buffer are appended as a block, and
+        they are copied as they are when both tables have the same
+        structure.  Columns in dstTable which are missing in this table
+        get their default values.
 
         .. versionchanged:: 3.0
            The *whereAppend* method has been renamed into *append_where*.
@@ -1589,24 +2861,61 @@ class Table(tableextension.Table, Leaf):
         # Check that the destination file is not in read-only mode.
         dstTable._v_file._check_writable()
 
-        # Row objects do not support nested columns, so we must iterate
-        # over the flat column paths.  When rows support nesting,
-        # ``self.colnames`` can be directly iterated upon.
-        colNames = [colName for colName in self.colpathnames]
-        dstRow = dstTable.row
+        # Check the columns before doing any I/O
+        colNames = self.colpathnames
+        for colName in colNames:
+            if colName not in dstTable.coldtypes:
+                raise KeyError("table ``%s`` does not have a column "
+                               "named ``%s``"
+                               % (dstTable._v_pathname, colName))
+        dstdtype = dstTable._v_dtype
+        samedtype = (self._v_dtype == dstdtype)
+
+        def append(records):
+            if not samedtype:
+                block = numpy.zeros(len(records), dtype=dstdtype)
+                if dstTable._v_wdflts is not None:
+                    block[:] = dstTable._v_wdflts[0]
+                for colName in colNames:
+                    get_nested_field(block, colName)[...] = (
+                        get_nested_field(records, colName))
+                records = block
+            # The records get converted in place while being written
+            dstTable._save_buffered_rows(records, len(records))
+
+        # Rows pending to be appended go first
+        if 'row' in dstTable.__dict__:
+            dstTable.row._flush_buffered_rows()
         nrows = 0
-        for srcRow in self._where(condition, condvars, start, stop, step):
-            for colName in colNames:
-                dstRow[colName] = srcRow[colName]
-            dstRow.append()
-            nrows += 1
+        (start, stop, step) = self._process_range_read(start, stop, step)
+        if start < stop:
+            condvars = self._required_expr_vars(condition, condvars, depth=2)
+            row, seq = self._where_row(condition, condvars,
+                                       start, stop, step)
+        else:
+            row, seq = None, numpy.array([], dtype=SizeType)
+        if row is None:
+            # The coordinates are already known, read them in buffers
+            nrowsinbuf = self.nrowsinbuf
+            nrows = len(seq)
+            for i in xrange(0, nrows, nrowsinbuf):
+                append(self._read_coordinates(seq[i:i + nrowsinbuf]))
+        else:
+            buf = row._next_buffer()
+            while buf is not None:
+                coords, iobuf, valid = buf
+                if len(coords):
+                    nrows += len(coords)
+                    append(iobuf[valid])
+                buf = row._next_buffer()
+        self._where_condition = None  # reset the conditions
         dstTable.flush()
         return nrows
 
     whereAppend = previous_api(append_where)
 
     def get_where_list(self, condition, condvars=None, sort=False,
-                       start=None, stop=None, step=None):
+                       start=None, stop=None, step=None, nthreads=None):
         """Get the row coordinates fulfilling the given condition.
 
         The coordinates are returned as a list of the current flavor.  sort
@@ -1620,9 +2929,9 @@ class Table(tableextension.Table, Leaf):
 
         self._g_check_open()
 
-        coords = [p.nrow for p in
-                  self._where(condition, condvars, start, stop, step)]
-        coords = numpy.array(coords, dtype=SizeType)
+        coords = self._where_coords(condition, condvars, start, stop, step,
+                                    nthreads)
+        coords = numpy.asarray(coords, dtype=SizeType)
         # Reset the conditions
         self._where_condition = None
         if sort:
@@ -1631,9 +2940,611 @@ class Table(tableextension.Table, Leaf):
 
     getWhereList = previous_api(get_where_list)
 
-    def itersequence(self, sequence):
+    def multi_where(self, conditions, condvars=None, sort=False,
+                    start=None, stop=None, step=None):
+        """Get the row coordinates fulfilling each of several conditions.
+
+        The conditions argument is a mapping from names to conditions.  A
+        dictionary with the same keys is returned, holding the coordinates
+        of the rows fulfilling every condition as arrays of the current
+        flavor.  These can be passed to :meth:`Table.read_coordinates` or
+        :meth:`Table.itersequence` for getting the rows themselves.
+
+        This is equivalent to calling :meth:`Table.get_where_list` for
+        every condition, but the conditions that can not use indexes are
+        evaluated in a single scan of the table: every I/O buffer (holding
+        just the columns used in any of them) is read once and all the
+        conditions are evaluated on it.  Conditions that can use indexes
+        are solved through them.
+
+        The condvars mapping is shared by all the conditions.  The meaning
+        of the other arguments is the same as in the
+        :meth:`Table.get_where_list` method.
+
+        Examples
+        --------
+
+        ::
+
+            coords = table.multi_where({'low': 'pressure < 10',
+                                        'hot': 'temperature > 100'})
+            hot_rows = table.read_coordinates(coords['hot'])
+
+        """
+
+        self._g_check_open()
+        (start, stop, step) = self._process_range_read(start, stop, step)
+        results = {}
+        scans = {}
+        colnames = []
+        for name, condition in conditions.iteritems():
+            cvars = self._required_expr_vars(condition, condvars, depth=2)
+            if start >= stop:
+                results[name] = numpy.array([], dtype=SizeType)
+                continue
+            compiled = self._compile_condition(condition, cvars)
+            if compiled.index_expressions:
+                # Indexes are cheaper than taking part in the scan
+                results[name] = self._where_coords(condition, cvars,
+                                                   start, stop, step, 1)
+                self._where_condition = None  # reset the conditions
+                continue
+            args = [cvars[param] for param in compiled.parameters]
+            scans[name] = (compiled.function, args)
+            colnames.extend(self._get_condition_columns(compiled, cvars))
+
+        if scans:
+            # Buffers always start on the step grid
+            nrowsinbuf = self.nrowsinbuf
+            bufrows = max(nrowsinbuf // step, 1) * step
+            iobuf = numpy.empty(shape=nrowsinbuf,
+                                dtype=self._get_projected_dtype(colnames))
+            scancoords = dict((name, []) for name in scans)
+            for bstart in xrange(start, stop, bufrows):
+                # Read up to the last row in the step grid for this buffer
+                nrecords = min(bufrows - step + 1, stop - bstart)
+                recout = self._read_records(bstart, nrecords, iobuf)
+                records = iobuf[:recout]
+                stepmask = None
+                if step > 1:
+                    stepmask = numpy.zeros(recout, dtype=numpy.bool_)
+                    stepmask[::step] = True
+                for name, (func, args) in scans.iteritems():
+                    valid = call_on_recarr(func, args, records)
+                    if stepmask is not None:
+                        valid &= stepmask
+                    coords = valid.nonzero()[0].astype(SizeType)
+                    coords += bstart
+                    scancoords[name].append(coords)
+            for name, coords in scancoords.iteritems():
+                results[name] = numpy.concatenate(coords)
+
+        for name, coords in results.iteritems():
+            coords = numpy.asarray(coords, dtype=SizeType)
+            if sort:
+                coords = numpy.sort(coords)
+            results[name] = internal_to_flavor(coords, self.flavor)
+        return results
+
+    def count_where(self, condition, condvars=None,
+                    start=None, stop=None, step=None):
+        """Count the rows fulfilling the given condition.
+
+        This is equivalent to ``len(table.get_where_list(condition))``,
+        but the matching rows are counted as every I/O buffer (or every
+        chunk selected by the indexes) is evaluated, so neither the rows
+        nor their coordinates are ever materialized.
+
+        The meaning of the other arguments is the same as in the
+        :meth:`Table.where` method.
+
+        """
+
+        self._g_check_open()
+        return self._where_aggregate(condition, condvars, {},
+                                     start, stop, step)[0]
+
+    def aggregate_where(self, condition, aggregates, condvars=None,
+                        start=None, stop=None, step=None):
+        """Compute aggregates over the rows fulfilling the given condition.
+
+        The aggregates argument is a mapping from column names (nested
+        columns are specified as paths like ``'info/name'``) to the
+        name of the reduction to be computed for that column, one of
+        ``'count'``, ``'sum'``, ``'min'``, ``'max'`` or ``'mean'``.  A
+        sequence of reduction names may also be given for a column, in
+        which case a list with the results is returned for it.
+
+        A dictionary with the same keys as aggregates is returned.  The
+        reductions are computed as every I/O buffer (or every chunk
+        selected by the indexes) is evaluated, so memory usage stays
+        constant regardless of the number of matching rows.  For
+        multidimensional columns the reductions are computed for every
+        element of the cells, like ``numpy.sum(values, axis=0)`` would do.
+
+        When no row fulfils the condition, ``'count'`` is 0, ``'sum'`` is
+        a zero of the column type and ``'min'``, ``'max'`` and ``'mean'``
+        are None.
+
+        The meaning of the other arguments is the same as in the
+        :meth:`Table.where` method.
+
+        Examples
+        --------
+
+        ::
+
+            stats = table.aggregate_where('pressure > 10',
+                                          {'energy': ['sum', 'max'],
+                                           'TDCcount': 'mean'})
+            esum, emax = stats['energy']
+
+        """
+
+        self._g_check_open()
+        return self._where_aggregate(condition, condvars, aggregates,
+                                     start, stop, step)[1]
+
+    def groupby(self, by):
+        """Group the rows of the table by the values of a column.
+
+        The by argument is the name of a column (nested columns are
+        specified as paths like ``'info/name'``) or a :class:`Column`
+        instance, which must not be multidimensional.  A
+        :class:`GroupBy` instance is returned, whose :meth:`GroupBy.agg`
+        method computes aggregates for every group.
+
+        Examples
+        --------
+
+        ::
+
+            stats = table.groupby('region').agg({'energy': ['sum', 'max']})
+
+        """
+
+        self._g_check_open()
+        return GroupBy(self, by)
+
+    def _check_aggregates(self, aggregates):
+        """Check the `aggregates` mapping of columns to reductions.
+
+        A dictionary mapping every column to a list of reductions is
+        returned.
+
+        """
+
+        reductions = {}
+        for colname, ops in aggregates.iteritems():
+            if colname not in self.coldtypes:
+                raise KeyError("table ``%s`` does not have a column "
+                               "named ``%s``" % (self._v_pathname, colname))
+            if isinstance(ops, basestring):
+                ops = [ops]
+            dtype = self.coldtypes[colname]
+            for op in ops:
+                if op not in _reduction_ops:
+                    raise ValueError("unsupported reduction ``%s``; "
+                                     "valid values are: %s"
+                                     % (op, sorted(_reduction_ops)))
+                if op != 'count' and dtype.base.kind in ('S', 'U'):
+                    raise TypeError("reduction ``%s`` is not supported "
+                                    "for string column ``%s``"
+                                    % (op, colname))
+            reductions[colname] = list(ops)
+        return reductions
+
+    def _where_aggregate(self, condition, condvars, aggregates,
+                         start=None, stop=None, step=None):
+        """Low-level counterpart of `self.aggregate_where()`.
+
+        A ``(count, results)`` tuple is returned, where `count` is the
+        number of rows fulfilling `condition` and `results` is a
+        dictionary with the requested `aggregates`.
+
+        """
+
+        # Check the aggregates before doing any I/O
+        reductions = self._check_aggregates(aggregates)
+        # Partial results of the (non-count) reductions per column
+        partials = dict((colname, dict.fromkeys(ops))
+                        for colname, ops in reductions.iteritems())
+
+        def reduce_buffer(records):
+            for colname, colpartials in partials.iteritems():
+                values = get_nested_field(records, colname)
+                for op in colpartials:
+                    partial = colpartials[op]
+                    if op in ('sum', 'mean'):
+                        value = values.sum(axis=0)
+                        if partial is not None:
+                            value = partial + value
+                    elif op == 'min':
+                        value = values.min(axis=0)
+                        if partial is not None:
+                            value = numpy.minimum(partial, value)
+                    elif op == 'max':
+                        value = values.max(axis=0)
+                        if partial is not None:
+                            value = numpy.maximum(partial, value)
+                    else:  # count
+                        continue
+                    colpartials[op] = value
+
+        count = 0
+        (start, stop, step) = self._process_range_read(start, stop, step)
+        if start < stop:
+            condvars = self._required_expr_vars(condition, condvars, depth=3)
+            row, seq = self._where_row(condition, condvars,
+                                       start, stop, step, fields=reductions)
+        else:
+            row, seq = None, numpy.array([], dtype=SizeType)
+        if row is None:
+            # The coordinates are already known, read them in buffers
+            nrowsinbuf = self.nrowsinbuf
+            count = len(seq)
+            if reductions:
+                for i in xrange(0, count, nrowsinbuf):
+                    reduce_buffer(self._read_coordinates(
+                        seq[i:i + nrowsinbuf], fields=reductions))
+        else:
+            buf = row._next_buffer()
+            while buf is not None:
+                coords, iobuf, valid = buf
+                if len(coords):
+                    count += len(coords)
+                    if reductions:
+                        reduce_buffer(iobuf[valid])
+                buf = row._next_buffer()
+        self._where_condition = None  # reset the conditions
+
+        results = {}
+        for colname, ops in aggregates.iteritems():
+            colresults = []
+            for op in reductions[colname]:
+                value = partials[colname][op]
+                if op == 'count':
+                    value = count
+                elif op == 'sum' and value is None:
+                    dtype = self.coldtypes[colname]
+                    value = numpy.zeros((0,) + dtype.shape,
+                                        dtype.base).sum(axis=0)
+                elif op == 'mean' and value is not None:
+                    value = numpy.true_divide(value, count)
+                colresults.append(value)
+            if isinstance(ops, basestring):
+                colresults = colresults[0]
+            results[colname] = colresults
+        return count, results
+
+    def where_topk(self, condition, sortby, k, condvars=None,
+                   start=None, stop=None, step=None, largest=True):
+        """Get the k rows with the largest sortby values fulfilling a condition.
+
+        The rows are returned in a structured array of the current flavor,
+        ordered by decreasing values of the sortby column (a column name
+        or a :class:`Column` instance), or by increasing values if largest
+        is false.  Less than k rows are returned when not enough of them
+        fulfil the condition.  The order of rows having equal values is
+        not specified.
+
+        If the sortby column has a CSI index covering the whole table, the
+        index is walked in order and the search stops as soon as k rows
+        fulfilling the condition are found.  Otherwise, the rows
+        fulfilling the condition are selected as every I/O buffer (or every
+        chunk selected by the indexes) is evaluated, keeping just the best
+        k of them.  In both cases memory usage is proportional to k, not
+        to the number of matching rows.
+
+        The meaning of the other arguments is the same as in the
+        :meth:`Table.where` method.
+
+        Examples
+        --------
+
+        ::
+
+            best = table.where_topk('region == "X"', 'score', 100)
+
+        """
+
+        self._g_check_open()
+        if isinstance(sortby, Column):
+            sortcol = sortby
+        else:
+            sortcol = self.cols._f_col(sortby)
+        if sortcol.shape[1:]:
+            raise TypeError("column ``%s`` is not scalar, so it can not be "
+                            "used for sorting" % sortcol.pathname)
+        k = int(k)
+        if k < 0:
+            raise ValueError("the number of rows can not be negative")
+        (start, stop, step) = self._process_range_read(start, stop, step)
+        condvars = self._required_expr_vars(condition, condvars, depth=2)
+        if k == 0 or start >= stop:
+            result = self._get_container(0)
+        elif (sortcol.is_indexed and sortcol.index.is_csi and
+              not sortcol.index.dirty and
+              sortcol.index.nelements == self.nrows):
+            result = self._where_topk_indexed(
+                condition, condvars, sortcol, k, start, stop, step, largest)
+        else:
+            result = self._where_topk_scan(
+                condition, condvars, sortcol, k, start, stop, step, largest)
+        return internal_to_flavor(result, self.flavor)
+
+    def _where_topk_indexed(self, condition, condvars, sortcol, k,
+                            start, stop, step, largest):
+        """Walk the CSI index of `sortcol` to get the top `k` rows.
+
+        Blocks of coordinates are taken in order from the index and the
+        condition is evaluated on their rows, until `k` of them fulfil
+        it.  The range (already processed) is applied to the coordinates.
+
+        """
+
+        compiled = self._compile_condition(condition, condvars)
+        args = [condvars[param] for param in compiled.parameters]
+        index = sortcol.index
+        nelements = index.nelements
+        nrowsinbuf = self.nrowsinbuf
+        results = []
+        nfound = 0
+        for nblock in xrange(0, nelements, nrowsinbuf):
+            if largest:
+                bstop = nelements - nblock
+                coords = index[max(bstop - nrowsinbuf, 0):bstop][::-1]
+            else:
+                # Slices of indexes past their elements are not clamped
+                coords = index[nblock:min(nblock + nrowsinbuf, nelements)]
+            # Keep the coordinates in the range
+            valid = (coords >= start) & (coords < stop)
+            if step > 1:
+                valid &= ((coords - start) % step == 0)
+            coords = coords[valid]
+            if len(coords) == 0:
+                continue
+            records = self._read_coordinates(coords)
+            records = records[call_on_recarr(compiled.function, args,
+                                             records)]
+            results.append(records[:k - nfound])
+            nfound += len(results[-1])
+            if nfound == k:
+                break
+        if not results:
+            return self._get_container(0)
+        return numpy.concatenate(results)
+
+    def _where_topk_scan(self, condition, condvars, sortcol, k,
+                         start, stop, step, largest):
+        """Scan the rows fulfilling `condition` to get the top `k` ones.
+
+        Matching rows are merged with the best ones found so far every
+        I/O buffer, and only the top `k` are kept.  The range must
+        already be processed.
+
+        """
+
+        sortname = sortcol.pathname
+
+        def select(records, coords):
+            # Order the candidates (ties are broken by row coordinate)
+            values = get_nested_field(records, sortname)
+            if largest:
+                order = numpy.lexsort((-coords, values))[::-1]
+            else:
+                order = numpy.lexsort((coords, values))
+            order = order[:k]
+            return records[order], coords[order]
+
+        records = self._get_container(0)
+        coords = numpy.array([], dtype=SizeType)
+        row, seq = self._where_row(condition, condvars, start, stop, step)
+        if row is None:
+            # The coordinates are already known, read them in buffers
+            nrowsinbuf = self.nrowsinbuf
+            for i in xrange(0, len(seq), nrowsinbuf):
+                bufcoords = seq[i:i + nrowsinbuf].astype(SizeType)
+                records, coords = select(
+                    numpy.concatenate(
+                        [records, self._read_coordinates(bufcoords)]),
+                    numpy.concatenate([coords, bufcoords]))
+        else:
+            buf = row._next_buffer()
+            while buf is not None:
+                bufcoords, iobuf, valid = buf
+                if len(bufcoords):
+                    # The I/O buffer is reused, so matches get copied
+                    records, coords = select(
+                        numpy.concatenate([records, iobuf[valid]]),
+                        numpy.concatenate([coords, bufcoords]))
+                buf = row._next_buffer()
+        self._where_condition = None  # reset the conditions
+        return records
+
+    def join(self, other, on, how='inner', dest=None,
+             start=None, stop=None, step=None):
+        """Join the rows of this table with the ones of another table.
+
+        Every row of this (left) table is paired with the rows of the
+        other (right) table having the same value in the key column.  The
+        on argument is the name of the key column in both tables, or a
+        ``(left, right)`` tuple with the names of each one.  If how is
+        ``'inner'`` (the default) the rows without a match are dropped,
+        while if it is ``'left'`` they are paired with the default values
+        of the other table.
+
+        The joined rows have all the top-level columns of this table
+        followed by the ones of the other table except its key column.
+        When the name of a column of the other table is already taken, it
+        gets the name of the other table and an underscore as a prefix.
+
+        This table is streamed in I/O buffers, and the keys in each one are
+        looked up in a batch in the index of the right key column (see
+        ``isin()`` in :ref:`condition_syntax`), or in a sorted copy of
+        that column if it is not indexed.  The joined rows follow the
+        order of this table.  However, when both key columns have CSI
+        indexes and no range is given, both tables are read in the order
+        of their indexes and merged, so the joined rows are ordered by
+        key instead.
+
+        If dest is None, an iterator yielding the joined rows in
+        structured arrays of the current flavor is returned.  Otherwise,
+        the rows are appended to the dest table and their number is
+        returned.
+
+        The meaning of the start, stop and step arguments is the same as
+        in :meth:`Table.read`, and they select the rows of this table to
+        be joined.
+
+        Examples
+        --------
+
+        ::
+
+            for rows in events.join(users, on=('user_id', 'id')):
+                process(rows['name'], rows['timestamp'])
+
+        """
+
+        self._g_check_open()
+        other._g_check_open()
+        if how not in ('inner', 'left'):
+            raise ValueError("``how`` must be either 'inner' or 'left', "
+                             "not %r" % (how,))
+        if isinstance(on, basestring):
+            lkey = rkey = on
+        else:
+            lkey, rkey = on
+        lcol, rcol = self.cols._f_col(lkey), other.cols._f_col(rkey)
+        for key, col in ((lkey, lcol), (rkey, rcol)):
+            if not isinstance(col, Column) or col.shape[1:]:
+                raise TypeError("column ``%s`` is not scalar, so it can not "
+                                "be used as a join key" % key)
+
+        # The description of the joined rows
+        names = set(self._v_dtype.names)
+        descr = [(name, self._v_dtype.fields[name][0])
+                 for name in self._v_dtype.names]
+        rfields = []
+        for name in other._v_dtype.names:
+            if name == rcol.pathname:
+                continue
+            newname = name
+            while newname in names:
+                newname = '%s_%s' % (other.name, newname)
+            names.add(newname)
+            descr.append((newname, other._v_dtype.fields[name][0]))
+            rfields.append((name, newname))
+        dtype = numpy.dtype(descr)
+
+        merge = (start is None and stop is None and step is None and
+                 all(col.is_indexed and col.index.is_csi and
+                     not col.index.dirty and
+                     col.index.nelements == col.table.nrows
+                     for col in (lcol, rcol)))
+        if merge:
+            blocks = self._join_merge(other, lcol, rcol, how, dtype, rfields)
+        else:
+            (start, stop, step) = self._process_range_read(start, stop,
+                                                            step)
+            blocks = self._join_lookup(other, lcol, rcol, how, dtype,
+                                       rfields, start, stop, step)
+        if dest is None:
+            return (internal_to_flavor(block, self.flavor)
+                    for block in blocks)
+        nrows = 0
+        for block in blocks:
+            dest.append(block)
+            nrows += len(block)
+        return nrows
+
+    def _join_lookup(self, other, lcol, rcol, how, dtype, rfields,
+                     start, stop, step):
+        """Join `other` looking up the keys in every I/O buffer.
+
+        The keys are looked up in the index of `rcol` if it can be used,
+        and in a sorted copy of it otherwise.  Blocks of joined rows are
+        yielded.  The range must already be processed.
+
+        """
+
+        rdflts = other._v_wdflts
+        rindexed = (rcol.is_indexed and not rcol.index.dirty and
+                    other._enabled_indexing_in_queries)
+        if not rindexed:
+            rkeys = other._read(0, other.nrows, 1, rcol.pathname)
+            rorder = numpy.argsort(rkeys, kind='mergesort')
+            rkeys = rkeys[rorder]
+        nrowsinbuf = self.nrowsinbuf
+        for bstart in xrange(start, stop, nrowsinbuf * step):
+            bstop = min(bstart + nrowsinbuf * step, stop)
+            lrecords = self._read(bstart, bstop, step)
+            lkeys = get_nested_field(lrecords, lcol.pathname)
+            keys = numpy.unique(lkeys)
+            if rindexed:
+                coords = other._where_coords(
+                    'isin(key, keys)', {'key': rcol, 'keys': keys},
+                    None, None, None, 1)
+                other._where_condition = None  # reset the conditions
+                coords = numpy.sort(coords)
+            else:
+                coords = numpy.sort(rorder[_expand_ranges(
+                    numpy.searchsorted(rkeys, keys, 'left'),
+                    numpy.searchsorted(rkeys, keys, 'right'))])
+            rrecords = other._read_coordinates(coords.astype(SizeType))
+            rrkeys = get_nested_field(rrecords, rcol.pathname)
+            order = numpy.argsort(rrkeys, kind='mergesort')
+            joined = _join_records(lrecords, lkeys, rrecords[order],
+                                   rrkeys[order], how, dtype, rfields, rdflts)
+            if len(joined):
+                yield joined
+
+    def _join_merge(self, other, lcol, rcol, how, dtype, rfields):
+        """Join `other` merging both tables in the order of their keys.
+
+        Both `lcol` and `rcol` must have complete CSI indexes.  Blocks of
+        joined rows are yielded.
+
+        """
+
+        rdflts = other._v_wdflts
+        lindex, rindex = lcol.index, rcol.index
+        nrowsinbuf = self.nrowsinbuf
+        rrecords = other._get_container(0)
+        rpos, rlast = 0, None
+        for lpos in xrange(0, lindex.nelements, nrowsinbuf):
+            # Slices of indexes past their elements are not clamped
+            lstop = min(lpos + nrowsinbuf, lindex.nelements)
+            lrecords = self._read_coordinates(
+                lindex[lpos:lstop].astype(SizeType))
+            lkeys = get_nested_field(lrecords, lcol.pathname)
+            maxkey = lkeys[-1]
+            # Read right rows until going past the keys in the left block
+            blocks = [rrecords]
+            while rpos < rindex.nelements and (rlast is None or
+                                               rlast <= maxkey):
+                rstop = min(rpos + nrowsinbuf, rindex.nelements)
+                block = other._read_coordinates(
+                    rindex[rpos:rstop].astype(SizeType))
+                rlast = get_nested_field(block, rcol.pathname)[-1]
+                rpos += len(block)
+                blocks.append(block)
+            rrecords = numpy.concatenate(blocks)
+            rkeys = get_nested_field(rrecords, rcol.pathname)
+            joined = _join_records(lrecords, lkeys, rrecords, rkeys,
+                                   how, dtype, rfields, rdflts)
+            if len(joined):
+                yield joined
+            # Following left blocks can not have smaller keys
+            rrecords = rrecords[numpy.searchsorted(rkeys, maxkey, 'left'):]
+
+    def itersequence(self, sequence, fields=None):
         """Iterate over a sequence of row coordinates.
 
+        The meaning of the fields argument is the same as in the
+        :meth:`Table.iterrows` method.
+
         Notes
         -----
         This iterator can be nested (see :meth:`Table.where` for an example).
@@ -1657,8 +3568,11 @@ class Table(tableextension.Table, Leaf):
         (start, stop, step) = self._process_range(None, None, None)
         if (start > stop) or (len(sequence) == 0):
             return iter([])
+        dtype = None
+        if fields is not None:
+            dtype = self._get_projected_dtype(fields)
         row = tableextension.Row(self)
-        return row._iter(start, stop, step, coords=sequence)
+        return row._iter(start, stop, step, coords=sequence, dtype=dtype)
 
     def _check_sortby_csi(self, sortby, checkCSI):
         if isinstance(sortby, Column):
@@ -1744,7 +3658,8 @@ class Table(tableextension.Table, Leaf):
 
     readSorted = previous_api(read_sorted)
 
-    def iterrows(self, start=None, stop=None, step=None):
+    def iterrows(self, start=None, stop=None, step=None, fields=None,
+                 prefetch=None):
         """Iterate over the table using a Row instance.
 
         If a range is not supplied, *all the rows* in the table are iterated
@@ -1752,6 +3667,16 @@ class Table(tableextension.Table, Leaf):
         that purpose. If you want to iterate over a given *range of rows* in
         the table, you may use the start, stop and step parameters.
 
+        If fields is supplied, only the named columns are read from disk
+        (nested columns are read as a whole) and can be accessed in the
+        rows, which can not be updated.
+
+        If prefetch is true, the next I/O buffer is read in a background
+        thread while the rows in the current one are being processed.
+        When None (the default), the value of the
+        :data:`tables.parameters.IO_PREFETCH` parameter is used.  Only
+        forward iterations are read ahead.
+
         .. warning::
 
             When in the middle of a table row iterator, you should not
@@ -1786,8 +3711,134 @@ class Table(tableextension.Table, Leaf):
         if (start > stop and 0 < step) or (start < stop and 0 > step):
             # Fall-back action is to return an empty iterator
             return iter([])
+        dtype = None
+        if fields is not None:
+            dtype = self._get_projected_dtype(fields)
+        if prefetch is None:
+            prefetch = self._v_file.params['IO_PREFETCH']
         row = tableextension.Row(self)
-        return row._iter(start, stop, step)
+        return row._iter(start, stop, step, dtype=dtype, prefetch=prefetch)
+
+    def iter_batches(self, batch_size=None, condition=None, condvars=None,
+                     fields=None, start=None, stop=None, step=None,
+                     as_dict=False):
+        """Iterate over the table in batches of rows.
+
+        This is the bulk counterpart of :meth:`Table.iterrows` and
+        :meth:`Table.where`: instead of a Row instance per row, NumPy
+        structured arrays holding up to batch_size rows are returned, so
+        vectorized code can process the table about as fast as with
+        :meth:`Table.read` while using a bounded amount of memory.  When
+        batch_size is None (the default), the number of rows in the I/O
+        buffer of the table (:attr:`Table.nrowsinbuf`) is used.  All the
+        batches but the last one have exactly batch_size rows.
+
+        If a condition is given, only the rows fulfilling it are returned
+        (see :meth:`Table.where` for the meaning of condition and
+        condvars).  Indexes, zone maps and Bloom filters of columns are
+        used when possible, and every I/O buffer is evaluated as a whole.
+
+        If fields is supplied, only the top level columns holding the
+        named ones are returned (and read from disk when possible).  The
+        meaning of the start, stop and step parameters is the same as in
+        :meth:`Table.iterrows`.
+
+        If as_dict is true, every batch is returned as a dictionary
+        mapping the names of the (top level) columns to their arrays.
+
+        The batches are always NumPy arrays, regardless of the flavor of
+        the table, and each one is a new array that can be kept by the
+        caller.
+
+        Examples
+        --------
+
+        ::
+
+            total = 0
+            for batch in table.iter_batches(condition='col1 > 0',
+                                            fields=['col2']):
+                total += batch['col2'].sum()
+
+        """
+
+        self._g_check_open()
+        if batch_size is None:
+            batch_size = self.nrowsinbuf
+        elif batch_size < 1:
+            raise ValueError("batch_size must be a positive number, "
+                             "not %r" % (batch_size,))
+        (start, stop, step) = self._process_range(start, stop, step)
+        dtype = self._v_dtype
+        if fields is not None:
+            dtype = self._get_projected_dtype(fields)
+        if condition is None:
+            batches = self._iter_range_batches(batch_size, fields,
+                                               start, stop, step)
+        else:
+            condvars = self._required_expr_vars(condition, condvars, depth=2)
+            batches = self._iter_where_batches(batch_size, fields, dtype,
+                                               condition, condvars,
+                                               start, stop, step)
+        if as_dict:
+            return (dict((name, batch[name]) for name in dtype.names)
+                    for batch in batches)
+        return batches
+
+    def _iter_range_batches(self, batch_size, fields, start, stop, step):
+        """Generate the batches of `iter_batches()` for a range of rows."""
+
+        span = batch_size * step
+        for bstart in xrange(start, stop, span):
+            yield self._read(bstart, min(bstart + span, stop), step,
+                             fields=fields)
+
+    def _iter_where_batches(self, batch_size, fields, dtype,
+                            condition, condvars, start, stop, step):
+        """Generate the batches of `iter_batches()` for a query.
+
+        The rows fulfilling `condition` in every I/O buffer are gathered
+        until there are at least `batch_size` of them.
+
+        """
+
+        if start >= stop:
+            self._use_index = False
+            self._where_condition = None
+            return
+        row, seq = self._where_row(condition, condvars, start, stop, step,
+                                   fields=fields)
+        if row is None:
+            # The result is already known
+            for i in xrange(0, len(seq), batch_size):
+                yield self._read_coordinates(seq[i:i + batch_size],
+                                             fields=fields)
+            return
+
+        pending, npending = [], 0
+        buf = row._next_buffer()
+        while buf is not None:
+            coords, iobuf, valid = buf
+            if len(coords):
+                if iobuf.dtype == dtype:
+                    records = iobuf[valid]
+                else:
+                    # Keep only the requested columns
+                    records = numpy.empty(len(coords), dtype=dtype)
+                    for name in dtype.names:
+                        records[name] = iobuf[name][valid]
+                pending.append(records)
+                npending += len(records)
+            if npending >= batch_size:
+                records = numpy.concatenate(pending)
+                nfull = npending - npending % batch_size
+                for i in xrange(0, nfull, batch_size):
+                    yield records[i:i + batch_size]
+                pending = [records[nfull:].copy()]
+                npending -= nfull
+            buf = row._next_buffer()
+        if npending:
+            yield numpy.concatenate(pending)
 
     def __iter__(self):
         """Iterate over the table using a Row instance.
@@ -1819,9 +3870,12 @@ class Table(tableextension.Table, Leaf):
 
         return self.iterrows()
 
-    def _read(self, start, stop, step, field=None, out=None):
+    def _read(self, start, stop, step, field=None, out=None, fields=None):
         """Read a range of rows and return an in-memory object."""
 
+        if field and fields is not None:
+            raise ValueError("the field and fields arguments can not be "
+                             "used at the same time")
         select_field = None
         if field:
             if field not in self.coldtypes:
@@ -1836,10 +3890,18 @@ class Table(tableextension.Table, Leaf):
                 # The column hangs directly from the top
                 dtype_field = self.coldtypes[field]
 
+        # Only the top level columns holding the selected data are read
+        if fields is not None:
+            dtype = self._get_projected_dtype(fields)
+        elif field or (select_field and out is None):
+            dtype = self._get_projected_dtype([field or select_field])
+        else:
+            dtype = self._v_dtype
+
         # Return a rank-0 array if start > stop
         if (start >= stop and 0 < step) or (start <= stop and 0 > step):
             if field is None:
-                nra = self._get_container(0)
+                nra = numpy.empty(shape=0, dtype=dtype)
                 return nra
             return numpy.empty(shape=0, dtype=dtype_field)
 
@@ -1852,7 +3914,7 @@ class Table(tableextension.Table, Leaf):
                 result = numpy.empty(shape=nrows, dtype=dtype_field)
             else:
                 # Recarray case
-                result = self._get_container(nrows)
+                result = numpy.empty(shape=nrows, dtype=dtype)
         else:
             # there is no fast way to byteswap, since different columns may
             # have different byteorders
@@ -1862,7 +3924,7 @@ class Table(tableextension.Table, Leaf):
             if field:
                 bytes_required = dtype_field.itemsize * nrows
             else:
-                bytes_required = self.rowsize * nrows
+                bytes_required = dtype.itemsize * nrows
             if bytes_required != out.nbytes:
                 raise ValueError(('output array size invalid, got {0} bytes, '
                                   'need {1} bytes').format(out.nbytes,
@@ -1871,11 +3933,16 @@ class Table(tableextension.Table, Leaf):
                 raise ValueError('output array not C contiguous')
             result = out
 
+        # The records are read with the dtype of the selected columns
+        buf = result
+        if out is not None and not field:
+            buf = out.view(dtype)
+
         # Call the routine to fill-up the resulting array
         if step == 1 and not field:
             # This optimization works three times faster than
             # the row._fill_col method (up to 170 MB/s on a pentium IV @ 2GHz)
-            self._read_records(start, stop - start, result)
+            self._read_records(start, stop - start, buf)
         # Warning!: _read_field_name should not be used until
         # H5TBread_fields_name in tableextension will be finished
         # F. Alted 2005/05/26
@@ -1884,14 +3951,15 @@ class Table(tableextension.Table, Leaf):
             # For step>15, this seems to work always faster than row._fill_col.
             self._read_field_name(result, start, stop, step, field)
         else:
-            self.row._fill_col(result, start, stop, step, field)
+            self.row._fill_col(buf, start, stop, step, field, dtype)
 
         if select_field:
             return result[select_field]
         else:
             return result
 
-    def read(self, start=None, stop=None, step=None, field=None, out=None):
+    def read(self, start=None, stop=None, step=None, field=None, out=None,
+             fields=None):
         """Get data in the table as a (record) array.
 
         The start, stop and step parameters can be used to select only
@@ -1908,6 +3976,13 @@ class Table(tableextension.Table, Leaf):
         parameter by using a slash character (/) as a separator (e.g.
         'position/x').
 
+        The fields parameter may be used to select several columns at
+        once.  A structured array of the current flavor will be returned
+        with only the top level columns holding the given ones (nested
+        columns are read as a whole), and only those columns are read
+        from disk.  It can not be used together with field.  Likewise,
+        when field is given only the column holding it is read from disk.
+
         The out parameter may be used to specify a NumPy array to
         receive the output data.  Note that the array must have the
         same size as the data selected with the other parameters.
@@ -1931,6 +4006,9 @@ class Table(tableextension.Table, Leaf):
            Added the *out* parameter.  Also the start, stop and step
            parameters now behave like in slice.
 
+        .. versionchanged:: 3.1.2
+           Added the *fields* parameter.
+
         Examples
         --------
 
@@ -1962,22 +4040,34 @@ class Table(tableextension.Table, Leaf):
         (start, stop, step) = self._process_range(start, stop, step,
                                                   warn_negstep=False)
 
-        arr = self._read(start, stop, step, field, out)
+        arr = self._read(start, stop, step, field, out, fields)
         return internal_to_flavor(arr, self.flavor)
 
-    def _read_coordinates(self, coords, field=None):
-        """Private part of `read_coordinates()` with no flavor conversion."""
+    def _read_coordinates(self, coords, field=None, fields=None):
+        """Private part of `read_coordinates()` with no flavor conversion.
+
+        If `fields` is given, only the columns holding them are read
+        (see `_get_projected_dtype()`).
+
+        """
 
         coords = self._point_selection(coords)
 
         ncoords = len(coords)
+        if fields is not None:
+            dtype = self._get_projected_dtype(fields)
+        elif field:
+            dtype = self._get_projected_dtype([field])
+        else:
+            dtype = self._v_dtype
         # Create a read buffer only if needed
         if field is None or ncoords > 0:
             # Doing a copy is faster when ncoords is small (<1000)
-            if ncoords < min(1000, self.nrowsinbuf):
+            if dtype is self._v_dtype and ncoords < min(1000,
+                                                        self.nrowsinbuf):
                 result = self._v_iobuf[:ncoords].copy()
             else:
-                result = self._get_container(ncoords)
+                result = numpy.empty(shape=ncoords, dtype=dtype)
 
         # Do the real read
         if ncoords > 0:
@@ -2193,13 +4283,14 @@ class Table(tableextension.Table, Leaf):
     def _save_buffered_rows(self, wbufRA, lenrows):
         """Update the indexes after a flushing of rows."""
 
+        if self._chunkfilters:
+            # Before the records get converted to their on-disk types
+            self._update_chunkfilters(self.nrows, wbufRA[:lenrows])
         self._open_append(wbufRA)
         self._append_records(lenrows)
         self._close_append()
         if self.indexed:
             self._unsaved_indexedrows += lenrows
-            # The table caches for indexed queries are dirty now
-            self._dirtycache = True
             if self.autoindex:
                 # Flush the unindexed rows
                 self.flush_rows_to_index(_lastrow=False)
@@ -2324,12 +4415,137 @@ class Table(tableextension.Table, Leaf):
             self._update_elements(lcoords, coords, recarr)
 
         # Redo the index if needed
-        self._reindex(self.colpathnames)
+        self._reindex(self.colpathnames, numpy.unique(coords))
 
         return SizeType(lcoords)
 
     modifyCoordinates = previous_api(modify_coordinates)
 
+    def modify_where(self, condition, assignments, condvars=None,
+                     start=None, stop=None, step=None):
+        """Modify the rows fulfilling the given condition.
+
+        The assignments argument maps column names (nested columns are
+        specified as paths like ``'info/name'``) to their new values.  A
+        value may be a string with an expression (using the same syntax
+        and variables as the condition) that is evaluated for every
+        matching row, or a constant.  All the expressions are evaluated
+        over the values the rows had before being modified.  Strings
+        given for string columns are always taken as constants.
+
+        The rows are processed an I/O buffer at a time, and only the rows
+        whose values actually change are written back, so the chunks
+        without changes are not rewritten.  Likewise, only the indexes of
+        the columns whose values change are updated (or marked as dirty).
+        The number of rows fulfilling the condition is returned.
+
+        The meaning of the other arguments is the same as in the
+        :meth:`Table.where` method.
+
+        Examples
+        --------
+
+        ::
+
+            # Clip negative energies and flag the clipped rows
+            table.modify_where('energy < 0',
+                               {'energy': 0, 'flags': 'flags | 4'})
+
+        """
+
+        self._g_check_open()
+        self._v_file._check_writable()
+        expressions = {}
+        for colname, value in assignments.iteritems():
+            if colname not in self.coldtypes:
+                raise KeyError("table ``%s`` does not have a column "
+                               "named ``%s``" % (self._v_pathname, colname))
+            if (isinstance(value, basestring) and
+                    self.coldtypes[colname].base.kind not in ('S', 'U')):
+                expressions[colname] = value
+
+        (start, stop, step) = self._process_range_read(start, stop, step)
+        if start >= stop:
+            return SizeType(0)
+        # The variables of the expressions must be taken from the caller
+        exprvars = {}
+        for expression in expressions.itervalues():
+            exprvars.update(
+                self._required_expr_vars(expression, condvars, depth=2))
+        condvars = self._required_expr_vars(condition, condvars, depth=2)
+        changed = set()
+        written = [numpy.empty(0, dtype=SizeType)]
+
+        def modify(coords, records):
+            # Compute all the new values before changing any column
+            newvalues = {}
+            for colname, value in assignments.iteritems():
+                if colname in expressions:
+                    localvars = {}
+                    for var, val in exprvars.iteritems():
+                        if isinstance(val, Column):
+                            val = get_nested_field(records, val.pathname)
+                        localvars[var] = val
+                    value = numexpr.evaluate(expressions[colname],
+                                             local_dict=localvars)
+                newvalues[colname] = value
+            rowschanged = numpy.zeros(len(records), dtype=bool)
+            for colname, value in newvalues.iteritems():
+                values = get_nested_field(records, colname)
+                oldvalues = values.copy()
+                values[...] = value
+                diff = values != oldvalues
+                if diff.ndim > 1:
+                    diff = diff.reshape(len(diff), -1).any(axis=1)
+                if diff.any():
+                    changed.add(colname)
+                    rowschanged |= diff
+            if rowschanged.any():
+                self._write_coordinates(coords[rowschanged],
+                                        records[rowschanged])
+                written.append(coords[rowschanged])
+
+        count = 0
+        # Reading ahead while writing is not safe
+        row, seq = self._where_row(condition, condvars, start, stop, step,
+                                   prefetch=False)
+        if row is None:
+            # The coordinates are already known, read them in buffers
+            seq = numpy.sort(seq)
+            nrowsinbuf = self.nrowsinbuf
+            count = len(seq)
+            for i in xrange(0, count, nrowsinbuf):
+                coords = seq[i:i + nrowsinbuf]
+                modify(coords, self._read_coordinates(coords))
+        else:
+            buf = row._next_buffer()
+            while buf is not None:
+                coords, iobuf, valid = buf
+                if len(coords):
+                    count += len(coords)
+                    modify(coords, iobuf[valid])
+                buf = row._next_buffer()
+        self._where_condition = None  # reset the conditions
+
+        # Only the indexes of the changed columns must be redone
+        self._reindex(sorted(changed), numpy.concatenate(written))
+        return SizeType(count)
+
+    def _write_coordinates(self, coords, records):
+        """Write the `records` at the (increasing) row `coords`.
+
+        Contiguous rows are written as a range, and scattered ones as a
+        point selection, so that only the chunks holding them are
+        rewritten.
+
+        """
+
+        coords = numpy.ascontiguousarray(coords, dtype='i8')
+        if coords[-1] - coords[0] + 1 == len(coords):
+            self._update_records(coords[0], coords[-1] + 1, 1, records)
+        else:
+            self._update_elements(len(coords), coords, records)
+
     def modify_rows(self, start=None, stop=None, step=None, rows=None):
         """Modify a series of rows in the slice [start:stop:step].
 
@@ -2341,6 +4557,13 @@ class Table(tableextension.Table, Leaf):
         The possible values for the rows argument are the same as in
         :meth:`Table.append`.
 
+        Indexes remain usable after modifying a few rows: the new values
+        of up to :data:`tables.parameters.INDEX_DELTA_MAX_ELEMENTS` rows
+        are kept aside in each index and looked up by queries as well.
+        Past that, indexes are rebuilt (or marked as dirty if automatic
+        indexing is disabled).  This also applies to the other methods
+        modifying rows.
+
         """
 
         if step is None:
@@ -2381,7 +4604,7 @@ class Table(tableextension.Table, Leaf):
         self._update_records(start, stop, step, recarr)
 
         # Redo the index if needed
-        self._reindex(self.colpathnames)
+        self._reindex(self.colpathnames, slice(start, stop, step))
 
         return SizeType(lenrows)
 
@@ -2464,7 +4687,7 @@ class Table(tableextension.Table, Leaf):
         # save this modified rows in table
         self._update_records(start, stop, step, mod_recarr)
         # Redo the index if needed
-        self._reindex([colname])
+        self._reindex([colname], slice(start, stop, step))
 
         return SizeType(nrows)
 
@@ -2542,7 +4765,7 @@ class Table(tableextension.Table, Leaf):
         # save this modified rows in table
         self._update_records(start, stop, step, mod_recarr)
         # Redo the index if needed
-        self._reindex(names)
+        self._reindex(names, slice(start, stop, step))
 
         return SizeType(nrows)
 
@@ -2570,18 +4793,34 @@ class Table(tableextension.Table, Leaf):
                             colname, start, nrows, _lastrow, update=True)
             self._unsaved_indexedrows -= rowsadded
             self._indexedrows += rowsadded
+        if _lastrow:
+            # Composite indexes are not updated for every I/O buffer of
+            # appended rows, just when flushing the table
+            self._flush_rows_to_composite_indexes()
         return rowsadded
 
     flushRowsToIndex = previous_api(flush_rows_to_index)
 
-    def _add_rows_to_index(self, colname, start, nrows, lastrow, update):
-        """Add more elements to the existing index."""
+    def _add_rows_to_index(self, colname, start, nrows, lastrow, update,
+                           nthreads=None):
+        """Add more elements to the existing index.
+
+        Complete slices are sorted by `nthreads` threads (the
+        ``MAX_INDEX_THREADS`` parameter by default).
+
+        """
 
         # This method really belongs to Column, but since it makes extensive
         # use of the table, it gets dangerous when closing the file, since the
         # column may be accessing a table which is being destroyed.
         index = self.cols._g_col(colname).index
+        if isinstance(index, BitmapIndex):
+            # Bitmaps have no slices, so every row is added
+            index.append_rows(self, start + nrows)
+            return nrows
         slicesize = index.slicesize
+        if nthreads is None:
+            nthreads = self._v_file.params['MAX_INDEX_THREADS']
         # The next loop does not rely on xrange so that it can
         # deal with long ints (i.e. more than 32-bit integers)
         # This allows to index columns with more than 2**31 rows
@@ -2589,12 +4828,19 @@ class Table(tableextension.Table, Leaf):
         startLR = index.sorted.nrows * slicesize
         indexedrows = startLR - start
         stop = start + nrows - slicesize + 1
-        while startLR < stop:
-            index.append(
-                [self._read(startLR, startLR + slicesize, 1, colname)],
-                update=update)
-            indexedrows += slicesize
-            startLR += slicesize
+        nslices = 0
+        if startLR < stop:
+            nslices = (stop - startLR - 1) // slicesize + 1
+
+        def read_slices(startLR):
+            while startLR < stop:
+                yield self._read(startLR, startLR + slicesize, 1, colname)
+                startLR += slicesize
+
+        index.append_slices(read_slices(startLR), update=update,
+                            nthreads=min(nthreads, nslices))
+        indexedrows += nslices * slicesize
+        startLR += nslices * slicesize
         # index the remaining rows in last row
         if lastrow and startLR < self.nrows:
             index.append_last_row(
@@ -2605,9 +4851,16 @@ class Table(tableextension.Table, Leaf):
 
     _addRowsToIndex = previous_api(_add_rows_to_index)
 
-    def remove_rows(self, start=None, stop=None, step=None):
+    def remove_rows(self, start=None, stop=None, step=None, coords=None):
         """Remove a range of rows in the table.
 
+        If coords is given, the rows at these coordinates (a sequence of
+        row indexes or a boolean mask over the table) are removed instead
+        of a range.  The following rows (and the ones in ranges with a
+        step) are moved down in a single pass over the table, and indexes
+        are updated once at the end.  The number of removed rows is
+        returned.
+
         .. versionchanged:: 3.0
            The start, stop and step parameters now behave like in slice.
 
@@ -2628,6 +4881,10 @@ class Table(tableextension.Table, Leaf):
 
             .. versionadded:: 3.0
 
+        coords : sequence of int or boolean array
+            The coordinates of the rows to remove.  It can not be used
+            together with a range.
+
         Examples
         --------
 
@@ -2643,6 +4900,10 @@ class Table(tableextension.Table, Leaf):
 
             t.remove_rows(6, 7)
 
+        Removing the 4th, 8th and 12th rows::
+
+            t.remove_rows(coords=[3, 7, 11])
+
         .. note::
 
             removing a single row can be done using the specific
@@ -2650,7 +4911,17 @@ class Table(tableextension.Table, Leaf):
 
         """
 
+        if coords is not None:
+            if (start, stop, step) != (None, None, None):
+                raise ValueError("the coords argument can not be used "
+                                 "together with a range")
+            return self._remove_coordinates(coords)
         (start, stop, step) = self._process_range(start, stop, step)
+        if step != 1:
+            # Move the surviving rows down at once, instead of removing
+            # the rows one at a time
+            return self._remove_coordinates(
+                numpy.arange(start, stop, step, dtype='i8'))
         nrows = numpy.abs(stop - start)
         if nrows >= self.nrows:
             raise NotImplementedError('You are trying to delete all the rows '
@@ -2666,6 +4937,74 @@ class Table(tableextension.Table, Leaf):
 
     removeRows = previous_api(remove_rows)
 
+    def remove_where(self, condition, condvars=None,
+                     start=None, stop=None, step=None):
+        """Remove the rows fulfilling the given condition.
+
+        The rows are located like in :meth:`Table.get_where_list`
+        (using indexes when possible), and then removed like with the
+        coords argument of :meth:`Table.remove_rows`, i.e. in a single
+        pass over the table.  The number of removed rows is returned.
+
+        The meaning of the arguments is the same as in the
+        :meth:`Table.where` method.
+
+        Examples
+        --------
+
+        ::
+
+            # Drop the rows of the expired sessions
+            t.remove_where('expires < now', {'now': time.time()})
+
+        """
+
+        self._g_check_open()
+        coords = self._where_coords(condition, condvars, start, stop, step)
+        self._where_condition = None  # reset the conditions
+        return self._remove_coordinates(coords)
+
+    def _remove_coordinates(self, coords):
+        """Remove the rows at `coords` in a single pass over the table.
+
+        The rows from the first removed one on are read an I/O buffer at
+        a time, and the surviving ones are written back right after the
+        rows already kept.  The table is then truncated and indexes are
+        updated once (see `_reindex()`).
+
+        """
+
+        self._g_check_open()
+        self._v_file._check_writable()
+        coords = numpy.unique(self._point_selection(coords).ravel())
+        if len(coords) == 0:
+            return SizeType(0)
+
+        nrows = self.nrows
+        nrowsinbuf = self.nrowsinbuf
+        iobuf = self._get_container(nrowsinbuf)
+        keep = numpy.empty(nrowsinbuf, dtype=bool)
+        first = wstart = int(coords[0])
+        for rstart in xrange(first, nrows, nrowsinbuf):
+            recout = self._read_records(
+                rstart, min(nrowsinbuf, nrows - rstart), iobuf)
+            records = iobuf[:recout]
+            lo, hi = coords.searchsorted([rstart, rstart + recout])
+            if lo < hi:
+                mask = keep[:recout]
+                mask[:] = True
+                mask[coords[lo:hi] - rstart] = False
+                records = records[mask]
+            if len(records):
+                self._update_records(wstart, wstart + len(records), 1,
+                                     records)
+                wstart += len(records)
+        self.truncate(wstart)
+        # Removing rows is an invalidating index operation
+        self._reindex(self.colpathnames)
+
+        return SizeType(len(coords))
+
     def remove_row(self, n):
         """Removes a row from the table.
 
@@ -2685,6 +5024,18 @@ class Table(tableextension.Table, Leaf):
 
         self.remove_rows(start=n, stop=n + 1)
 
+    def truncate(self, size):
+        """Truncate the table to be size rows.
+
+        This method has the behavior described in :meth:`Leaf.truncate`.
+        The zone maps and Bloom filters of columns are rebuilt on the
+        next query.
+
+        """
+
+        super(Table, self).truncate(size)
+        self._invalidate_chunkfilters(list(self._chunkfilters))
+
     def _g_update_dependent(self):
         super(Table, self)._g_update_dependent()
 
@@ -2748,8 +5099,14 @@ class Table(tableextension.Table, Leaf):
 
     _setColumnIndexing = previous_api(_set_column_indexing)
 
-    def _mark_columns_as_dirty(self, colnames):
-        """Mark column indexes in `colnames` as dirty."""
+    def _mark_columns_as_dirty(self, colnames, coords=None):
+        """Mark column indexes in `colnames` as dirty.
+
+        If the `coords` of the modified rows are given, indexes with room
+        for them in their delta are updated instead (see
+        `_update_index_delta()`).
+
+        """
 
         assert len(colnames) > 0
         if self.indexed:
@@ -2758,13 +5115,66 @@ class Table(tableextension.Table, Leaf):
             for colname in colnames:
                 if colindexed[colname]:
                     col = cols._g_col(colname)
-                    col.index.dirty = True
+                    if (coords is None or
+                            not self._update_index_delta(col, coords)):
+                        col.index.dirty = True
 
     _markColumnsAsDirty = previous_api(_mark_columns_as_dirty)
 
-    def _reindex(self, colnames):
-        """Re-index columns in `colnames` if automatic indexing is true."""
+    def _update_index_delta(self, col, coords):
+        """Keep the new values of the rows at `coords` in the index of `col`.
+
+        `coords` is an array or a slice with the modified rows.  Only the
+        rows already indexed are kept in the delta of the index (see
+        `Index.append_delta()`).  False is returned (and nothing is done)
+        if the index is dirty or there is no room for the rows in its
+        delta, so that it has to be rebuilt.  This is also the case for
+        full indexes, as they are read in order by `read_sorted()`,
+        `itersorted()` and `copy()` (with `sortby`), and the order of their
+        slices must follow the current values.  Bitmap indexes are always
+        updated in place instead (see `BitmapIndex.update_rows()`).
 
+        """
+
+        index = col.index
+        if index.dirty or index.kind == 'full':
+            return False
+        nelements = index.nelements
+        if isinstance(coords, slice):
+            start, stop, step = coords.indices(nelements)
+            nrows = max(0, (stop - start + step - 1) // step)
+        else:
+            coords = coords[coords < nelements]
+            nrows = len(coords)
+        if nrows == 0:
+            return True
+        bitmap = isinstance(index, BitmapIndex)
+        maxelements = self._v_file.params['INDEX_DELTA_MAX_ELEMENTS']
+        if not bitmap and index.ndelta + nrows > maxelements:
+            return False
+        if isinstance(coords, slice):
+            values = self._read(start, stop, step, col.pathname)
+            coords = numpy.arange(start, stop, step, dtype=numpy.int64)
+        else:
+            values = self._read_coordinates(coords, col.pathname)
+        if bitmap:
+            index.update_rows(coords, values)
+        else:
+            index.append_delta(coords, values)
+        return True
+
+    def _reindex(self, colnames, coords=None):
+        """Re-index columns in `colnames` if automatic indexing is true.
+
+        If the `coords` of the modified rows are given (an array or a
+        slice), indexes with room for them in their delta are updated
+        instead (see `_update_index_delta()`).
+
+        """
+
+        self._invalidate_chunkfilters(colnames)
+        if self._mark_composite_indexes_dirty(colnames) and self.autoindex:
+            self._reindex_composite_indexes(dirty=True)
         if self.indexed:
             colindexed, cols = self.colindexed, self.cols
             colstoindex = []
@@ -2772,6 +5182,9 @@ class Table(tableextension.Table, Leaf):
             for colname in colnames:
                 if colindexed[colname]:
                     col = cols._g_col(colname)
+                    if (coords is not None and
+                            self._update_index_delta(col, coords)):
+                        continue
                     col.index.dirty = True
                     colstoindex.append(colname)
             # Now, re-index the dirty ones
@@ -2785,6 +5198,7 @@ class Table(tableextension.Table, Leaf):
     def _do_reindex(self, dirty):
         """Common code for `reindex()` and `reindex_dirty()`."""
 
+        self._reindex_composite_indexes(dirty)
         indexedrows = 0
         for (colname, colindexed) in self.colindexed.iteritems():
             if colindexed:
@@ -2826,6 +5240,142 @@ class Table(tableextension.Table, Leaf):
 
     reIndexDirty = previous_api(reindex_dirty)
 
+    def _get_composite_indexes(self):
+        """Get a dictionary mapping columns to their composite indexes.
+
+        The keys are the tuples of columns of the composite indexes in the
+        table, and the values their `CompositeIndex` nodes.
+
+        """
+
+        itgpathname = _index_pathname_of(self)
+        get_node = self._v_file._get_node
+        if self._compositeindexes is None:
+            self._compositeindexes = {}
+            try:
+                itgroup = get_node(itgpathname)
+            except NoSuchNodeError:
+                pass
+            else:
+                for name in itgroup._v_children:
+                    if name.startswith('_composite_'):
+                        cindex = itgroup._f_get_child(name)
+                        self._compositeindexes[cindex.columns] = name
+        return dict((columns, get_node(join_path(itgpathname, name)))
+                    for (columns, name)
+                    in self._compositeindexes.iteritems())
+
+    def create_composite_index(self, columns, filters=None):
+        """Create an index over several columns of the table.
+
+        The rows are sorted by the values of the columns (given by their
+        path names) in the columns sequence, which are compared in order.
+        Then, a query whose condition is a conjunction (``&``) of
+        equalities of the leading columns with constants, maybe followed
+        by comparisons of the next column, only reads and evaluates the
+        rows fulfilling them.  For instance, an index over
+        ``('instrument', 'timestamp')`` selects the rows for
+        ``(instrument == b'ES') & (timestamp >= t0) & (timestamp < t1)``.
+        A composite index is preferred to column indexes when both can be
+        used.
+
+        Only scalar numerical, boolean and string columns can be indexed.
+        The index is saved in the file with the given filters (the ones
+        of column indexes by default), and kept up to date as stated by
+        :attr:`Table.autoindex`.  Appended rows are added to the index
+        when the table is flushed (see :meth:`Table.flush`), and scanned
+        by queries until then.  The number of indexed rows is returned.
+
+        """
+
+        self._g_check_open()
+        self._v_file._check_writable()
+        columns = tuple(columns)
+        if len(columns) < 2 or len(set(columns)) < len(columns):
+            raise ValueError("composite indexes need two or more "
+                             "different columns")
+        keysize = 0
+        for colname in columns:
+            col = self.cols._g_col(colname)
+            kind, itemsize = col.dtype.kind, col.dtype.itemsize
+            if (col.shape[1:] != () or kind not in 'biufS'
+                    or (kind == 'f' and itemsize not in (2, 4, 8))):
+                raise TypeError("column ``%s`` of type ``%s`` can not be "
+                                "part of a composite index"
+                                % (colname, col.type))
+            keysize += itemsize
+        if columns in self._get_composite_indexes():
+            raise ValueError("a composite index over columns %s already "
+                             "exists" % (columns,))
+
+        try:
+            itgroup = self._v_file._get_node(_index_pathname_of(self))
+        except NoSuchNodeError:
+            itgroup = create_indexes_table(self)
+        if filters is None:
+            filters = default_index_filters
+        cindex = CompositeIndex(
+            itgroup, _composite_index_name_of(columns), columns, keysize,
+            filters, expectedrows=max(self._v_expectedrows, self.nrows))
+        self._compositeindexes[columns] = cindex._v_name
+        cindex.build(self)
+        return SizeType(cindex.nelements)
+
+    def remove_composite_index(self, columns):
+        """Remove the composite index over columns, if any.
+
+        See :meth:`Table.create_composite_index` for more information.
+
+        """
+
+        self._v_file._check_writable()
+        columns = tuple(columns)
+        cindexes = self._get_composite_indexes()
+        if columns in cindexes:
+            cindexes[columns]._f_remove(recursive=True)
+            del self._compositeindexes[columns]
+
+    def _mark_composite_indexes_dirty(self, colnames):
+        """Mark the composite indexes over `colnames` as dirty.
+
+        True is returned if there is some such index.
+
+        """
+
+        colnames = set(colnames)
+        marked = False
+        for columns, cindex in self._get_composite_indexes().iteritems():
+            if colnames.intersection(columns):
+                if not cindex.dirty:
+                    cindex.dirty = True
+                marked = True
+        return marked
+
+    def _reindex_composite_indexes(self, dirty):
+        """Build the composite indexes again (only dirty ones if `dirty`).
+
+        Indexes holding more rows than the table (e.g. after truncating
+        it) are dirty too.
+
+        """
+
+        nrows = self.nrows
+        for cindex in self._get_composite_indexes().itervalues():
+            if not dirty or cindex.dirty or cindex.nelements > nrows:
+                cindex.build(self)
+
+    def _flush_rows_to_composite_indexes(self):
+        """Add the rows after the indexed ones to composite indexes.
+
+        Dirty indexes are left untouched.
+
+        """
+
+        nrows = self.nrows
+        for cindex in self._get_composite_indexes().itervalues():
+            if not cindex.dirty and cindex.nelements < nrows:
+                cindex.append_rows(self)
+
     def _g_copy_rows(self, object, start, stop, step, sortby, checkCSI):
         "Copy rows from self to object"
         if sortby is None:
@@ -2877,7 +5427,11 @@ class Table(tableextension.Table, Leaf):
     _g_copyRows_optim = previous_api(_g_copy_rows_optim)
 
     def _g_prop_indexes(self, other):
-        """Generate index in `other` table for every indexed column here."""
+        """Generate index in `other` table for every index here.
+
+        Both column indexes and composite indexes are generated.
+
+        """
 
         oldcols, newcols = self.colinstances, other.colinstances
         for colname in newcols:
@@ -2889,6 +5443,8 @@ class Table(tableextension.Table, Leaf):
                     newcol.create_index(
                         kind=oldcolindex.kind, optlevel=oldcolindex.optlevel,
                         filters=oldcolindex.filters, tmp_dir=None)
+        for columns, cindex in self._get_composite_indexes().iteritems():
+            other.create_composite_index(columns, filters=cindex.filters)
 
     _g_propIndexes = previous_api(_g_prop_indexes)
 
@@ -2913,7 +5469,7 @@ class Table(tableextension.Table, Leaf):
         self._g_copy_rows(newtable, start, stop, step, sortby, checkCSI)
         nbytes = newtable.nrows * newtable.rowsize
         # Generate equivalent indexes in the new table, if required.
-        if propindexes and self.indexed:
+        if propindexes and (self.indexed or self._get_composite_indexes()):
             self._g_prop_indexes(newtable)
         return (newtable, nbytes)
 
@@ -2970,6 +5526,10 @@ class Table(tableextension.Table, Leaf):
             if self._dirtyindexes:
                 # Finally, re-index any dirty column
                 self.reindex_dirty()
+        if (self.autoindex and self._v_file._iswritable()
+                and self._get_composite_indexes()):
+            self._reindex_composite_indexes(dirty=True)
+            self._flush_rows_to_composite_indexes()
 
         super(Table, self).flush()
 
@@ -3024,6 +5584,13 @@ class Table(tableextension.Table, Leaf):
         #   to first close ``Table`` objects and then ``Index`` hierarchies.
         #
 
+        # Do not leave background reads behind (e.g. of broken loops).
+        for prefetcher in list(self._prefetchers):
+            try:
+                prefetcher.wait()
+            except Exception:
+                pass  # the records are not going to be used anyway
+
         # Flush right now so the row object does not get in the middle.
         if flush:
             self.flush()
@@ -3532,11 +6099,21 @@ class Column(object):
                 "'%s' key type is not valid in this context" % key)
 
     def __iter__(self):
-        """Iterate through all items in the column."""
+        """Iterate through all items in the column.
+
+        When the :data:`tables.parameters.IO_PREFETCH` parameter is true,
+        the next I/O buffer is read in a background thread while the items
+        in the current one are being processed.
+
+        """
 
         table = self.table
         itemsize = self.dtype.itemsize
         nrowsinbuf = table._v_file.params['IO_BUFFER_SIZE'] // itemsize
+        if table._v_file.params['IO_PREFETCH']:
+            for item in self._iter_prefetch(nrowsinbuf):
+                yield item
+            return
         buf = numpy.empty((nrowsinbuf, ), self._itemtype)
         max_row = len(self)
         for start_row in xrange(0, len(self), nrowsinbuf):
@@ -3547,6 +6124,44 @@ class Column(object):
             for row in buf_slice:
                 yield row
 
+    def _iter_prefetch(self, nrowsinbuf):
+        """Iterate through all items in the column reading ahead.
+
+        Two buffers holding just the top level column are used, one of
+        them being filled in the background while the other is consumed.
+
+        """
+
+        table = self.table
+        dtype = table._get_projected_dtype([self.pathname])
+        bufs = [numpy.empty((nrowsinbuf, ), dtype) for i in range(2)]
+        max_row = len(self)
+        prefetcher = None
+        try:
+            for nbuf, start_row in enumerate(xrange(0, max_row, nrowsinbuf)):
+                buf = bufs[nbuf % 2]
+                if prefetcher is None:
+                    with hdf5_lock:
+                        table._read_records(start_row, nrowsinbuf, buf)
+                else:
+                    prefetcher.wait()
+                next_row = start_row + nrowsinbuf
+                prefetcher = None
+                if next_row < max_row:
+                    prefetcher = tableextension.RecordsPrefetcher(
+                        table, next_row, nrowsinbuf, bufs[(nbuf + 1) % 2])
+                buf_slice = get_nested_field(buf[:max_row - start_row],
+                                             self.pathname)
+                for row in buf_slice:
+                    yield row
+        finally:
+            # Wait for the pending read when breaking out of the loop
+            if prefetcher is not None:
+                try:
+                    prefetcher.wait()
+                except Exception:
+                    pass  # the buffer is not going to be used anyway
+
     def __setitem__(self, key, value):
         """Set a row or a range of rows in a column.
 
@@ -3604,8 +6219,8 @@ class Column(object):
             raise ValueError("Non-valid index or slice: %s" % key)
 
     def create_index(self, optlevel=6, kind="medium", filters=None,
-                     tmp_dir=None, _blocksizes=None, _testmode=False,
-                     _verbose=False):
+                     tmp_dir=None, nthreads=None, progress=None,
+                     _blocksizes=None, _testmode=False, _verbose=False):
         """Create an index for this column.
 
         .. warning::
@@ -3637,6 +6252,19 @@ class Column(object):
             the table does not exceed the 2**48 figure (that is more than 100
             trillions of rows).  See :meth:`Column.create_csindex` method for a
             more direct way to create a CSI index.
+
+            The 'bitmap' kind keeps a compressed bitmap of the rows with
+            every distinct value of the column instead (see
+            :class:`tables.index.BitmapIndex`), so equality, range and
+            ``isin()`` conditions, and their combinations with other
+            conditions on columns with bitmap indexes, select exactly the
+            rows fulfilling them.  It is meant for integer, boolean and
+            string columns with few distinct values (up to the
+            :data:`tables.parameters.BITMAP_INDEX_MAX_VALUES` parameter),
+            and the optlevel has no effect on it.
+
+            .. versionchanged:: 3.1.2
+               The 'bitmap' kind was added.
         filters : Filters
             Specify the Filters instance used to compress the index.  If None,
             default index filters will be used (currently, zlib level 1 with
@@ -3647,10 +6275,27 @@ class Column(object):
             to specify the directory for this temporary file.  The default is
             to create it in the same directory as the file containing the
             original table.
+        nthreads : int
+            The number of threads used for sorting the slices of the index
+            while it is being built.  The table is still read and the index
+            saved by a single thread.  If None, the value of the
+            :data:`tables.parameters.MAX_INDEX_THREADS` parameter is used.
+
+            .. versionadded:: 3.1.2
+
+        progress : callable
+            A callable for following the final merge of the slices of a
+            completely sorted index (i.e. when kind is 'full' and optlevel
+            is 9).  It is called as ``progress(nmerged, total)`` with the
+            number of elements merged so far and the total number of them.
+            The memory used by the merge is set by the
+            :data:`tables.parameters.INDEX_SORT_MEMORY` parameter.
+
+            .. versionadded:: 3.1.2
 
         """
 
-        kinds = ['ultralight', 'light', 'medium', 'full']
+        kinds = ['ultralight', 'light', 'medium', 'full', 'bitmap']
         if kind not in kinds:
             raise ValueError("Kind must have any of these values: %s" % kinds)
         if (not isinstance(optlevel, (int, long)) or
@@ -3669,14 +6314,19 @@ class Column(object):
                 (not isinstance(_blocksizes, tuple) or len(_blocksizes) != 4)):
             raise ValueError("_blocksizes must be a tuple with exactly 4 "
                              "elements")
+        if nthreads is not None and (not isinstance(nthreads, (int, long)) or
+                                     nthreads < 1):
+            raise ValueError("nthreads must be a positive integer")
         idxrows = _column__create_index(self, optlevel, kind, filters,
-                                        tmp_dir, _blocksizes, _verbose)
+                                        tmp_dir, _blocksizes, _verbose,
+                                        nthreads, progress)
         return SizeType(idxrows)
 
     createIndex = previous_api(create_index)
 
-    def create_csindex(self, filters=None, tmp_dir=None,
-                       _blocksizes=None, _testmode=False, _verbose=False):
+    def create_csindex(self, filters=None, tmp_dir=None, nthreads=None,
+                       progress=None, _blocksizes=None, _testmode=False,
+                       _verbose=False):
         """Create a completely sorted index (CSI) for this column.
 
         This method guarantees the creation of an index with zero entropy, that
@@ -3686,8 +6336,8 @@ class Column(object):
         :meth:`Table.itersorted` or :meth:`Table.read_sorted`) in order to
         ensure completely sorted results.
 
-        For the meaning of filters and tmp_dir arguments see
-        :meth:`Column.create_index`.
+        For the meaning of filters, tmp_dir, nthreads and progress arguments
+        see :meth:`Column.create_index`.
 
         Notes
         -----
@@ -3698,7 +6348,8 @@ class Column(object):
 
         return self.create_index(
             kind='full', optlevel=9, filters=filters, tmp_dir=tmp_dir,
-            _blocksizes=_blocksizes, _testmode=_testmode, _verbose=_verbose)
+            nthreads=nthreads, progress=progress, _blocksizes=_blocksizes,
+            _testmode=_testmode, _verbose=_verbose)
 
     createCSIndex = previous_api(create_csindex)
 
@@ -3776,6 +6427,103 @@ class Column(object):
 
     removeIndex = previous_api(remove_index)
 
+    def create_zonemap(self):
+        """Keep the minimum and maximum values of this column per chunk.
+
+        These statistics (a *zone map*) let in-kernel queries skip the
+        chunks of the table that can not hold rows fulfilling comparisons
+        of the column with constants, like the ones that can use indexes
+        (see :meth:`Table.will_query_use_indexing`).  They are much
+        cheaper to build and keep up to date than an index, and work
+        well for columns whose values are mostly sorted, like
+        timestamps.  Queries that can use indexes do not use zone maps.
+
+        Zone maps are saved in the file beside the indexes of the table
+        and updated as rows are appended.  Other modifications (including
+        removals of rows and truncations) cause a rebuild on the next
+        query.  Only numerical and boolean columns are supported.
+
+        """
+
+        table = self.table
+        table._g_check_open()
+        if self.dtype.kind not in 'biuf':
+            raise TypeError("zone maps are not supported for column ``%s`` "
+                            "of type ``%s``" % (self.pathname, self.type))
+        if self.shape[1:] != ():
+            raise TypeError("zone maps are not supported for "
+                            "multidimensional column ``%s``" % self.pathname)
+        if self.pathname not in table._chunkfilters:
+            table._create_chunkfilter(self.pathname, _ZoneMap(self.dtype))
+
+    def remove_zonemap(self):
+        """Remove the zone map of this column, if any.
+
+        See :meth:`Column.create_zonemap` for more information.
+
+        """
+
+        if self.has_zonemap:
+            self.table._remove_chunkfilter(self.pathname)
+
+    def _has_zonemap(self):
+        return isinstance(self.table._chunkfilters.get(self.pathname),
+                          _ZoneMap)
+
+    has_zonemap = property(_has_zonemap, None, None,
+                           "True if the column has a zone map, false "
+                           "otherwise.")
+
+    def create_bloomfilter(self):
+        """Keep a Bloom filter of the values of this column per chunk.
+
+        The filters let in-kernel queries skip the chunks of the table
+        that can not hold rows fulfilling equality comparisons of the
+        column with constants (like ``col == b"abc"``) or membership
+        tests (see :ref:`condition_syntax`).  They suit columns with many
+        distinct strings, where zone maps would not discard any chunk,
+        and they are much cheaper to build and keep up to date than an
+        index.  About 1% of the chunks without the values are still read.
+        Queries that can use indexes do not use Bloom filters.
+
+        Bloom filters are saved in the file beside the indexes of the
+        table and updated as rows are appended.  Other modifications
+        (including removals of rows and truncations) cause a rebuild on
+        the next query.  Only string columns are supported.
+
+        """
+
+        table = self.table
+        table._g_check_open()
+        if self.dtype.kind != 'S':
+            raise TypeError("Bloom filters are not supported for column "
+                            "``%s`` of type ``%s``"
+                            % (self.pathname, self.type))
+        if self.shape[1:] != ():
+            raise TypeError("Bloom filters are not supported for "
+                            "multidimensional column ``%s``" % self.pathname)
+        if self.pathname not in table._chunkfilters:
+            table._create_chunkfilter(self.pathname, _BloomFilter(
+                self.dtype.itemsize, table._v_chunkshape[0]))
+
+    def remove_bloomfilter(self):
+        """Remove the Bloom filter of this column, if any.
+
+        See :meth:`Column.create_bloomfilter` for more information.
+
+        """
+
+        if self.has_bloomfilter:
+            self.table._remove_chunkfilter(self.pathname)
+
+    def _has_bloomfilter(self):
+        return isinstance(self.table._chunkfilters.get(self.pathname),
+                          _BloomFilter)
+
+    has_bloomfilter = property(_has_bloomfilter, None, None,
+                               "True if the column has a Bloom filter, "
+                               "false otherwise.")
+
     def close(self):
         """Close this column."""
 
@@ -3802,6 +6550,228 @@ class Column(object):
         return str(self)
 
 
+def _reduce_runs(records, keys, reductions):
+    """Reduce the runs of equal `keys` in `records`.
+
+    The `keys` must be sorted.  A ``(runkeys, counts, partials)`` tuple
+    is returned, with the key and number of rows of every run, and a
+    dictionary mapping ``(colname, op)`` tuples to the partial results
+    of the `reductions` (see `Table._check_aggregates()`) in every run.
+
+    """
+
+    nkeys = len(keys)
+    if nkeys:
+        starts = numpy.concatenate(
+            ([0], (keys[1:] != keys[:-1]).nonzero()[0] + 1))
+    else:
+        starts = numpy.array([], dtype=SizeType)
+    counts = numpy.diff(numpy.append(starts, nkeys)).astype(SizeType)
+    partials = {}
+    for colname, ops in reductions.iteritems():
+        values = get_nested_field(records, colname)
+        for op in ops:
+            if op == 'count' or (colname, op) in partials:
+                continue
+            if op in ('sum', 'mean'):
+                # Sums are done with the type that NumPy would use
+                sumtype = numpy.zeros(0, dtype=values.dtype).sum().dtype
+                values2 = values.astype(sumtype)
+            else:
+                values2 = values
+            if nkeys:
+                partials[colname, op] = _reduction_ufuncs[op].reduceat(
+                    values2, starts, axis=0)
+            else:
+                partials[colname, op] = values2[:0]
+    return keys[starts], counts, partials
+
+
+def _slice_runs(runkeys, counts, partials, start, stop):
+    """Get a copy of the runs from `start` to `stop` (see `_reduce_runs()`)."""
+
+    return (runkeys[start:stop].copy(), counts[start:stop].copy(),
+            dict((key, value[start:stop].copy())
+                 for key, value in partials.iteritems()))
+
+
+class GroupBy(object):
+    """Rows of a table grouped by the values of a column.
+
+    Instances of this class are returned by :meth:`Table.groupby`.  The
+    aggregates of every group are computed with the :meth:`GroupBy.agg`
+    method, which reads the table in blocks, so that memory usage is
+    proportional to the number of groups rather than to the number of
+    rows.
+
+    Parameters
+    ----------
+    table
+        The parent table instance
+    by
+        The name of the grouping column, or a Column instance
+
+    """
+
+    def __init__(self, table, by):
+        if isinstance(by, Column):
+            column = by
+        else:
+            column = table.cols._f_col(by)
+        if not isinstance(column, Column) or column.shape[1:]:
+            raise TypeError("column ``%s`` is not scalar, so it can not be "
+                            "used for grouping" % (by,))
+        self._table_file = table._v_file
+        self._table_path = table._v_pathname
+        self.column = column
+        """The Column instance (see :ref:`ColumnClassDescr`) whose values
+        define the groups."""
+
+    def _gettable(self):
+        return self._table_file._get_node(self._table_path)
+
+    table = property(_gettable, None, None,
+                     """The parent Table instance (see
+                     :ref:`TableClassDescr`).""")
+
+    def agg(self, aggregates):
+        """Compute aggregates for every group.
+
+        The aggregates argument is a mapping from column names to
+        reductions, like in :meth:`Table.aggregate_where`.  A structured
+        array is returned with a row for every group, ordered by key.
+        Its first field holds the key (with the name of the grouping
+        column), and the result of every reduction is in a field named
+        after the column and the reduction, like ``'energy_sum'``.
+        ``'count'`` reductions are computed like the rest, even though
+        they are the same for every column.
+
+        If the grouping column has a CSI index, the rows are read in the
+        order of the index and the runs of rows with equal keys are
+        reduced as they come.  Otherwise, every I/O buffer is sorted
+        and its runs are merged into a mapping from keys to partial
+        results.
+
+        """
+
+        table = self.table
+        table._g_check_open()
+        column = self.column
+        reductions = table._check_aggregates(aggregates)
+        fields = [column.pathname] + list(reductions)
+        index = column.index
+        if (index is not None and index.is_csi and not index.dirty and
+                index.nelements == table.nrows):
+            runs = self._agg_sorted(index, reductions, fields)
+        else:
+            runs = self._agg_hashed(reductions, fields)
+        runkeys, counts, partials = runs
+
+        # Build the result
+        results = [(column.name, runkeys)]
+        for colname, ops in reductions.iteritems():
+            for op in ops:
+                if op == 'count':
+                    value = counts
+                elif op == 'mean':
+                    shape = (-1,) + (1,) * (partials[colname, op].ndim - 1)
+                    value = numpy.true_divide(partials[colname, op],
+                                              counts.reshape(shape))
+                else:
+                    value = partials[colname, op]
+                results.append(('%s_%s' % (colname, op), value))
+        result = numpy.empty(len(runkeys), dtype=[
+            (name, value.dtype, value.shape[1:]) for name, value in results])
+        for name, value in results:
+            result[name] = value
+        return result
+
+    def _agg_sorted(self, index, reductions, fields):
+        """Reduce the runs of rows read in the order of the CSI `index`.
+
+        The last run in every block is kept apart until the next block
+        shows whether it goes on.
+
+        """
+
+        table = self.table
+        colpath = self.column.pathname
+        nrowsinbuf = table.nrowsinbuf
+        blocks = []
+        pending = None
+        nelements = index.nelements
+        for pos in xrange(0, nelements, nrowsinbuf):
+            # Slices of indexes past their elements are not clamped
+            stop = min(pos + nrowsinbuf, nelements)
+            coords = index[pos:stop].astype(SizeType)
+            records = table._read_coordinates(coords, fields=fields)
+            runkeys, counts, partials = _reduce_runs(
+                records, get_nested_field(records, colpath), reductions)
+            if pending is not None:
+                pkeys, pcounts, ppartials = pending
+                if runkeys[0] == pkeys[0]:
+                    # The pending run goes on in this block
+                    counts[0] += pcounts[0]
+                    for key, value in partials.iteritems():
+                        value[0] = _reduction_ufuncs[key[1]](
+                            ppartials[key][0], value[0])
+                else:
+                    blocks.append(pending)
+            blocks.append(_slice_runs(runkeys, counts, partials, 0, -1))
+            pending = _slice_runs(runkeys, counts, partials, -1, None)
+        if pending is not None:
+            blocks.append(pending)
+        return self._concatenate_runs(blocks, reductions, fields)
+
+    def _agg_hashed(self, reductions, fields):
+        """Reduce the runs of rows in every (sorted) I/O buffer.
+
+        The partial results of the runs are merged in a dictionary
+        mapping keys to them.
+
+        """
+
+        table = self.table
+        colpath = self.column.pathname
+        nrowsinbuf = table.nrowsinbuf
+        groups = {}
+        for start in xrange(0, table.nrows, nrowsinbuf):
+            stop = min(start + nrowsinbuf, table.nrows)
+            records = table._read(start, stop, 1, fields=fields)
+            keys = get_nested_field(records, colpath)
+            order = numpy.argsort(keys, kind='mergesort')
+            runkeys, counts, partials = _reduce_runs(
+                records[order], keys[order], reductions)
+            for i, key in enumerate(runkeys.tolist()):
+                run = _slice_runs(runkeys, counts, partials, i, i + 1)
+                group = groups.get(key)
+                if group is None:
+                    groups[key] = run
+                    continue
+                group[1][0] += run[1][0]
+                for pkey, value in group[2].iteritems():
+                    value[0] = _reduction_ufuncs[pkey[1]](
+                        value[0], run[2][pkey][0])
+        blocks = [groups[key] for key in sorted(groups)]
+        return self._concatenate_runs(blocks, reductions, fields)
+
+    def _concatenate_runs(self, blocks, reductions, fields):
+        """Concatenate the keys, counts and partials of blocks of runs."""
+
+        if not blocks:
+            records = numpy.empty(
+                0, dtype=self.table._get_projected_dtype(fields))
+            return _reduce_runs(
+                records, get_nested_field(records, self.column.pathname),
+                reductions)
+        runkeys = numpy.concatenate([block[0] for block in blocks])
+        counts = numpy.concatenate([block[1] for block in blocks])
+        partials = dict(
+            (key, numpy.concatenate([block[2][key] for block in blocks]))
+            for key in blocks[0][2])
+        return runkeys, counts, partials
+
+
 ## Local Variables:
 ## mode: python
 ## py-indent-offset: 4
@@ -24,6 +24,7 @@ Misc variables:
 """
 
 import sys
+import threading
 import numpy
 from time import time
 
@@ -34,7 +35,7 @@ from tables.utilsextension import (get_nested_field, atom_from_hdf5_type,
   create_nested_type, hdf5_to_np_ext_type, create_nested_type, platform_byteorder,
   pttype_to_hdf5, pt_special_kinds, npext_prefixes_to_ptkinds, hdf5_class_to_string,
   H5T_STD_I64)
-from tables.utils import SizeType
+from tables.utils import SizeType, hdf5_lock
 
 from utilsextension cimport get_native_type, cstr_to_pystr
 
@@ -54,7 +55,8 @@ from definitions cimport (hid_t, herr_t, hsize_t, htri_t,
   H5Pget_layout, H5Pget_chunk, H5Pclose,
   H5Sget_simple_extent_ndims, H5Sget_simple_extent_dims, H5Sclose,
   H5T_class_t, H5Tget_size, H5Tset_size, H5Tcreate, H5Tcopy, H5Tclose,
-  H5Tget_nmembers, H5Tget_member_name, H5Tget_member_type, H5Tget_native_type,
+  H5Tget_nmembers, H5Tget_member_name, H5Tget_member_index,
+  H5Tget_member_type, H5Tget_native_type,
   H5Tget_member_value, H5Tinsert, H5Tget_class, H5Tget_super, H5Tget_offset,
   H5T_cset_t, H5T_CSET_ASCII, H5T_CSET_UTF8,
   H5ATTRset_attribute_string, H5ATTRset_attribute,
@@ -446,11 +448,16 @@ cdef class Table(Leaf):
 
     """
 
+    # Buffers may only hold some of the columns (see _get_mem_type())
+    fields = recarr.dtype.fields
+
     # For reading, first swap the byteorder by hand
     # (this is not currently supported by HDF5)
     if sense == 1:
       for colpathname in self.colpathnames:
         if self.coltypes[colpathname] in ["time32", "time64"]:
+          if colpathname.split('/')[0] not in fields:
+            continue
           colobj = self.coldescrs[colpathname]
           if hasattr(colobj, "_byteorder"):
             if colobj._byteorder != platform_byteorder:
@@ -460,9 +467,43 @@ cdef class Table(Leaf):
 
     # This should be generalised to support other type conversions.
     for t64cname in self._time64colnames:
+      if t64cname.split('/')[0] not in fields:
+        continue
       column = get_nested_field(recarr, t64cname)
       self._convert_time64_(column, nrecords, sense)
 
+  cdef hid_t _get_mem_type(self, ndarray recarr) except -1:
+    """Get the HDF5 memory type for reading records into 'recarr'.
+
+    When 'recarr' only holds some of the (top level) columns of the
+    table, a compound type with just those members, laid out as in
+    'recarr', is built so that HDF5 only transfers the data of the
+    needed columns.  In this case the caller is responsible for closing
+    the returned type.
+
+    """
+
+    cdef hid_t mem_type_id, member_type_id
+    cdef int i
+    cdef bytes encoded_name
+
+    dtype = recarr.dtype
+    if dtype is self._v_dtype or dtype == self._v_dtype:
+      return self.type_id
+
+    mem_type_id = H5Tcreate(H5T_COMPOUND, dtype.itemsize)
+    for name in dtype.names:
+      encoded_name = name.encode('utf-8')
+      i = H5Tget_member_index(self.type_id, encoded_name)
+      if i < 0:
+        H5Tclose(mem_type_id)
+        raise HDF5ExtError("Column ``%s`` not found in table." % name)
+      member_type_id = H5Tget_member_type(self.type_id, i)
+      H5Tinsert(mem_type_id, encoded_name, dtype.fields[name][1],
+                member_type_id)
+      H5Tclose(member_type_id)
+    return mem_type_id
+
   def _open_append(self, ndarray recarr):
     self._v_recarray = <object>recarr
     # Get the pointer to the buffer data area
@@ -486,6 +527,8 @@ cdef class Table(Leaf):
       raise HDF5ExtError("Problems appending the records.")
 
     self.nrows = self.nrows + nrecords
+    # Existing rows are not changed, so caches are only partially stale
+    self._invalidate_appended_cache(nrows)
 
   def _close_append(self):
     cdef hsize_t nrows
@@ -497,9 +540,6 @@ cdef class Table(Leaf):
                               0, NULL, <char *>&nrows) < 0):
         raise HDF5ExtError("Problems setting the NROWS attribute.")
 
-    # Set the caches to dirty (in fact, and for the append case,
-    # it should be only the caches based on limits, but anyway)
-    self._dirtycache = True
     # Delete the reference to recarray as we doesn't need it anymore
     self._v_recarray = None
 
@@ -560,6 +600,7 @@ cdef class Table(Leaf):
   def _read_records(self, hsize_t start, hsize_t nrecords, ndarray recarr):
     cdef void *rbuf
     cdef int ret
+    cdef hid_t mem_type_id
 
     # Correct the number of records to read, if needed
     if (start + nrecords) > self.nrows:
@@ -567,12 +608,16 @@ cdef class Table(Leaf):
 
     # Get the pointer to the buffer data area
     rbuf = recarr.data
+    # Only the columns in recarr are read
+    mem_type_id = self._get_mem_type(recarr)
 
     # Read the records from disk
     with nogil:
-        ret = H5TBOread_records(self.dataset_id, self.type_id, start,
+        ret = H5TBOread_records(self.dataset_id, mem_type_id, start,
                                 nrecords, rbuf)
 
+    if mem_type_id != self.type_id:
+      H5Tclose(mem_type_id)
     if ret < 0:
       raise HDF5ExtError("Problems reading records.")
 
@@ -616,6 +661,7 @@ cdef class Table(Leaf):
     cdef void *rbuf
     cdef void *rbuf2
     cdef int ret
+    cdef hid_t mem_type_id
 
     # Get the chunk of the coords that correspond to a buffer
     nrecords = coords.size
@@ -623,11 +669,15 @@ cdef class Table(Leaf):
     rbuf = recarr.data
     # Get the pointer to the buffer coords area
     rbuf2 = coords.data
+    # Only the columns in recarr are read
+    mem_type_id = self._get_mem_type(recarr)
 
     with nogil:
-        ret = H5TBOread_elements(self.dataset_id, self.type_id,
+        ret = H5TBOread_elements(self.dataset_id, mem_type_id,
                                  nrecords, rbuf2, rbuf)
 
+    if mem_type_id != self.type_id:
+      H5Tclose(mem_type_id)
     if ret < 0:
       raise HDF5ExtError("Problems reading records.")
 
@@ -674,6 +724,46 @@ cdef class Table(Leaf):
       raise ValueError("step size may not be 0.")
 
 
+class RecordsPrefetcher(object):
+  """Read some records of a table into a buffer in a background thread.
+
+  The records are read with `Table._read_records()` while holding
+  `tables.utils.hdf5_lock`.  Call `wait()` to get the number of records
+  read (or the exception raised while reading them).  Pending reads are
+  registered in the table, which waits for them when it is closed.
+
+  """
+
+  def __init__(self, table, start, nrecords, recarr):
+    self.table = table
+    self.start = start
+    self.nrecords = nrecords
+    self.recarr = recarr
+    self._result = None
+    self._error = None
+    self._thread = threading.Thread(target=self._read)
+    self._thread.daemon = True
+    table._prefetchers.add(self)
+    self._thread.start()
+
+  def _read(self):
+    try:
+      with hdf5_lock:
+        self._result = self.table._read_records(self.start, self.nrecords,
+                                                self.recarr)
+    except Exception as exc:
+      self._error = exc
+
+  def wait(self):
+    """Wait for the records to be read and return their number."""
+
+    self._thread.join()
+    self.table._prefetchers.discard(self)
+    if self._error is not None:
+      raise self._error
+    return self._result
+
+
 cdef class Row:
   """Table row iterator and field accessor.
 
@@ -711,7 +801,7 @@ cdef class Row:
   cdef int     _riterator, _stride, _rowsize, _write_to_seqcache
   cdef int     wherecond, indexed
   cdef int     ro_filemode, chunked
-  cdef int     _bufferinfo_done, sss_on
+  cdef int     _bufferinfo_done, sss_on, _projected, _prefetch
   cdef int     iterseq_max_elements
   cdef ndarray bufcoords, indexvalid, indexvalues, chunkmap
   cdef hsize_t *bufcoords_data
@@ -730,6 +820,7 @@ cdef class Row:
   cdef object  _table_file, _table_path
   cdef object  modified_fields
   cdef object  seqcache_key
+  cdef object  _prefetcher, _prefetch_buf, _prefetch_rfields
 
   # Deprecated API
   indexChunk = previous_api_property('indexchunk')
@@ -772,6 +863,9 @@ cdef class Row:
     self._nrow = 0   # Useful in mod_append read iterators
     self._riterator = 0
     self._bufferinfo_done = 0
+    self._projected = 0
+    self._prefetch = 0
+    self._prefetcher = None
     # Some variables from table will be cached here
     if table._v_file.mode == 'r':
       self.ro_filemode = 1
@@ -790,9 +884,26 @@ cdef class Row:
     self.wfieldscache = {}
     self.modified_fields = set()
 
-  def _iter(self, start=0, stop=0, step=1, coords=None, chunkmap=None):
-    """Return an iterator for traversiong the data in table."""
+  def _iter(self, start=0, stop=0, step=1, coords=None, chunkmap=None,
+            dtype=None, prefetch=False):
+    """Return an iterator for traversiong the data in table.
+
+    If `dtype` is given, only the (top level) columns in it are read
+    (see `_project_buffer()`).  This is not supported with a `chunkmap`,
+    as chunks are read in full from the chunk cache.
+
+    If `prefetch` is true, the next I/O buffer is read in a background
+    thread while the current one is being consumed.  This is only done
+    for sequential reads of ranges (see `_read_buffer()`).
+
+    """
+    if dtype is not None:
+      self._project_buffer(dtype)
     self._init_loop(start, stop, step, coords, chunkmap)
+    if (prefetch and not self.indexed and self.coords is None and
+        0 < self.step < self.nrowsinbuf and
+        (self.step == 1 or not self.wherecond)):
+      self._enable_prefetch()
     return iter(self)
 
   def __iter__(self):
@@ -830,10 +941,97 @@ cdef class Row:
     self._rowsize = self.dtype.itemsize
     self.nrows = table.nrows  # This value may change
 
+  cdef _project_buffer(self, object dtype):
+    """Make the read buffer hold just the (top level) columns in dtype.
+
+    Only these columns will be read from disk and be accessible while
+    iterating.  Rows can neither be appended nor updated afterwards.
+
+    """
+
+    cdef object buff, names
+
+    if dtype is self.dtype:
+      return
+    buff = self.iobuf = numpy.empty(shape=self.nrowsinbuf, dtype=dtype)
+    self.rfields = self._get_rfields(buff)
+    self._stride = buff.strides[0]
+    self._projected = 1
+
+  cdef object _get_rfields(self, ndarray buff):
+    """Build the rfields dictionary for the columns in a read buffer."""
+
+    cdef object names, rfields
+
+    # Field positions still refer to the columns in the table
+    names = self.dtype.names
+    rfields = {}
+    for name in buff.dtype.names:
+      rfields[names.index(name)] = buff[name]
+      rfields[name] = buff[name]
+    return rfields
+
+  cdef _enable_prefetch(self):
+    """Get a second read buffer for reading ahead in the background."""
+
+    if self._prefetch_buf is None:
+      self._prefetch_buf = numpy.empty(shape=self.nrowsinbuf,
+                                       dtype=self.iobuf.dtype)
+      self._prefetch_rfields = self._get_rfields(self._prefetch_buf)
+    self._prefetch = 1
+
+  cdef _wait_prefetch(self):
+    """Wait for the pending background read (if any) and discard it."""
+
+    cdef object prefetcher
+
+    prefetcher = self._prefetcher
+    if prefetcher is not None:
+      self._prefetcher = None
+      try:
+        prefetcher.wait()
+      except Exception:
+        pass  # the buffer is not going to be used anyway
+
+  cdef object _read_buffer(self, hsize_t start):
+    """Read the I/O buffer starting at row `start` into self.iobuf.
+
+    In prefetch mode, the buffer is taken from the background read if it
+    was already requested, and the read of the one following it is
+    requested.  The number of rows read is returned.
+
+    """
+
+    cdef object prefetcher, recout, buff
+
+    prefetcher = self._prefetcher
+    if prefetcher is not None and prefetcher.start == start:
+      self._prefetcher = None
+      recout = prefetcher.wait()
+      # Swap the read buffers
+      buff = self.iobuf
+      self.iobuf = self._prefetch_buf
+      self._prefetch_buf = buff
+      buff = self.rfields
+      self.rfields = self._prefetch_rfields
+      self._prefetch_rfields = buff
+      self.rfieldscache = {}
+    else:
+      self._wait_prefetch()
+      with hdf5_lock:
+        recout = self.table._read_records(start, self.nrowsinbuf, self.iobuf)
+    if self._prefetch and start + self.nrowsinbuf < self.stop:
+      self._prefetcher = RecordsPrefetcher(
+        self.table, start + self.nrowsinbuf, self.nrowsinbuf,
+        self._prefetch_buf)
+    return recout
+
   cdef _init_loop(self, hsize_t start, long long stop, long long step,
                  object coords, object chunkmap):
     """Initialization for the __iter__ iterator"""
     table = self.table
+    self._wait_prefetch()
+    self._prefetch = 0
     self._riterator = 1   # We are inside a read iterator
     self.start = start
     self.stop = stop
@@ -1089,8 +1287,7 @@ cdef class Row:
           self.stopb = self.nrowsinbuf
         self._row = self.startb - self.step
         # Read a chunk
-        recout = self.table._read_records(self.nextelement, self.nrowsinbuf,
-                                          self.iobuf)
+        recout = self._read_buffer(self.nextelement)
         self.nrowsread = self.nrowsread + recout
         self.indexchunk = -self.step
 
@@ -1142,8 +1339,7 @@ cdef class Row:
             self.stopb = self.nrowsinbuf
           self._row = self.startb - self.step
           # Read a chunk
-          recout = self.table._read_records(self.nrowsread, self.nrowsinbuf,
-                                            self.iobuf)
+          recout = self._read_buffer(self.nrowsread)
           self.nrowsread = self.nrowsread + recout
 
         self._row = self._row + self.step
@@ -1180,16 +1376,22 @@ cdef class Row:
     """Clean-up things after iterator has been done"""
     cdef ObjectCache seqcache
 
+    self._wait_prefetch()      # do not leave reads behind
     self.rfieldscache = {}     # empty rfields cache
     self.wfieldscache = {}     # empty wfields cache
     # Make a copy of the last read row in the private record
     # (this is useful for accessing the last row after an iterator loop)
     if self._row >= 0:
-      self.wrec[:] = self.iobuf[self._row]
+      if self._projected:
+        for name in self.iobuf.dtype.names:
+          self.wrec[name][:] = self.iobuf[name][self._row]
+      else:
+        self.wrec[:] = self.iobuf[self._row]
     if self._write_to_seqcache:
       seqcache = self.table._seqcache
       # Guessing iterseq size: Each element in self.iterseq should take at least 8 bytes
-      seqcache.setitem_(self.seqcache_key, self.iterseq, len(self.iterseq) * 8)
+      seqcache.setitem_(self.seqcache_key, (self.nrows, self.iterseq),
+                        len(self.iterseq) * 8)
     self._riterator = 0        # out of iterator
     self.iterseq = None        # empty seqcache-related things
     self.seqcache_key = None
@@ -1198,15 +1400,128 @@ cdef class Row:
     self.modified_fields = set()  # Empty the set of modified fields
     raise StopIteration        # end of iteration
 
-  def _fill_col(self, result, start, stop, step, field):
-    """Read a field from a table on disk and put the result in result"""
+  def _next_buffer(self):
+    """Read the next I/O buffer of a query and evaluate it as a whole.
+
+    This is the bulk counterpart of the indexed and in-kernel versions
+    of next().  It returns a ``(coords, iobuf, valid)`` tuple, where
+    `iobuf` is the (reused) I/O buffer holding the rows just read,
+    `valid` is a boolean mask telling which of them fulfil the
+    condition and the given range, and `coords` holds the row
+    coordinates of the valid rows.  None is returned when the iterator
+    is exhausted.  No per-row Python objects are created.
+
+    """
+
+    cdef long j, cs
+    cdef hsize_t recout, nchunk, stopchunk, nchunksinbuf
+    cdef long long bstart, nrecords, rem
+    cdef Table table
+    cdef ndarray iobuf
+    cdef object bufcoords, tmp_range, valid, coords, stepmask
+
+    if not self._riterator or not self.wherecond:
+      return None
+
+    table = self.table
+    if self.indexed:
+      # Fetch valid chunks until the I/O buffer is full
+      cs = self.chunksize
+      nchunk = self.nrowsread / cs
+      if nchunk < self.start / cs:
+        nchunk = self.start / cs
+      stopchunk = (self.stop + cs - 1) / cs
+      if stopchunk > self.totalchunks:
+        stopchunk = self.totalchunks
+      nchunksinbuf = self.nchunksinbuf
+      if nchunksinbuf == 0:
+        # Chunks are read whole, so the buffer must hold one at least
+        nchunksinbuf = 1
+        if len(self.iobuf) < cs:
+          self.iobuf = numpy.empty(shape=cs, dtype=self.iobuf.dtype)
+      tmp_range = numpy.arange(0, cs, dtype=SizeType)
+      bufcoords = numpy.empty(nchunksinbuf * cs, dtype=SizeType)
+      iobuf = self.iobuf
+      j = 0;  recout = 0
+      while nchunk < stopchunk and j < nchunksinbuf:
+        if self.chunkmap_data[nchunk]:
+          bufcoords[j*cs:(j+1)*cs] = tmp_range + nchunk*cs
+          recout = recout + table._read_chunk(nchunk, iobuf, j*cs)
+          j = j + 1
+        nchunk = nchunk + 1
+      self.nrowsread = nchunk*cs
+      if recout == 0:
+        return self._finish_buffers()
+      iobuf = iobuf[:recout]
+      table._convert_types(iobuf, recout, 1)
+      valid = call_on_recarr(self.condfunc, self.condargs, iobuf)
+      bufcoords = bufcoords[:recout]
+      # Apply the limitations on start, stop, step (if any)
+      if self.sss_on:
+        valid &= (bufcoords >= self.start) & (bufcoords < self.stop)
+        if self.step > 1:
+          valid &= ((bufcoords - self.start) % self.step == 0)
+      coords = bufcoords[valid]
+    else:
+      # Go to the first element in the step grid for this buffer
+      bstart = self.nrowsread
+      if self.step > 1:
+        rem = (bstart - self.start) % self.step
+        if rem:
+          bstart = bstart + self.step - rem
+      if bstart >= self.stop:
+        return self._finish_buffers()
+      nrecords = self.stop - bstart
+      if nrecords > self.nrowsinbuf:
+        nrecords = self.nrowsinbuf
+      recout = table._read_records(bstart, nrecords, self.iobuf)
+      self.nrowsread = bstart + recout
+      if recout == 0:
+        return self._finish_buffers()
+      iobuf = self.iobuf[:recout]
+      valid = call_on_recarr(self.condfunc, self.condargs, iobuf)
+      if self.step > 1:
+        stepmask = numpy.zeros(recout, dtype=numpy.bool_)
+        stepmask[::self.step] = True
+        valid &= stepmask
+      coords = valid.nonzero()[0].astype(SizeType)
+      coords += bstart
+
+    if self._write_to_seqcache:
+      # Feed the valid coordinates into the seqcache
+      if len(coords) + len(self.iterseq) < self.iterseq_max_elements:
+        self.iterseq.extend(coords)
+      else:
+        self.iterseq = None
+        self._write_to_seqcache = 0
+
+    return (coords, iobuf, valid)
+
+  cdef _finish_buffers(self):
+    """Clean-up things after the buffers of a query have been read."""
+
+    try:
+      self._finish_riterator()
+    except StopIteration:
+      pass
+    return None
+
+  def _fill_col(self, result, start, stop, step, field, dtype=None):
+    """Read a field from a table on disk and put the result in result
+
+    If dtype is given, only the (top level) columns in it are read.
+
+    """
 
     cdef hsize_t startr, istartb
     cdef hsize_t istart, inrowsinbuf, inextelement
     cdef long long stopr, istopb, i, j, inrowsread
     cdef long long istop, istep
-    cdef object fields
+    cdef object fields, iobuf
 
+    iobuf = self.iobuf
+    if dtype is not None and dtype is not self.dtype:
+      iobuf = numpy.empty(shape=self.nrowsinbuf, dtype=dtype)
     # We can't reuse existing buffers in this context
     self._init_loop(start, stop, step, None, None)
     istart, istop, istep = (self.start, self.stop, self.step)
@@ -1226,9 +1541,9 @@ cdef class Row:
         stopr = startr + ((istopb - istartb - 1) / istep) + 1
         # Read a chunk
         inrowsread = inrowsread + self.table._read_records(i, inrowsinbuf,
-                                                           self.iobuf)
+                                                           iobuf)
         # Assign the correct part to result
-        fields = self.iobuf
+        fields = iobuf
         if field:
           fields = get_nested_field(fields, field)
         result[startr:stopr] = fields[istartb:istopb:istep]
@@ -1259,9 +1574,9 @@ cdef class Row:
         stopr = startr + ((istopb - istartb - 1) / istep)
         # Read a chunk
         inrowsread = inrowsread + self.table._read_records(i - inrowsinbuf + 1,
-                                                           inrowsinbuf, self.iobuf)
+                                                           inrowsinbuf, iobuf)
         # Assign the correct part to result
-        fields = self.iobuf
+        fields = iobuf
         if field:
           fields = get_nested_field(fields, field)
         if istopb >= 0:
@@ -1321,6 +1636,9 @@ cdef class Row:
     if self._riterator:
       raise NotImplementedError("You cannot append rows when in middle of a table iterator. If what you want is to update records, use Row.update() instead.")
 
+    if self._projected:
+      raise NotImplementedError("You cannot append rows through a row reading only some of the columns.")
+
     # Commit the private record into the write buffer
     # self.iobuf[self._unsaved_nrows] = self.wrec
     # The next is faster
@@ -1403,6 +1721,9 @@ cdef class Row:
     if not self._riterator:
       raise NotImplementedError("You are only allowed to update rows through the Row.update() method if you are in the middle of a table iterator.")
 
+    if self._projected:
+      raise NotImplementedError("You cannot update rows when only some of the columns are being read.")
+
     if self.mod_elements is None:
       # Initialize an array for keeping the modified elements
       # (just in case Row.update() would be used)
@@ -1431,12 +1752,18 @@ cdef class Row:
     """Flush any possible modified row using Row.update()"""
 
     table = self.table
+    # HDF5 can not write while reading ahead in the background
+    self._wait_prefetch()
     # Save the records on disk
     table._update_elements(self._mod_nrows, self.mod_elements, self.iobufcpy)
+    coords = numpy.unique(self.mod_elements[:self._mod_nrows])
     # Reset the counter of modified rows to 0
     self._mod_nrows = 0
-    # Mark the modified fields' indexes as dirty.
-    table._mark_columns_as_dirty(self.modified_fields)
+    # Mark the modified fields' indexes as dirty (or keep the new values
+    # aside in them).
+    table._mark_columns_as_dirty(self.modified_fields, coords)
+    table._invalidate_chunkfilters(self.modified_fields)
+    table._mark_composite_indexes_dirty(self.modified_fields)
 
   _flushModRows = previous_api(_flush_mod_rows)
 
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+
+"""Test module for the asynchronous facade in ``tables.aio``."""
+
+from __future__ import print_function
+import os
+import tempfile
+
+import numpy
+
+import tables
+from tables.tests import common
+from tables.tests.common import unittest, areArraysEqual
+from tables.tests.common import PyTablesTestCase as TestCase
+
+try:
+    import asyncio
+    from tables import aio
+except ImportError:
+    asyncio = None
+
+
+@unittest.skipIf(asyncio is None, 'asyncio required')
+class AsyncTableTestCase(TestCase):
+    """Checking asynchronous reads and appends on tables."""
+
+    nrows = 100
+
+    def setUp(self):
+        super(AsyncTableTestCase, self).setUp()
+        self.h5fname = tempfile.mktemp(suffix='.h5')
+        dtype = numpy.dtype([('c1', 'i4'), ('c2', 'f8')])
+        self.array = numpy.empty((self.nrows, ), dtype)
+        self.array['c1'] = numpy.arange(self.nrows)
+        self.array['c2'] = numpy.arange(self.nrows) * 0.5
+        with tables.open_file(self.h5fname, 'w') as h5file:
+            table = h5file.create_table('/', 'table', dtype)
+            table.append(self.array)
+            h5file.create_array('/', 'array', numpy.arange(10))
+        self.loop = asyncio.new_event_loop()
+        self.afile = self.wait(aio.open_file(self.h5fname, 'a',
+                                             loop=self.loop))
+        self.table = self.wait(self.afile.get_node('/table'))
+        self.table.node.nrowsinbuf = 7  # force several I/O buffers
+
+    def tearDown(self):
+        self.wait(self.afile.close())
+        self.loop.close()
+        os.remove(self.h5fname)
+        super(AsyncTableTestCase, self).tearDown()
+
+    def wait(self, future):
+        return self.loop.run_until_complete(future)
+
+    def test_read(self):
+        result = self.wait(self.table.read())
+        self.assertTrue(areArraysEqual(result, self.array))
+        result = self.wait(self.table.read(3, 90, 4))
+        self.assertTrue(areArraysEqual(result, self.array[3:90:4]))
+        result = self.wait(self.table.read(field='c2'))
+        self.assertTrue(areArraysEqual(result, self.array['c2']))
+        self.assertEqual(len(self.wait(self.table.read(50, 50))), 0)
+
+    def test_read_where(self):
+        result = self.wait(self.table.read_where('c1 % 3 == 0'))
+        self.assertTrue(areArraysEqual(result, self.array[::3]))
+        limit = 90
+        result = self.wait(self.table.read_where('c1 >= limit', field='c2'))
+        self.assertTrue(areArraysEqual(result, self.array['c2'][90:]))
+
+    def test_read_coordinates(self):
+        coords = [3, 10, 11, 50, 99]
+        result = self.wait(self.table.read_coordinates(coords))
+        self.assertTrue(areArraysEqual(result, self.array[coords]))
+
+    def test_append(self):
+        self.wait(self.table.append(self.array))
+        self.wait(self.afile.flush())
+        self.assertEqual(self.table.node.nrows, 2 * self.nrows)
+        result = self.wait(self.table.read(self.nrows, 2 * self.nrows))
+        self.assertTrue(areArraysEqual(result, self.array))
+
+    def test_array(self):
+        array = self.wait(self.afile.get_node('/array'))
+        self.assertTrue(isinstance(array, aio.AsyncLeaf))
+        self.assertTrue(areArraysEqual(self.wait(array.read(2, 5)),
+                                       numpy.arange(2, 5)))
+        group = self.wait(self.afile.get_node('/'))
+        self.assertTrue(isinstance(group, tables.Group))
+
+    def test_cancel(self):
+        first = self.table.read()
+        second = self.table.read_where('c1 > 10')
+        second.cancel()
+        self.assertTrue(areArraysEqual(self.wait(first), self.array))
+        self.assertTrue(second.cancelled())
+        # The file can still be used
+        self.assertEqual(len(self.wait(self.table.read_where('c1 > 10'))),
+                         self.nrows - 11)
+
+    def test_errors(self):
+        self.assertRaises(tables.NoSuchNodeError, self.wait,
+                          self.afile.get_node('/missing'))
+        self.assertRaises(ValueError, self.wait, self.table.append([(1,)]))
+
+
+def suite():
+    theSuite = unittest.TestSuite()
+    theSuite.addTest(unittest.makeSuite(AsyncTableTestCase))
+    return theSuite
+
+
+if __name__ == '__main__':
+    import sys
+    common.parse_argv(sys.argv)
+    common.print_versions()
+    unittest.main(defaultTest='suite')
@@ -2654,6 +2654,565 @@ class TestIndexingNans(TempFileMixin, TestCase):
         self.assertEqual(len(results), 100*2)
 
 
+class ParallelIndexTestCase(TempFileMixin, TestCase):
+    """Checking indexes built with several threads."""
+
+    nrows = 1000
+    conditions = {
+        '(col > 20) & (col <= 50)': lambda col: (col > 20) & (col <= 50),
+        'col == 73': lambda col: col == 73,
+        'col < 5': lambda col: col < 5,
+    }
+
+    def setUp(self):
+        super(ParallelIndexTestCase, self).setUp()
+        self.values = numpy.random.RandomState(1).randint(0, 100, self.nrows)
+        self.table = self.h5file.create_table(
+            '/', 'table', {'serial': Int32Col(), 'parallel': Int32Col()})
+        self.append(self.values)
+
+    def append(self, values):
+        rows = numpy.empty(len(values), dtype=self.table.dtype)
+        rows['serial'] = values
+        rows['parallel'] = values
+        self.table.append(rows)
+        self.table.flush()
+
+    def check_indexes(self):
+        table = self.table
+        sindex = table.cols.serial.index
+        pindex = table.cols.parallel.index
+        self.assertEqual(sindex.nelements, pindex.nelements)
+        self.assertTrue(allequal(sindex.sorted[:], pindex.sorted[:]))
+        self.assertTrue(allequal(sindex.indices[:], pindex.indices[:]))
+        for condition in self.conditions:
+            expected = table.get_where_list(condition.replace('col', 'serial'))
+            coords = table.get_where_list(condition.replace('col', 'parallel'))
+            self.assertTrue(allequal(coords, expected))
+
+    def check_queries(self, colname):
+        for condition, func in self.conditions.items():
+            expected = numpy.nonzero(func(self.values))[0]
+            coords = self.table.get_where_list(
+                condition.replace('col', colname))
+            self.assertTrue(allequal(coords, expected))
+
+    def test00_create_index(self):
+        """Building indexes of every kind with several threads."""
+
+        cols = self.table.cols
+        for kind in ['ultralight', 'light', 'medium', 'full']:
+            cols.serial.create_index(kind=kind, nthreads=1,
+                                     _blocksizes=small_blocksizes)
+            indexedrows = cols.parallel.create_index(
+                kind=kind, nthreads=3, _blocksizes=small_blocksizes)
+            self.assertEqual(indexedrows, self.nrows)
+            self.check_indexes()
+            cols.serial.remove_index()
+            cols.parallel.remove_index()
+
+    def test01_create_csindex(self):
+        """Building a completely sorted index with several threads."""
+
+        cols = self.table.cols
+        cols.serial.create_csindex(nthreads=1, _blocksizes=small_blocksizes)
+        cols.parallel.create_csindex(nthreads=4,
+                                     _blocksizes=small_blocksizes)
+        self.assertTrue(cols.parallel.is_indexed)
+        self.assertEqual(cols.parallel.index.is_csi, True)
+        self.check_indexes()
+
+    def test02_parameter(self):
+        """Building indexes with threads set in MAX_INDEX_THREADS."""
+
+        self.h5file.params['MAX_INDEX_THREADS'] = 4
+        self.table.cols.parallel.create_index(kind='full',
+                                              _blocksizes=small_blocksizes)
+        self.check_queries('parallel')
+
+    def test03_append(self):
+        """Adding rows to indexes with several threads."""
+
+        self.table.cols.parallel.create_index(kind='full',
+                                              _blocksizes=small_blocksizes)
+        self.h5file.params['MAX_INDEX_THREADS'] = 3
+        # The first slice indexed now holds the rows in the last row
+        values = numpy.random.RandomState(2).randint(0, 100, 250)
+        self.append(values)
+        self.values = numpy.concatenate((self.values, values))
+        self.assertEqual(self.table.cols.parallel.index.nelements,
+                         self.table.nrows)
+        self.check_queries('parallel')
+
+    def test04_errors(self):
+        """Checking wrong numbers of threads."""
+
+        col = self.table.cols.parallel
+        self.assertRaises(ValueError, col.create_index, nthreads=0)
+        self.assertRaises(ValueError, col.create_index, nthreads=1.5)
+        self.assertFalse(col.is_indexed)
+
+
+class CompleteSortMergeTestCase(TempFileMixin, TestCase):
+    """Checking the merge of slices for completely sorted indexes."""
+
+    nrows = 1000
+    nnans = 10
+
+    def setUp(self):
+        super(CompleteSortMergeTestCase, self).setUp()
+        random = numpy.random.RandomState(3)
+        rows = numpy.empty(self.nrows, dtype=[('icol', 'i4'), ('fcol', 'f8')])
+        rows['icol'] = random.randint(0, 500, self.nrows)
+        rows['fcol'] = random.uniform(-1, 1, self.nrows)
+        rows['fcol'][random.permutation(self.nrows)[:self.nnans]] = numpy.nan
+        self.rows = rows
+        self.table = self.h5file.create_table('/', 'table', obj=rows)
+        self.calls = []
+
+    def progress(self, nmerged, total):
+        self.calls.append((nmerged, total))
+
+    def check_csi(self, colname):
+        col = self.table.cols._f_col(colname)
+        col.create_csindex(progress=self.progress,
+                           _blocksizes=small_blocksizes)
+        index = col.index
+        self.assertEqual(index.is_csi, True)
+        # The slices were still overlapping before being merged
+        self.assertTrue(len(self.calls) > 0)
+        nmerged = [call[0] for call in self.calls]
+        self.assertEqual(nmerged, sorted(nmerged))
+        self.assertEqual(self.calls[-1], (self.nrows, self.nrows))
+        values = self.rows[colname]
+        sorted_ = index.read_sorted()
+        indices = index.read_indices()
+        nvalues = self.nrows - numpy.isnan(values).sum()
+        self.assertTrue(allequal(sorted_[:nvalues],
+                                 numpy.sort(values)[:nvalues]))
+        self.assertTrue(numpy.isnan(sorted_[nvalues:]).all())
+        self.assertTrue(allequal(numpy.sort(indices),
+                                 numpy.arange(self.nrows, dtype='uint64')))
+        self.assertTrue(allequal(values[indices][:nvalues],
+                                 sorted_[:nvalues]))
+
+    def test00_merge(self):
+        """Merging the slices of an integer column."""
+
+        self.check_csi('icol')
+
+    def test01_merge_nans(self):
+        """Merging the slices of a float column with NaNs."""
+
+        self.check_csi('fcol')
+
+    def test02_small_memory(self):
+        """Merging the slices with just a chunk of each in memory."""
+
+        self.h5file.params['INDEX_SORT_MEMORY'] = 1
+        self.check_csi('icol')
+        # The merge is done in many small batches
+        self.assertTrue(len(self.calls) > 10)
+        self.assertEqual(
+            self.table.read_sorted('icol')['icol'].tolist(),
+            sorted(self.rows['icol']))
+
+
+class IndexDeltaTestCase(TempFileMixin, TestCase):
+    """Checking the delta of indexes for modified rows."""
+
+    nrows = 1000
+
+    def setUp(self):
+        super(IndexDeltaTestCase, self).setUp()
+        rows = numpy.empty(self.nrows, dtype=[('icol', 'i4'), ('fcol', 'f8')])
+        rows['icol'] = numpy.arange(self.nrows) % 100
+        rows['fcol'] = numpy.arange(self.nrows) * 0.5
+        self.rows = rows
+        self.table = self.h5file.create_table('/', 'table', obj=rows)
+        self.table.cols.icol.create_index(_blocksizes=small_blocksizes)
+
+    def check_queries(self, ndelta):
+        index = self.table.cols.icol.index
+        self.assertEqual(index.dirty, False)
+        self.assertEqual(index.ndelta, ndelta)
+        values = self.table.cols.icol[:]
+        self.assertTrue(allequal(values, self.rows['icol']))
+        conditions = {
+            'icol == 5': lambda c: c == 5,
+            'icol == 1000': lambda c: c == 1000,
+            '(icol > 97) & (icol <= 1000)': lambda c: (c > 97) & (c <= 1000),
+            'icol < 3': lambda c: c < 3,
+        }
+        for condition, func in conditions.items():
+            coords = self.table.get_where_list(condition)
+            self.assertTrue(allequal(numpy.sort(coords),
+                                     numpy.where(func(values))[0]),
+                            condition)
+            self.assertTrue(
+                self.table.will_query_use_indexing(condition), condition)
+        coords = self.table.get_where_list('isin(icol, vals)',
+                                           {'vals': [1000, 7]})
+        self.assertTrue(allequal(numpy.sort(coords),
+                                 numpy.where(numpy.in1d(values, [7, 1000]))[0]))
+
+    def test00_modify_column(self):
+        """Modifying a range of an indexed column."""
+
+        self.table.modify_column(10, 20, column=[1000] * 10, colname='icol')
+        self.rows['icol'][10:20] = 1000
+        self.check_queries(10)
+
+    def test01_modify_rows(self):
+        """Modifying rows with a step."""
+
+        newrows = self.rows[:5].copy()
+        newrows['icol'] = 1000
+        self.table.modify_rows(500, 510, 2, newrows)
+        self.rows['icol'][500:510:2] = 1000
+        self.check_queries(5)
+
+    def test02_modify_coordinates(self):
+        """Modifying rows at random coordinates, twice."""
+
+        coords = [907, 3, 405, 3]
+        newrows = self.rows[coords].copy()
+        newrows['icol'] = [1000, 98, 1000, 1000]
+        self.table.modify_coordinates(coords, newrows)
+        self.rows[coords] = newrows
+        self.check_queries(3)
+        # Rows modified again replace their values in the delta
+        self.table.modify_coordinates([3], self.rows[[0]])
+        self.rows[3] = self.rows[0]
+        self.check_queries(3)
+
+    def test03_row_update(self):
+        """Modifying rows with Row.update()."""
+
+        for row in self.table.iterrows(0, 50, 7):
+            row['icol'] = 1000
+            row.update()
+        self.table.flush()
+        self.rows['icol'][0:50:7] = 1000
+        self.check_queries(8)
+
+    def test04_modify_where(self):
+        """Modifying rows with modify_where()."""
+
+        self.table.modify_where('fcol < 10', {'icol': 'icol + 900'})
+        self.rows['icol'][:20] += 900
+        # fcol has no index and only modified rows are kept
+        self.check_queries(20)
+
+    def test05_is_csi(self):
+        """CSI indexes are rebuilt instead of keeping a delta."""
+
+        self.table.cols.icol.remove_index()
+        self.table.cols.icol.create_csindex(_blocksizes=small_blocksizes)
+        self.assertEqual(self.table.cols.icol.index.is_csi, True)
+        self.table.modify_column(0, 1, column=[1000], colname='icol')
+        self.assertEqual(self.table.cols.icol.index.is_csi, True)
+        self.rows['icol'][0] = 1000
+        self.check_queries(0)
+        self.check_sorted_reads(checkCSI=True)
+
+    def check_sorted_reads(self, checkCSI):
+        values = numpy.sort(self.rows['icol'])
+        sortedcol = self.table.read_sorted('icol', checkCSI=checkCSI)['icol']
+        self.assertTrue(allequal(sortedcol, values))
+        sortedcol = [row['icol'] for row in
+                     self.table.itersorted('icol', checkCSI=checkCSI)]
+        self.assertTrue(allequal(numpy.array(sortedcol, dtype='i4'), values))
+        table2 = self.table.copy('/', 'table2', sortby='icol',
+                                 checkCSI=checkCSI)
+        self.assertTrue(allequal(table2.cols.icol[:], values))
+
+    def test05b_full_index(self):
+        """Full indexes follow the new values in sorted reads."""
+
+        self.table.cols.icol.remove_index()
+        self.table.cols.icol.create_index(kind='full',
+                                          _blocksizes=small_blocksizes)
+        coords = [907, 3, 405]
+        newrows = self.rows[coords].copy()
+        newrows['icol'] = [1000, -1, 50]
+        self.table.modify_coordinates(coords, newrows)
+        self.rows[coords] = newrows
+        self.check_queries(0)
+        self.check_sorted_reads(checkCSI=False)
+
+    def test06_full_delta(self):
+        """Rebuilding the index when the delta gets full."""
+
+        self.h5file.params['INDEX_DELTA_MAX_ELEMENTS'] = 10
+        self.table.modify_column(0, 10, column=[1000] * 10, colname='icol')
+        self.rows['icol'][:10] = 1000
+        self.check_queries(10)
+        self.table.modify_column(10, 11, column=[1000], colname='icol')
+        self.rows['icol'][10] = 1000
+        # The index has been rebuilt with all the values
+        self.check_queries(0)
+
+    def test07_full_delta_dirty(self):
+        """Marking the index as dirty when the delta gets full."""
+
+        self.h5file.params['INDEX_DELTA_MAX_ELEMENTS'] = 10
+        self.table.autoindex = False
+        self.table.modify_column(0, 20, column=[1000] * 20, colname='icol')
+        self.assertEqual(self.table.cols.icol.index.dirty, True)
+        self.table.reindex_dirty()
+        self.rows['icol'][:20] = 1000
+        self.check_queries(0)
+
+    def test08_reopen(self):
+        """Keeping the delta after reopening the file."""
+
+        self.table.modify_column(10, 20, column=[1000] * 10, colname='icol')
+        self.rows['icol'][10:20] = 1000
+        self._reopen()
+        self.table = self.h5file.root.table
+        self.check_queries(10)
+
+    def test09_appended_rows(self):
+        """Rows not indexed yet are not kept in the delta."""
+
+        self.table.append(self.rows[:10])
+        self.rows = numpy.concatenate([self.rows, self.rows[:10]])
+        nelements = self.table.cols.icol.index.nelements
+        self.table.modify_column(self.nrows, self.nrows + 10,
+                                 column=[1000] * 10, colname='icol')
+        self.rows['icol'][self.nrows:] = 1000
+        self.table.flush()
+        self.check_queries(max(nelements - self.nrows, 0))
+
+
+class IndexRangesReadTestCase(TempFileMixin, TestCase):
+    """Checking chunkmaps computed from batches of index ranges."""
+
+    nrows = 1000
+
+    def setUp(self):
+        super(IndexRangesReadTestCase, self).setUp()
+        self.max_ranges_per_read = tables.index.max_ranges_per_read
+        # Force many small batches of ranges
+        tables.index.max_ranges_per_read = 3
+        self.h5file.params['IO_BUFFER_SIZE'] = 64
+        rows = numpy.empty(self.nrows, dtype=[('icol', 'i4')])
+        rows['icol'] = (numpy.arange(self.nrows) * 7) % 101
+        self.rows = rows
+        self.table = self.h5file.create_table('/', 'table', obj=rows,
+                                              chunkshape=(10,))
+        # Some rows go to the last row of the index
+        self.table.append(rows[:55])
+        self.rows = numpy.concatenate([rows, rows[:55]])
+
+    def tearDown(self):
+        tables.index.max_ranges_per_read = self.max_ranges_per_read
+        super(IndexRangesReadTestCase, self).tearDown()
+
+    def check_queries(self, kind):
+        self.table.cols.icol.create_index(kind=kind,
+                                          _blocksizes=small_blocksizes)
+        self.assertEqual(self.table.cols.icol.index.nelements,
+                         len(self.rows))
+        values = self.rows['icol']
+        conditions = {
+            'icol == 5': lambda c: c == 5,
+            '(icol > 20) & (icol <= 35)': lambda c: (c > 20) & (c <= 35),
+            'icol >= 90': lambda c: c >= 90,
+            'isin(icol, vals)':
+                lambda c: numpy.in1d(c, [3, 4, 60, 1000]),
+        }
+        condvars = {'vals': [3, 4, 60, 1000]}
+        for condition, func in conditions.items():
+            coords = self.table.get_where_list(condition, condvars)
+            self.assertTrue(allequal(coords, numpy.where(func(values))[0]),
+                            condition)
+            self.assertTrue(
+                self.table.will_query_use_indexing(condition, condvars),
+                condition)
+
+    def test00_ultralight(self):
+        """Reading ranges of ultralight indexes in batches."""
+
+        self.check_queries('ultralight')
+
+    def test01_light(self):
+        """Reading ranges of light indexes in batches."""
+
+        self.check_queries('light')
+
+    def test02_medium(self):
+        """Reading ranges of medium indexes in batches."""
+
+        self.check_queries('medium')
+
+    def test03_full(self):
+        """Reading ranges of full indexes in batches."""
+
+        self.check_queries('full')
+
+
+class BitmapIndexTestCase(TempFileMixin, TestCase):
+    """Checking bitmap indexes."""
+
+    nrows = 1000
+
+    def setUp(self):
+        super(BitmapIndexTestCase, self).setUp()
+        rows = numpy.empty(self.nrows, dtype=[('status', 'i2'), ('flag', '?'),
+                                              ('code', 'S3'), ('fcol', 'f8')])
+        rows['status'] = numpy.arange(self.nrows) % 7
+        rows['flag'] = numpy.arange(self.nrows) % 3 == 0
+        rows['code'] = [b'abc', b'de', b'fgh', b'i'] * (self.nrows // 4)
+        rows['fcol'] = numpy.arange(self.nrows) * 0.5
+        self.rows = rows
+        self.table = self.h5file.create_table('/', 'table', obj=rows)
+        for colname in ('status', 'flag', 'code'):
+            self.table.colinstances[colname].create_index(kind='bitmap')
+
+    def check_queries(self):
+        for colname in ('status', 'flag', 'code'):
+            index = self.table.colinstances[colname].index
+            self.assertEqual(index.dirty, False)
+            self.assertEqual(index.nelements, self.table.nrows)
+            column = self.rows[colname]
+            values = numpy.unique(column)
+            counts = [(column == value).sum() for value in values]
+            self.assertTrue(allequal(index.read_values(), values))
+            self.assertEqual(index.read_counts().tolist(), counts)
+        conditions = {
+            'status == 5': lambda r: r['status'] == 5,
+            'status == 100': lambda r: r['status'] == 100,
+            'status < 2': lambda r: r['status'] < 2,
+            '(status > 1) & (status <= 3)':
+                lambda r: (r['status'] > 1) & (r['status'] <= 3),
+            '(status == 2) & flag': lambda r: (r['status'] == 2) & r['flag'],
+            '(status == 2) | (code == b"de")':
+                lambda r: (r['status'] == 2) | (r['code'] == b'de'),
+            'isin(status, vals)':
+                lambda r: numpy.in1d(r['status'], [1, 6, 100]),
+            '(status == 2) | ((code == b"de") & flag)':
+                lambda r: (r['status'] == 2) | ((r['code'] == b'de') &
+                                                r['flag']),
+            '(code >= b"de") & (code < b"i")':
+                lambda r: (r['code'] >= b'de') & (r['code'] < b'i'),
+            '~flag': lambda r: ~r['flag'],
+            '(status == 3) & (fcol < 100)':
+                lambda r: (r['status'] == 3) & (r['fcol'] < 100),
+        }
+        condvars = {'vals': [1, 6, 100]}
+        for condition, func in conditions.items():
+            coords = self.table.get_where_list(condition, condvars)
+            self.assertTrue(allequal(coords, numpy.where(func(self.rows))[0]),
+                            condition)
+            self.assertTrue(
+                self.table.will_query_use_indexing(condition, condvars),
+                condition)
+
+    def test00_create(self):
+        """Creating bitmap indexes."""
+
+        index = self.table.cols.status.index
+        self.assertEqual(index.kind, 'bitmap')
+        self.assertEqual(index.is_csi, False)
+        self.assertEqual(index.nvalues, 7)
+        self.assertEqual(self.table.cols.flag.index.nvalues, 2)
+        self.assertEqual(self.table.cols.code.index.nvalues, 4)
+        self.assertTrue(str(index).startswith("BitmapIndex(7 values"))
+        self.check_queries()
+
+    def test01_explain_where(self):
+        """Bitmaps select just the rows fulfilling the condition."""
+
+        chunkmaps = []
+        for analyze in (False, True):
+            plan = self.table.explain_where('(status == 2) & flag',
+                                            analyze=analyze)
+            self.assertEqual(plan['indexed'], True)
+            candidates = [expr['candidates']
+                          for expr in plan['index_expressions']]
+            self.assertEqual(sorted(candidates), [143, 334])
+            chunkmaps.append(plan['chunkmap'])
+        self.assertEqual(plan['nrows'], 48)
+        # The bitmaps are read without running the query
+        self.assertEqual(chunkmaps[0], chunkmaps[1])
+
+    def test02_append(self):
+        """Appending rows with new values."""
+
+        rows = self.rows[:100].copy()
+        rows['status'] = numpy.arange(100) % 11
+        rows['code'] = b'xyz'
+        self.table.append(rows)
+        self.table.flush()
+        self.rows = numpy.concatenate([self.rows, rows])
+        self.assertEqual(self.table.cols.status.index.nvalues, 11)
+        self.check_queries()
+
+    def test03_modify_column(self):
+        """Modifying rows updates the bitmaps in place."""
+
+        self.table.modify_column(10, 20, column=[100] * 10, colname='status')
+        self.rows['status'][10:20] = 100
+        coords = [907, 3, 405]
+        newrows = self.rows[coords].copy()
+        newrows['flag'] = ~newrows['flag']
+        newrows['code'] = b'zz'
+        self.table.modify_coordinates(coords, newrows)
+        self.rows[coords] = newrows
+        self.check_queries()
+
+    def test04_remove_rows(self):
+        """Removing rows rebuilds the bitmaps."""
+
+        self.table.remove_rows(100, 200)
+        self.rows = numpy.concatenate([self.rows[:100], self.rows[200:]])
+        self.check_queries()
+
+    def test05_reopen(self):
+        """Using bitmap indexes after reopening the file."""
+
+        self._reopen(mode='a')
+        self.table = self.h5file.root.table
+        self.check_queries()
+        self.table.modify_column(0, 1, column=[1], colname='status')
+        self.rows['status'][0] = 1
+        self.check_queries()
+
+    def test06_too_many_values(self):
+        """Columns with too many values are not indexed."""
+
+        self.table.cols.status.remove_index()
+        self.h5file.params['BITMAP_INDEX_MAX_VALUES'] = 5
+        self.assertRaises(ValueError, self.table.cols.status.create_index,
+                          kind='bitmap')
+        self.assertEqual(self.table.cols.status.is_indexed, False)
+        self.assertRaises(TypeError, self.table.cols.fcol.create_index,
+                          kind='bitmap')
+
+    def test07_mixed_indexes(self):
+        """Combining bitmap indexes with other kinds of indexes."""
+
+        self.table.cols.fcol.create_index(_blocksizes=small_blocksizes)
+        self.check_queries()
+
+    def test08_small_buffers(self):
+        """Processing the bitmaps in several blocks."""
+
+        self.h5file.params['IO_BUFFER_SIZE'] = 16
+        self.table.nrowsinbuf = 50
+        self.check_queries()
+
+    def test09_copy(self):
+        """Copying tables keeps the bitmap indexes."""
+
+        table = self.table.copy('/', 'table2', propindexes=True)
+        self.assertEqual(table.cols.status.index.kind, 'bitmap')
+        self.table = table
+        self.check_queries()
+
+
 def suite():
     theSuite = unittest.TestSuite()
 
@@ -2690,6 +3249,11 @@ def suite():
         theSuite.addTest(unittest.makeSuite(Issue119Time32ColTestCase))
         theSuite.addTest(unittest.makeSuite(Issue119Time64ColTestCase))
         theSuite.addTest(unittest.makeSuite(TestIndexingNans))
+        theSuite.addTest(unittest.makeSuite(ParallelIndexTestCase))
+        theSuite.addTest(unittest.makeSuite(CompleteSortMergeTestCase))
+        theSuite.addTest(unittest.makeSuite(IndexDeltaTestCase))
+        theSuite.addTest(unittest.makeSuite(IndexRangesReadTestCase))
+        theSuite.addTest(unittest.makeSuite(BitmapIndexTestCase))
     if heavy:
         # These are too heavy for normal testing
         theSuite.addTest(unittest.makeSuite(AI4bTestCase))
@@ -1203,6 +1203,1207 @@ class IndexedTableUsage32(IndexedTableUsage):
     str_expr = ''
 
 
+class ThreadedQueryTestCase(common.TempFileMixin, TestCase):
+    """Test in-kernel queries evaluated by several threads."""
+
+    nrows = 100
+    conditions = ['c_int32 < 37', '(c_int32 > 10) & (c_float64 < 73.5)']
+    ranges = [(0, 100, 1), (3, 95, 2), (1, 100, 9), (5, 60, 13)]
+
+    def setUp(self):
+        super(ThreadedQueryTestCase, self).setUp()
+        description = {'c_int32': tables.Int32Col(pos=0),
+                       'c_float64': tables.Float64Col(pos=1)}
+        table = self.h5file.create_table('/', 'test', description)
+        data = numpy.empty(self.nrows, dtype=table.dtype)
+        data['c_int32'] = numpy.arange(self.nrows) % 50
+        data['c_float64'] = numpy.arange(self.nrows, 0, -1)
+        table.append(data)
+        # Small buffers, so that the query is split among threads
+        table.nrowsinbuf = 7
+        self.table = table
+        self.data = data
+
+    def reference(self, condition, start, stop, step):
+        cvars = dict((name, self.data[name]) for name in self.data.dtype.names)
+        valid = eval(condition, {}, cvars)
+        coords = numpy.arange(self.nrows)[valid]
+        return coords[(coords >= start) & (coords < stop) &
+                      ((coords - start) % step == 0)]
+
+    def test_get_where_list(self):
+        for condition in self.conditions:
+            for (start, stop, step) in self.ranges:
+                ref = self.reference(condition, start, stop, step)
+                for nthreads in [1, 2, 3, 16]:
+                    coords = self.table.get_where_list(
+                        condition, start=start, stop=stop, step=step,
+                        nthreads=nthreads)
+                    self.assertTrue(numpy.all(coords == ref))
+
+    def test_read_where(self):
+        for condition in self.conditions:
+            ref = self.data[self.reference(condition, 1, 100, 3)]
+            rows = self.table.read_where(condition, start=1, step=3,
+                                         nthreads=3)
+            self.assertTrue(numpy.all(rows == ref))
+
+    def test_where(self):
+        # Rows are still yielded lazily by a single thread
+        self.h5file.params['MAX_QUERY_THREADS'] = 4
+        for condition in self.conditions:
+            ref = self.reference(condition, 0, self.nrows, 1)
+            rows = self.table.where(condition)
+            self.assertTrue(isinstance(rows, tables.tableextension.Row))
+            coords = [r.nrow for r in rows]
+            self.assertTrue(numpy.all(numpy.array(coords) == ref))
+
+    def test_zonemap(self):
+        # Chunks discarded by zone maps are not scanned by worker threads
+        table = self.h5file.create_table('/', 'test2', self.data,
+                                         chunkshape=5)
+        table.nrowsinbuf = 10
+        table.cols.c_int32.create_zonemap()
+        condition = self.conditions[0]
+        condvars = {'c_int32': table.cols.c_int32}
+        self.assertTrue(table._where_coords_threaded(
+            condition, condvars, 0, self.nrows, 1, 4) is None)
+        coords = table.get_where_list(condition, nthreads=4)
+        ref = self.reference(condition, 0, self.nrows, 1)
+        self.assertTrue(numpy.all(coords == ref))
+
+    def test_max_query_threads(self):
+        self.h5file.params['MAX_QUERY_THREADS'] = 4
+        condition = self.conditions[1]
+        ref = self.reference(condition, 0, self.nrows, 1)
+        coords = self.table.get_where_list(condition)
+        self.assertTrue(numpy.all(coords == ref))
+
+
+class SmallBufferIndexedQueryTestCase(common.TempFileMixin, TestCase):
+    """Test indexed queries with I/O buffers smaller than chunks."""
+
+    nrows = 1000
+
+    def setUp(self):
+        super(SmallBufferIndexedQueryTestCase, self).setUp()
+        data = numpy.empty(self.nrows, dtype=[('c1', 'i4'), ('c2', 'f8')])
+        data['c1'] = numpy.arange(self.nrows) % 100
+        data['c2'] = numpy.arange(self.nrows)
+        self.table = self.h5file.create_table('/', 'test', obj=data)
+        self.table.cols.c1.create_index()
+        self.table.nrowsinbuf = 7
+        self.data = data
+
+    def test_get_where_list(self):
+        self.assertTrue(self.table.nrowsinbuf < self.table.chunkshape[0])
+        for condition in ['c1 < 50', '(c1 > 90) & (c2 < 500)']:
+            ref = numpy.where(eval(condition, {}, {'c1': self.data['c1'],
+                                                   'c2': self.data['c2']}))[0]
+            coords = self.table.get_where_list(condition)
+            self.assertTrue(numpy.all(coords == ref), condition)
+            coords = self.table.get_where_list(condition, start=10, stop=800,
+                                               step=3)
+            self.assertTrue(numpy.all(coords == ref[
+                (ref >= 10) & (ref < 800) & ((ref - 10) % 3 == 0)]))
+
+    def test_read_where(self):
+        rows = self.table.read_where('c1 == 42')
+        self.assertTrue(numpy.all(rows == self.data[self.data['c1'] == 42]))
+
+
+class AggregateQueryTestCase(common.TempFileMixin, TestCase):
+    """Test aggregations over the rows fulfilling a condition."""
+
+    nrows = 100
+    indexed = False
+    conditions = ['c_int32 < 37', '(c_int32 > 10) & (c_float64 < 73.5)',
+                  'c_int32 > 1000']
+    ranges = [(None, None, None), (3, 95, 2), (5, 60, 13)]
+
+    def setUp(self):
+        super(AggregateQueryTestCase, self).setUp()
+        description = {'c_int32': tables.Int32Col(pos=0),
+                       'c_float64': tables.Float64Col(pos=1),
+                       'c_md': tables.Int16Col(shape=(2,), pos=2),
+                       'c_string': tables.StringCol(4, pos=3)}
+        table = self.h5file.create_table('/', 'test', description,
+                                         chunkshape=5)
+        data = numpy.empty(self.nrows, dtype=table.dtype)
+        data['c_int32'] = numpy.arange(self.nrows) % 50
+        data['c_float64'] = numpy.arange(self.nrows, 0, -1)
+        data['c_md'][:, 0] = numpy.arange(self.nrows)
+        data['c_md'][:, 1] = -numpy.arange(self.nrows)
+        data['c_string'] = 'abc'
+        table.append(data)
+        if self.indexed:
+            table.cols.c_int32.create_index()
+        # Small buffers, so that the query spans several of them
+        table.nrowsinbuf = 7
+        self.table = table
+        self.data = data
+
+    def reference(self, condition, start, stop, step):
+        cvars = dict((name, self.data[name]) for name in self.data.dtype.names)
+        valid = eval(condition, {}, cvars)
+        return self.data[slice(start, stop, step)][
+            valid[slice(start, stop, step)]]
+
+    def test_count_where(self):
+        for condition in self.conditions:
+            for (start, stop, step) in self.ranges:
+                ref = self.reference(condition, start, stop, step)
+                count = self.table.count_where(condition, start=start,
+                                               stop=stop, step=step)
+                self.assertEqual(count, len(ref))
+
+    def test_aggregate_where(self):
+        aggregates = {'c_int32': ['count', 'sum', 'min', 'max', 'mean'],
+                      'c_float64': 'sum'}
+        for condition in self.conditions[:2]:
+            for (start, stop, step) in self.ranges:
+                ref = self.reference(condition, start, stop, step)
+                result = self.table.aggregate_where(
+                    condition, aggregates, start=start, stop=stop, step=step)
+                self.assertEqual(sorted(result), ['c_float64', 'c_int32'])
+                col = ref['c_int32']
+                self.assertEqual(result['c_int32'],
+                                 [len(col), col.sum(), col.min(), col.max(),
+                                  col.mean()])
+                self.assertEqual(result['c_float64'],
+                                 ref['c_float64'].sum())
+
+    def test_aggregate_where_md(self):
+        condition = self.conditions[0]
+        ref = self.reference(condition, None, None, None)['c_md']
+        result = self.table.aggregate_where(condition,
+                                            {'c_md': ['sum', 'min', 'max']})
+        for value, refvalue in zip(result['c_md'],
+                                   [ref.sum(axis=0), ref.min(axis=0),
+                                    ref.max(axis=0)]):
+            self.assertTrue(numpy.all(value == refvalue))
+
+    def test_aggregate_where_empty(self):
+        result = self.table.aggregate_where(
+            self.conditions[2], {'c_int32': ['count', 'sum', 'min', 'mean'],
+                                 'c_string': 'count'})
+        self.assertEqual(result['c_int32'], [0, 0, None, None])
+        self.assertEqual(result['c_string'], 0)
+
+    def test_aggregate_where_variables(self):
+        limit = 37
+        ref = self.reference(self.conditions[0], None, None, None)
+        result = self.table.aggregate_where('c_int32 < limit',
+                                            {'c_int32': 'sum'})
+        self.assertEqual(result['c_int32'], ref['c_int32'].sum())
+        result = self.table.aggregate_where('c_int32 < lim',
+                                            {'c_int32': 'sum'},
+                                            condvars={'lim': limit})
+        self.assertEqual(result['c_int32'], ref['c_int32'].sum())
+
+    def test_aggregate_where_errors(self):
+        condition = self.conditions[0]
+        self.assertRaises(KeyError, self.table.aggregate_where,
+                          condition, {'c_none': 'sum'})
+        self.assertRaises(ValueError, self.table.aggregate_where,
+                          condition, {'c_int32': 'median'})
+        self.assertRaises(TypeError, self.table.aggregate_where,
+                          condition, {'c_string': 'max'})
+
+
+class IndexedAggregateQueryTestCase(AggregateQueryTestCase):
+    indexed = True
+
+    def test_aggregate_where_cached(self):
+        # The second query is answered from the sequence cache
+        condition = self.conditions[0]
+        ref = self.reference(condition, None, None, None)['c_float64']
+        for i in range(2):
+            result = self.table.aggregate_where(condition,
+                                                {'c_float64': 'max'})
+            self.assertEqual(result['c_float64'], ref.max())
+            self.assertEqual(self.table.count_where(condition), len(ref))
+
+
+class ExplainQueryTestCase(common.TempFileMixin, TestCase):
+    """Test the explanation of query plans."""
+
+    nrows = 100
+
+    def setUp(self):
+        super(ExplainQueryTestCase, self).setUp()
+        description = {'c_int32': tables.Int32Col(pos=0),
+                       'c_float64': tables.Float64Col(pos=1)}
+        table = self.h5file.create_table('/', 'test', description,
+                                         chunkshape=5)
+        data = numpy.empty(self.nrows, dtype=table.dtype)
+        data['c_int32'] = numpy.arange(self.nrows)
+        data['c_float64'] = numpy.arange(self.nrows, 0, -1)
+        table.append(data)
+        self.table = table
+
+    def test_in_kernel(self):
+        plan = self.table.explain_where('c_int32 < 37')
+        self.assertFalse(plan['indexed'])
+        self.assertEqual(plan['index_expressions'], [])
+        self.assertEqual(plan['index_combination'], None)
+        self.assertEqual(plan['nrows'], None)
+        self.assertEqual(plan['timing'], None)
+        plan = self.table.explain_where('c_int32 < 37', analyze=True)
+        self.assertEqual(plan['nrows'], 37)
+        self.assertEqual(plan['chunkmap'], None)
+        self.assertEqual(sorted(plan['timing']), ['index', 'scan'])
+
+    def test_indexed(self):
+        self.table.cols.c_int32.create_index()
+        condition = '(c_int32 < 37) & (c_float64 > 70)'
+        plan = self.table.explain_where(condition)
+        self.assertTrue(plan['indexed'])
+        self.assertEqual(len(plan['index_expressions']), 1)
+        expr = plan['index_expressions'][0]
+        self.assertEqual(expr['column'], 'c_int32')
+        self.assertEqual(expr['operators'], ('lt',))
+        self.assertEqual(expr['limits'], (37,))
+        self.assertFalse(plan['seqcache_hit'])
+        # The indexes are searched without running the query
+        self.assertEqual(expr['candidates'], 37)
+        chunkmap = {'nchunks': 20, 'selected': 8, 'density': 0.4}
+        self.assertEqual(plan['chunkmap'], chunkmap)
+        self.assertEqual(plan['nrows'], None)
+        self.assertEqual(plan['timing'], None)
+        self.assertFalse(plan['seqcache_hit'])
+        plan = self.table.explain_where(condition, analyze=True)
+        self.assertEqual(plan['nrows'], 30)
+        self.assertEqual(plan['index_expressions'][0]['candidates'], 37)
+        self.assertEqual(plan['chunkmap'], chunkmap)
+        # The rows found are now in the sequence cache
+        plan = self.table.explain_where(condition)
+        self.assertTrue(plan['seqcache_hit'])
+        plan = self.table.explain_where(condition, analyze=True)
+        self.assertTrue(plan['seqcache_hit'])
+        self.assertEqual(plan['nrows'], 30)
+
+    def test_empty_range(self):
+        plan = self.table.explain_where('c_int32 < 37', start=50, stop=10,
+                                        analyze=True)
+        self.assertEqual(plan['nrows'], 0)
+
+
+class TopKQueryTestCase(common.TempFileMixin, TestCase):
+    """Test getting the top k rows fulfilling a condition."""
+
+    nrows = 200
+    sortindex = None
+    conditions = ['c_int32 < 37', '(c_int32 % 3) == 0', 'c_int32 > 1000']
+    ranges = [(None, None, None), (3, 195, 2), (5, 160, 13)]
+
+    def setUp(self):
+        super(TopKQueryTestCase, self).setUp()
+        description = {'c_int32': tables.Int32Col(pos=0),
+                       'c_float64': tables.Float64Col(pos=1)}
+        table = self.h5file.create_table('/', 'test', description,
+                                         chunkshape=5)
+        data = numpy.empty(self.nrows, dtype=table.dtype)
+        data['c_int32'] = numpy.arange(self.nrows) % 50
+        # No ties in the column used for sorting
+        data['c_float64'] = numpy.random.permutation(self.nrows) * 0.5
+        table.append(data)
+        if self.sortindex == 'csi':
+            table.cols.c_float64.create_csindex()
+        elif self.sortindex == 'light':
+            table.cols.c_float64.create_index()
+        # Small buffers, so that the query spans several of them
+        table.nrowsinbuf = 7
+        self.table = table
+        self.data = data
+
+    def reference(self, condition, k, start, stop, step, largest):
+        cvars = dict((name, self.data[name]) for name in self.data.dtype.names)
+        valid = eval(condition, {}, cvars)
+        rows = self.data[slice(start, stop, step)][
+            valid[slice(start, stop, step)]]
+        rows = rows[numpy.argsort(rows['c_float64'])]
+        if largest:
+            rows = rows[::-1]
+        return rows[:k]
+
+    def test_where_topk(self):
+        for condition in self.conditions:
+            for (start, stop, step) in self.ranges:
+                for k in [1, 10, 100]:
+                    for largest in [True, False]:
+                        ref = self.reference(condition, k, start, stop, step,
+                                             largest)
+                        result = self.table.where_topk(
+                            condition, 'c_float64', k, start=start,
+                            stop=stop, step=step, largest=largest)
+                        self.assertEqual(result.dtype, self.table.dtype)
+                        self.assertTrue(numpy.all(result == ref))
+
+    def test_where_topk_column(self):
+        ref = self.reference(self.conditions[0], 5, None, None, None, True)
+        result = self.table.where_topk(self.conditions[0],
+                                       self.table.cols.c_float64, 5)
+        self.assertTrue(numpy.all(result == ref))
+
+    def test_where_topk_zero(self):
+        result = self.table.where_topk(self.conditions[0], 'c_float64', 0)
+        self.assertEqual(len(result), 0)
+        self.assertRaises(ValueError, self.table.where_topk,
+                          self.conditions[0], 'c_float64', -1)
+
+
+class CSITopKQueryTestCase(TopKQueryTestCase):
+    sortindex = 'csi'
+
+
+class LightTopKQueryTestCase(TopKQueryTestCase):
+    sortindex = 'light'
+
+
+class MultiWhereTestCase(common.TempFileMixin, TestCase):
+    """Test the evaluation of several conditions in a shared scan."""
+
+    nrows = 100
+    indexed = False
+    conditions = {'low': 'c_int32 < 37',
+                  'both': '(c_int32 > 10) & (c_float64 < 73.5)',
+                  'var': 'c_float64 >= limit',
+                  'none': 'c_int32 > 1000'}
+    ranges = [(None, None, None), (3, 95, 2), (5, 60, 13)]
+
+    def setUp(self):
+        super(MultiWhereTestCase, self).setUp()
+        description = {'c_int32': tables.Int32Col(pos=0),
+                       'c_float64': tables.Float64Col(pos=1),
+                       'c_string': tables.StringCol(4, pos=2)}
+        table = self.h5file.create_table('/', 'test', description,
+                                         chunkshape=5)
+        data = numpy.empty(self.nrows, dtype=table.dtype)
+        data['c_int32'] = numpy.arange(self.nrows) % 50
+        data['c_float64'] = numpy.arange(self.nrows, 0, -1)
+        data['c_string'] = 'abc'
+        table.append(data)
+        if self.indexed:
+            table.cols.c_int32.create_index()
+        # Small buffers, so that the scan spans several of them
+        table.nrowsinbuf = 7
+        self.table = table
+
+    def test_multi_where(self):
+        condvars = {'limit': 20.5}
+        for (start, stop, step) in self.ranges:
+            result = self.table.multi_where(self.conditions, condvars,
+                                            sort=True, start=start,
+                                            stop=stop, step=step)
+            self.assertEqual(sorted(result), sorted(self.conditions))
+            for name, condition in self.conditions.items():
+                ref = self.table.get_where_list(condition, condvars,
+                                                sort=True, start=start,
+                                                stop=stop, step=step)
+                self.assertTrue(numpy.all(result[name] == ref))
+
+    def test_multi_where_empty(self):
+        self.assertEqual(self.table.multi_where({}), {})
+        result = self.table.multi_where({'low': 'c_int32 < 37'}, start=10,
+                                        stop=5)
+        self.assertEqual(len(result['low']), 0)
+
+    def test_multi_where_local_vars(self):
+        limit = 20.5
+        result = self.table.multi_where({'var': 'c_float64 >= limit'})
+        self.assertEqual(len(result['var']), 80)
+
+
+class IndexedMultiWhereTestCase(MultiWhereTestCase):
+    indexed = True
+
+
+class AppendCacheTestCase(common.TempFileMixin, TestCase):
+    """Test that query caches survive appends to indexed tables."""
+
+    nrows = 100
+
+    def setUp(self):
+        super(AppendCacheTestCase, self).setUp()
+        description = {'c_int32': tables.Int32Col(pos=0),
+                       'c_float64': tables.Float64Col(pos=1)}
+        # The table ends in the middle of a chunk
+        table = self.h5file.create_table('/', 'test', description,
+                                         chunkshape=7)
+        self.table = table
+        self.append(self.nrows)
+        table.cols.c_int32.create_index()
+
+    def append(self, nrows):
+        data = numpy.empty(nrows, dtype=self.table.dtype)
+        data['c_int32'] = numpy.arange(nrows) % 10
+        data['c_float64'] = numpy.arange(nrows)
+        self.table.append(data)
+        self.table.flush()
+
+    def reference(self, condition):
+        data = self.table.read()
+        valid = eval(condition, {}, dict(c_int32=data['c_int32'],
+                                         c_float64=data['c_float64']))
+        return numpy.arange(len(data))[valid]
+
+    def test_append(self):
+        condition = 'c_int32 < 3'
+        ref = self.reference(condition)
+        self.assertEqual(list(self.table.get_where_list(condition)),
+                         list(ref))
+        for nrows in [5, 30]:
+            self.append(nrows)
+            plan = self.table.explain_where(condition)
+            self.assertTrue(plan['seqcache_hit'])
+            ref = self.reference(condition)
+            self.assertEqual(list(self.table.get_where_list(condition)),
+                             list(ref))
+            self.assertEqual([row['c_float64']
+                              for row in self.table.where(condition)],
+                             list(self.table.read()['c_float64'][ref]))
+
+    def test_append_step(self):
+        condition = 'c_int32 < 3'
+        coords = list(self.table.get_where_list(condition, step=3))
+        self.append(11)
+        ref = [i for i in self.reference(condition) if i % 3 == 0]
+        self.assertEqual(list(self.table.get_where_list(condition, step=3)),
+                         ref)
+        self.assertEqual(ref[:len(coords)], coords)
+
+    def test_append_range(self):
+        condition = 'c_int32 < 3'
+        ref = list(self.table.get_where_list(condition, stop=50))
+        self.append(11)
+        self.assertEqual(list(self.table.get_where_list(condition, stop=50)),
+                         ref)
+
+    def test_truncate(self):
+        condition = 'c_int32 < 3'
+        self.table.get_where_list(condition)
+        self.table.truncate(50)
+        self.table.cols.c_int32.reindex()
+        self.append(60)
+        ref = self.reference(condition)
+        self.assertEqual(list(self.table.get_where_list(condition)),
+                         list(ref))
+
+
+class MembershipTestCase(common.TempFileMixin, TestCase):
+    """Test membership tests (``isin()``) in conditions."""
+
+    nrows = 200
+    kind = None
+    values = numpy.array([3, 17, 17, 42, 45, 1000], dtype='int32')
+
+    def setUp(self):
+        super(MembershipTestCase, self).setUp()
+        description = {'c_int32': tables.Int32Col(pos=0),
+                       'c_float64': tables.Float64Col(pos=1)}
+        table = self.h5file.create_table('/', 'test', description,
+                                         chunkshape=7)
+        data = numpy.empty(self.nrows, dtype=table.dtype)
+        data['c_int32'] = (numpy.arange(self.nrows) * 7) % 50
+        data['c_float64'] = numpy.arange(self.nrows)
+        table.append(data)
+        if self.kind is not None:
+            table.cols.c_int32.create_index(kind=self.kind)
+        self.data = data
+        self.table = table
+
+    def check(self, condition, ref):
+        condvars = {'values': self.values}
+        coords = self.table.get_where_list(condition, condvars, sort=True)
+        self.assertEqual(list(coords), list(ref.nonzero()[0]))
+        rows = [row['c_float64'] for row in
+                self.table.where(condition, condvars)]
+        self.assertEqual(rows, list(self.data['c_float64'][ref]))
+
+    def test_isin(self):
+        ref = numpy.in1d(self.data['c_int32'], self.values)
+        self.check('isin(c_int32, values)', ref)
+
+    def test_isin_and(self):
+        ref = (numpy.in1d(self.data['c_int32'], self.values) &
+               (self.data['c_float64'] < 120))
+        self.check('(c_float64 < 120) & isin(c_int32, values)', ref)
+
+    def test_isin_or(self):
+        ref = (numpy.in1d(self.data['c_int32'], self.values) |
+               (self.data['c_int32'] == 6))
+        self.check('isin(c_int32, values) | (c_int32 == 6)', ref)
+
+    def test_not_isin(self):
+        ref = ~numpy.in1d(self.data['c_int32'], self.values)
+        self.check('~isin(c_int32, values)', ref)
+
+    def test_isin_none(self):
+        self.values = numpy.array([1000, 2000], dtype='int32')
+        self.check('isin(c_int32, values)',
+                   numpy.zeros(self.nrows, dtype=bool))
+
+    def test_use_indexing(self):
+        if self.kind is None:
+            colnames = frozenset()
+        else:
+            colnames = frozenset(['c_int32'])
+        condvars = {'values': self.values}
+        self.assertEqual(
+            self.table.will_query_use_indexing('isin(c_int32, values)',
+                                               condvars),
+            colnames)
+        self.assertEqual(
+            self.table.will_query_use_indexing('~isin(c_int32, values)',
+                                               condvars),
+            frozenset())
+
+    def test_bad_arguments(self):
+        condvars = {'values': self.values}
+        self.assertRaises(ValueError, self.table.get_where_list,
+                          'isin(c_int32, [1, 2])', condvars)
+        self.assertRaises(TypeError, self.table.get_where_list,
+                          'isin(values, values)', condvars)
+
+
+class IndexedMembershipTestCase(MembershipTestCase):
+    kind = 'full'
+
+
+class LightMembershipTestCase(MembershipTestCase):
+    kind = 'ultralight'
+
+
+class JoinTestCase(common.TempFileMixin, TestCase):
+    """Test joins between two tables."""
+
+    nleft = 100
+    lindex = None
+    rindex = None
+
+    def setUp(self):
+        super(JoinTestCase, self).setUp()
+        ldescr = {'user': tables.Int32Col(pos=0),
+                  'value': tables.Float64Col(pos=1)}
+        rdescr = {'id': tables.Int32Col(pos=0),
+                  'name': tables.StringCol(8, pos=1),
+                  'value': tables.Int16Col(pos=2, dflt=-1)}
+        left = self.h5file.create_table('/', 'left', ldescr, chunkshape=7)
+        ldata = numpy.empty(self.nleft, dtype=left.dtype)
+        ldata['user'] = (numpy.arange(self.nleft) * 7) % 25
+        ldata['value'] = numpy.arange(self.nleft)
+        left.append(ldata)
+        right = self.h5file.create_table('/', 'right', rdescr, chunkshape=5)
+        # Keys from 0 to 19, with 3 repeated
+        ids = numpy.concatenate([numpy.arange(20)[::-1], [3]])
+        rdata = numpy.empty(len(ids), dtype=right.dtype)
+        rdata['id'] = ids
+        rdata['name'] = ['n%d' % i for i in range(len(ids))]
+        rdata['value'] = numpy.arange(len(ids))
+        right.append(rdata)
+        for col, kind in ((left.cols.user, self.lindex),
+                          (right.cols.id, self.rindex)):
+            if kind == 'csi':
+                col.create_csindex()
+            elif kind is not None:
+                col.create_index(kind=kind)
+        for table in (left, right):
+            table.nrowsinbuf = 6
+        self.left, self.right = left, right
+        self.ldata, self.rdata = ldata, rdata
+
+    def reference(self, how, start=0, stop=None, step=1):
+        rows = []
+        for lrow in self.ldata[start:stop:step]:
+            matches = [rrow for rrow in self.rdata
+                       if rrow['id'] == lrow['user']]
+            if not matches and how == 'left':
+                rows.append((lrow['user'], lrow['value'], b'', -1))
+            for rrow in matches:
+                rows.append((lrow['user'], lrow['value'],
+                             rrow['name'], rrow['value']))
+        return rows
+
+    def joined(self, *args, **kwargs):
+        rows = []
+        for block in self.left.join(self.right, *args, **kwargs):
+            self.assertEqual(block.dtype.names,
+                             ('user', 'value', 'name', 'right_value'))
+            rows.extend(block.tolist())
+        return rows
+
+    def check(self, rows, ref):
+        if self.lindex == self.rindex == 'csi':
+            # Merge joins are ordered by key
+            rows, ref = sorted(rows), sorted(ref)
+        self.assertEqual(rows, ref)
+
+    def test_inner(self):
+        self.check(self.joined(('user', 'id')), self.reference('inner'))
+
+    def test_left(self):
+        self.check(self.joined(('user', 'id'), how='left'),
+                   self.reference('left'))
+
+    def test_range(self):
+        self.assertEqual(
+            self.joined(('user', 'id'), start=3, stop=90, step=4),
+            self.reference('inner', 3, 90, 4))
+
+    def test_dest(self):
+        dest = self.h5file.create_table(
+            '/', 'dest', numpy.dtype([('user', 'i4'), ('value', 'f8'),
+                                      ('name', 'S8'),
+                                      ('right_value', 'i2')]))
+        nrows = self.left.join(self.right, ('user', 'id'), how='left',
+                               dest=dest)
+        ref = self.reference('left')
+        self.assertEqual(nrows, len(ref))
+        self.check(dest.read().tolist(), ref)
+
+    def test_bad_arguments(self):
+        self.assertRaises(ValueError, self.left.join, self.right,
+                          ('user', 'id'), how='outer')
+        self.assertRaises(KeyError, self.left.join, self.right, 'user')
+
+
+class IndexedJoinTestCase(JoinTestCase):
+    rindex = 'medium'
+
+
+class MergeJoinTestCase(JoinTestCase):
+    lindex = 'csi'
+    rindex = 'csi'
+
+
+class GroupByTestCase(common.TempFileMixin, TestCase):
+    """Test group-by aggregations."""
+
+    nrows = 100
+    kind = None
+
+    def setUp(self):
+        super(GroupByTestCase, self).setUp()
+        description = {'c_key': tables.Int32Col(pos=0),
+                       'c_float64': tables.Float64Col(pos=1),
+                       'c_md': tables.Int16Col(shape=(2,), pos=2),
+                       'c_string': tables.StringCol(4, pos=3)}
+        table = self.h5file.create_table('/', 'test', description,
+                                         chunkshape=5)
+        data = numpy.empty(self.nrows, dtype=table.dtype)
+        # Some keys span several buffers and some just one row
+        data['c_key'] = (numpy.arange(self.nrows) ** 2) % 23
+        data['c_float64'] = numpy.arange(self.nrows, 0, -1)
+        data['c_md'][:, 0] = numpy.arange(self.nrows)
+        data['c_md'][:, 1] = -numpy.arange(self.nrows)
+        data['c_string'] = ['s%d' % (i % 3) for i in range(self.nrows)]
+        table.append(data)
+        if self.kind == 'csi':
+            table.cols.c_key.create_csindex()
+        elif self.kind is not None:
+            table.cols.c_key.create_index(kind=self.kind)
+        # Small buffers, so that groups span several of them
+        table.nrowsinbuf = 7
+        self.table = table
+        self.data = data
+
+    def test_agg(self):
+        result = self.table.groupby('c_key').agg(
+            {'c_float64': ['count', 'sum', 'min', 'max', 'mean'],
+             'c_md': ['sum', 'max']})
+        keys = numpy.unique(self.data['c_key'])
+        self.assertEqual(list(result['c_key']), list(keys))
+        for row, key in zip(result, keys):
+            group = self.data[self.data['c_key'] == key]
+            values = group['c_float64']
+            self.assertEqual(row['c_float64_count'], len(values))
+            self.assertEqual(row['c_float64_sum'], values.sum())
+            self.assertEqual(row['c_float64_min'], values.min())
+            self.assertEqual(row['c_float64_max'], values.max())
+            self.assertAlmostEqual(row['c_float64_mean'], values.mean())
+            self.assertTrue(numpy.all(
+                row['c_md_sum'] == group['c_md'].sum(axis=0)))
+            self.assertTrue(numpy.all(
+                row['c_md_max'] == group['c_md'].max(axis=0)))
+
+    def test_agg_string_key(self):
+        result = self.table.groupby('c_string').agg({'c_key': 'sum'})
+        self.assertEqual(list(result['c_string']), [b's0', b's1', b's2'])
+        for row in result:
+            group = self.data[self.data['c_string'] == row['c_string']]
+            self.assertEqual(row['c_key_sum'], group['c_key'].sum())
+
+    def test_agg_empty(self):
+        table = self.h5file.create_table('/', 'empty',
+                                         self.table.description)
+        result = table.groupby(table.cols.c_key).agg(
+            {'c_float64': ['count', 'mean']})
+        self.assertEqual(len(result), 0)
+        self.assertEqual(result.dtype.names,
+                         ('c_key', 'c_float64_count', 'c_float64_mean'))
+
+    def test_bad_arguments(self):
+        self.assertRaises(TypeError, self.table.groupby, 'c_md')
+        self.assertRaises(KeyError, self.table.groupby, 'c_none')
+        groupby = self.table.groupby('c_key')
+        self.assertRaises(ValueError, groupby.agg, {'c_float64': 'median'})
+        self.assertRaises(TypeError, groupby.agg, {'c_string': 'sum'})
+
+
+class IndexedGroupByTestCase(GroupByTestCase):
+    kind = 'medium'
+
+
+class CSIGroupByTestCase(GroupByTestCase):
+    kind = 'csi'
+
+
+class ZoneMapTestCase(common.TempFileMixin, TestCase):
+    """Test the use of zone maps in in-kernel queries."""
+
+    nrows = 100
+
+    def setUp(self):
+        super(ZoneMapTestCase, self).setUp()
+        description = {'c_time': tables.Float64Col(pos=0),
+                       'c_int32': tables.Int32Col(pos=1),
+                       'c_bool': tables.BoolCol(pos=2)}
+        # The table ends in the middle of a chunk
+        table = self.h5file.create_table('/', 'test', description,
+                                         chunkshape=7)
+        table.nrowsinbuf = 21
+        self.table = table
+        self.append(self.nrows)
+        table.cols.c_time.create_zonemap()
+        table.cols.c_bool.create_zonemap()
+
+    def append(self, nrows):
+        data = numpy.empty(nrows, dtype=self.table.dtype)
+        start = self.table.nrows
+        # Mostly increasing values
+        data['c_time'] = numpy.arange(start, start + nrows) + (
+            numpy.arange(nrows) % 3)
+        data['c_int32'] = numpy.arange(nrows) % 10
+        data['c_bool'] = numpy.arange(start, start + nrows) > 90
+        self.table.append(data)
+
+    def check(self, condition, condvars=None):
+        data = self.table.read()
+        cvars = dict((name, data[name]) for name in data.dtype.names)
+        cvars.update(condvars or {})
+        if 'isin' in condition:
+            ref = numpy.in1d(data['c_time'], cvars['values'])
+        else:
+            ref = eval(condition, {}, cvars)
+        coords = self.table.get_where_list(condition, condvars)
+        self.assertEqual(list(coords), list(ref.nonzero()[0]))
+
+    def test_conditions(self):
+        self.assertTrue(self.table.cols.c_time.has_zonemap)
+        self.assertFalse(self.table.cols.c_int32.has_zonemap)
+        for condition in ['c_time < 20', '(c_time >= 30) & (c_time < 45)',
+                          '(c_time == 50.5) | (c_time == 51)',
+                          '(c_time > 60) & (c_int32 == 3)',
+                          'c_bool', 'c_time > 1000']:
+            self.check(condition)
+        self.check('isin(c_time, values)', {'values': [3, 55, 80.5]})
+
+    def test_chunkmap(self):
+        plan = self.table.explain_where('(c_time >= 30) & (c_time < 45)',
+                                        analyze=True)
+        self.assertFalse(plan['indexed'])
+        self.assertTrue(plan['chunkmap']['selected'] <
+                        plan['chunkmap']['nchunks'])
+        self.assertEqual(
+            self.table.explain_where('(c_time >= 30) & (c_time < 45)')
+            ['chunkmap'], plan['chunkmap'])
+        self.table.cols.c_time.remove_zonemap()
+        plan = self.table.explain_where('(c_time >= 30) & (c_time < 45)',
+                                        analyze=True)
+        self.assertEqual(plan['chunkmap'], None)
+
+    def test_append(self):
+        self.check('c_time > 95')
+        self.append(30)
+        self.check('c_time > 95')
+        self.check('c_bool')
+
+    def test_modify(self):
+        self.check('c_time < 10')
+        self.table.cols.c_time[50] = 1
+        self.check('c_time < 10')
+        for row in self.table.iterrows(60, 61):
+            row['c_time'] = 2
+            row.update()
+        self.check('c_time < 10')
+
+    def test_truncate(self):
+        self.table.truncate(50)
+        self.check('c_time > 40')
+        self.append(10)
+        self.check('c_time > 40')
+
+    def test_reopen(self):
+        self.check('c_time < 20')
+        self._reopen(mode='a')
+        self.table = self.h5file.root.test
+        self.assertTrue(self.table.cols.c_time.has_zonemap)
+        self.assertTrue(self.table.cols.c_bool.has_zonemap)
+        self.assertFalse(self.table.cols.c_int32.has_zonemap)
+        # The bounds are read from the file instead of being rebuilt
+        self.assertEqual(self.table._chunkfilters['c_time'].nchunks, 15)
+        self.check('c_time < 20')
+        self.append(30)
+        self.check('c_time > 95')
+        self._reopen(mode='a')
+        self.table = self.h5file.root.test
+        self.assertEqual(self.table._chunkfilters['c_time'].nchunks, 19)
+        self.check('c_time > 95')
+        # Modified columns get their saved bounds emptied
+        self.table.cols.c_time[50] = 1
+        self._reopen(mode='a')
+        self.table = self.h5file.root.test
+        self.assertEqual(self.table._chunkfilters['c_time'].nchunks, 0)
+        self.check('c_time < 10')
+        self.table.cols.c_time.remove_zonemap()
+        self._reopen()
+        self.table = self.h5file.root.test
+        self.assertFalse(self.table.cols.c_time.has_zonemap)
+        self.assertTrue(self.table.cols.c_bool.has_zonemap)
+        self.check('c_bool')
+
+    def test_bad_column(self):
+        table = self.h5file.create_table(
+            '/', 'strings', {'c_string': tables.StringCol(4)})
+        self.assertRaises(TypeError, table.cols.c_string.create_zonemap)
+
+
+class BloomFilterTestCase(common.TempFileMixin, TestCase):
+    """Test the use of Bloom filters in in-kernel queries."""
+
+    nrows = 100
+
+    def setUp(self):
+        super(BloomFilterTestCase, self).setUp()
+        description = {'c_string': tables.StringCol(6, pos=0),
+                       'c_int32': tables.Int32Col(pos=1)}
+        # The table ends in the middle of a chunk
+        table = self.h5file.create_table('/', 'test', description,
+                                         chunkshape=7)
+        table.nrowsinbuf = 21
+        self.table = table
+        self.append(self.nrows)
+        table.cols.c_string.create_bloomfilter()
+
+    def append(self, nrows):
+        data = numpy.empty(nrows, dtype=self.table.dtype)
+        start = self.table.nrows
+        # Unsorted values without repetitions
+        data['c_string'] = ['k%d' % (i * 37 % 1009)
+                            for i in range(start, start + nrows)]
+        data['c_int32'] = numpy.arange(nrows) % 10
+        self.table.append(data)
+
+    def check(self, condition, condvars=None):
+        data = self.table.read()
+        cvars = dict((name, data[name]) for name in data.dtype.names)
+        cvars.update(condvars or {})
+        if 'isin' in condition:
+            ref = numpy.in1d(data['c_string'], cvars['values'])
+        else:
+            ref = eval(condition, {}, cvars)
+        coords = self.table.get_where_list(condition, condvars)
+        self.assertEqual(list(coords), list(ref.nonzero()[0]))
+
+    def test_conditions(self):
+        self.assertTrue(self.table.cols.c_string.has_bloomfilter)
+        self.assertFalse(self.table.cols.c_string.has_zonemap)
+        self.assertFalse(self.table.cols.c_int32.has_bloomfilter)
+        for condition in ['c_string == b"k37"', 'c_string == b"k9999"',
+                          '(c_string == b"k74") | (c_string == b"k999")',
+                          '(c_string == b"k111") & (c_int32 == 3)',
+                          'c_string > b"k9"']:
+            self.check(condition)
+        self.check('isin(c_string, values)',
+                   {'values': numpy.array(['k0', 'k370', 'k1'])})
+
+    def test_chunkmap(self):
+        plan = self.table.explain_where('c_string == b"k37"', analyze=True)
+        self.assertFalse(plan['indexed'])
+        self.assertTrue(plan['chunkmap']['selected'] <
+                        plan['chunkmap']['nchunks'])
+        # Other comparisons can not use the filters
+        plan = self.table.explain_where('c_string > b"k9"', analyze=True)
+        self.assertEqual(plan['chunkmap'], None)
+        self.table.cols.c_string.remove_bloomfilter()
+        self.assertFalse(self.table.cols.c_string.has_bloomfilter)
+        plan = self.table.explain_where('c_string == b"k37"', analyze=True)
+        self.assertEqual(plan['chunkmap'], None)
+
+    def test_append(self):
+        self.check('c_string == b"k925"')
+        self.append(30)
+        self.check('c_string == b"k925"')
+
+    def test_modify(self):
+        self.check('c_string == b"new"')
+        self.table.cols.c_string[50] = 'new'
+        self.check('c_string == b"new"')
+        for row in self.table.iterrows(60, 61):
+            row['c_string'] = 'new'
+            row.update()
+        self.check('c_string == b"new"')
+
+    def test_reopen(self):
+        self.check('c_string == b"k925"')
+        self._reopen(mode='a')
+        self.table = self.h5file.root.test
+        self.assertTrue(self.table.cols.c_string.has_bloomfilter)
+        # The filters are read from the file instead of being rebuilt
+        self.assertEqual(self.table._chunkfilters['c_string'].nchunks, 15)
+        self.check('c_string == b"k925"')
+        # Removed rows get the saved filters emptied
+        self.table.remove_rows(10, 20)
+        self._reopen(mode='a')
+        self.table = self.h5file.root.test
+        self.assertEqual(self.table._chunkfilters['c_string'].nchunks, 0)
+        self.check('c_string == b"k925"')
+        self.check('c_string == b"k407"')
+        # So do truncations
+        self.table.truncate(50)
+        self._reopen()
+        self.table = self.h5file.root.test
+        self.assertEqual(self.table._chunkfilters['c_string'].nchunks, 0)
+        self.check('c_string == b"k925"')
+
+    def test_bad_column(self):
+        self.assertRaises(TypeError,
+                          self.table.cols.c_int32.create_bloomfilter)
+
+
+class CompositeIndexTestCase(common.TempFileMixin, TestCase):
+    """Test queries using composite indexes."""
+
+    nrows = 200
+    columns = ('instrument', 'timestamp')
+
+    def setUp(self):
+        super(CompositeIndexTestCase, self).setUp()
+        description = {'instrument': tables.StringCol(4, pos=0),
+                       'timestamp': tables.Float64Col(pos=1),
+                       'price': tables.Int32Col(pos=2)}
+        table = self.h5file.create_table('/', 'test', description,
+                                         chunkshape=5)
+        table.nrowsinbuf = 7
+        self.table = table
+        self.append(self.nrows)
+        self.assertEqual(table.create_composite_index(self.columns),
+                         self.nrows)
+
+    def append(self, nrows):
+        data = numpy.empty(nrows, dtype=self.table.dtype)
+        start = self.table.nrows
+        rows = numpy.arange(start, start + nrows)
+        data['instrument'] = numpy.array(['ES', 'NQ', 'CL', 'GC'])[rows % 4]
+        # Timestamps decrease with the row number, with some negative ones
+        data['timestamp'] = (self.nrows - rows) * 0.5
+        data['price'] = rows % 13 - 6
+        self.table.append(data)
+
+    def check(self, condition, **kwargs):
+        data = self.table.read()
+        cvars = dict((name, data[name]) for name in data.dtype.names)
+        ref = eval(condition, {}, cvars).nonzero()[0]
+        start, stop, step = self.table._process_range_read(
+            kwargs.get('start'), kwargs.get('stop'), kwargs.get('step'))
+        ref = ref[(ref >= start) & (ref < stop) & ((ref - start) % step == 0)]
+        coords = self.table.get_where_list(condition, **kwargs)
+        self.assertEqual(list(coords), list(ref))
+        return coords
+
+    def get_cindex(self):
+        return self.table._get_composite_indexes()[self.columns]
+
+    def test_conditions(self):
+        self.assertEqual(self.table.composite_indexes, [self.columns])
+        for condition in [
+                '(instrument == b"NQ") & (timestamp >= 20) & (timestamp < 60)',
+                '(instrument == b"CL") & (timestamp > 80.5)',
+                '(instrument == b"GC") & (timestamp <= -2)',
+                'instrument == b"ES"',
+                'instrument >= b"GC"',
+                '(instrument == b"NQ") & (price > 0) & (timestamp < 70)',
+                '(instrument == b"XX") & (timestamp < 70)',
+                '(instrument == b"NQ") & (timestamp == 20.5)',
+                '(instrument == b"NQ") & (timestamp > 30) & (timestamp < 10)']:
+            self.check(condition)
+            self.check(condition, start=10, stop=150, step=3)
+
+    def test_usage(self):
+        table = self.table
+        condition = ('(instrument == b"NQ") & (timestamp >= 20) & '
+                     '(timestamp < 60)')
+        self.assertEqual(table.will_query_use_indexing(condition),
+                         frozenset(self.columns))
+        self.assertEqual(table.will_query_use_indexing('instrument == b"ES"'),
+                         frozenset(['instrument']))
+        # The leading column must take part in conjunctions
+        for condition in ['timestamp > 10',
+                          '(instrument == b"ES") | (timestamp > 10)']:
+            self.assertEqual(table.will_query_use_indexing(condition),
+                             frozenset())
+            self.check(condition)
+
+    def test_plan(self):
+        condition = ('(instrument == b"NQ") & (timestamp >= 20) & '
+                     '(timestamp < 60)')
+        plan = self.table.explain_where(condition)
+        self.assertTrue(plan['indexed'])
+        self.assertEqual(plan['composite_index'],
+                         {'columns': self.columns, 'candidates': 20})
+        self.assertEqual(plan['nrows'], None)
+        plan = self.table.explain_where(condition, analyze=True)
+        self.assertEqual(plan['nrows'], 20)
+        # Only the rows fulfilling the condition are read
+        self.assertEqual(plan['composite_index']['candidates'], 20)
+        self.table.remove_composite_index(self.columns)
+        self.assertEqual(self.table.composite_indexes, [])
+        plan = self.table.explain_where(condition)
+        self.assertEqual(plan['composite_index'], None)
+        self.check(condition)
+
+    def test_signed_leading_column(self):
+        self.table.create_composite_index(['price', 'timestamp'])
+        for condition in ['(price == -3) & (timestamp > 50)',
+                          '(price >= -2) & (price <= 1)',
+                          'price < 0', '(price == 4) & (timestamp < -1)']:
+            self.assertTrue(self.table.will_query_use_indexing(condition))
+            self.check(condition)
+
+    def test_append(self):
+        condition = '(instrument == b"ES") & (timestamp < 5)'
+        self.table.autoindex = False
+        self.append(30)
+        self.table.flush()
+        self.assertEqual(self.get_cindex().nelements, self.nrows)
+        # The rows not in the index are scanned
+        self.assertTrue(len(self.check(condition)) > 0)
+        self.table.flush_rows_to_index()
+        self.assertEqual(self.get_cindex().nelements, self.nrows + 30)
+        self.check(condition)
+        self.table.autoindex = True
+        self.append(10)
+        self.table.flush()
+        self.assertEqual(self.get_cindex().nelements, self.nrows + 40)
+        self.check(condition)
+
+    def test_append_buffers(self):
+        condition = '(instrument == b"NQ") & (timestamp < 0)'
+        # Appending several I/O buffers does not update the index...
+        self.append(30)
+        self.assertEqual(self.get_cindex().nelements, self.nrows)
+        self.check(condition)
+        # ...but flushing the table does
+        self.table.flush()
+        self.assertEqual(self.get_cindex().nelements, self.nrows + 30)
+        self.assertEqual(self.get_cindex().runs,
+                         [0, self.nrows, self.nrows + 30])
+        self.check(condition)
+
+    def test_runs(self):
+        conditions = [
+            '(instrument == b"NQ") & (timestamp >= 20) & (timestamp < 60)',
+            '(instrument == b"GC") & (timestamp <= -2)',
+            'instrument >= b"GC"']
+        cindex = self.get_cindex()
+        # Sort and merge the keys of 16 rows at a time
+        self.h5file.params['INDEX_SORT_MEMORY'] = 16 * (cindex.keysize + 8)
+        self.table.reindex()
+        self.assertEqual(cindex.runs, [0, self.nrows])
+        for condition in conditions:
+            self.check(condition)
+        for nrows in [10, 3, 5, 40, 2, 1, 70]:
+            self.append(nrows)
+            self.table.flush()
+            runs = cindex.runs
+            self.assertEqual(runs[-1], self.table.nrows)
+            # Every run is longer than the following ones together
+            for i in range(1, len(runs) - 1):
+                self.assertTrue(runs[i] - runs[i - 1] > runs[-1] - runs[i],
+                                runs)
+            # Keys are sorted within every run
+            keys = cindex.sorted[:]
+            for start, stop in zip(runs[:-1], runs[1:]):
+                self.assertTrue((keys[start:stop - 1] <=
+                                 keys[start + 1:stop]).all())
+            self.assertEqual(sorted(cindex.indices[:]),
+                             list(range(self.table.nrows)))
+            for condition in conditions:
+                self.check(condition)
+        self._reopen()
+        self.table = self.h5file.root.test
+        self.assertEqual(self.get_cindex().runs, runs)
+        for condition in conditions:
+            self.check(condition)
+
+    def test_modify(self):
+        condition = '(instrument == b"CL") & (timestamp >= 90)'
+        self.table.cols.timestamp[10] = 95.5
+        self.assertFalse(self.get_cindex().dirty)
+        self.check(condition)
+        self.table.autoindex = False
+        self.table.cols.instrument[:4] = ['CL'] * 4
+        self.assertTrue(self.get_cindex().dirty)
+        self.assertEqual(self.table.will_query_use_indexing(condition),
+                         frozenset())
+        self.check(condition)
+        self.table.reindex_dirty()
+        self.assertFalse(self.get_cindex().dirty)
+        self.check(condition)
+        for row in self.table.iterrows(20, 22):
+            row['instrument'] = 'CL'
+            row.update()
+        self.assertTrue(self.get_cindex().dirty)
+        self.table.reindex()
+        self.check(condition)
+
+    def test_remove_rows(self):
+        condition = '(instrument == b"GC") & (timestamp < 40)'
+        self.table.remove_rows(10, 50)
+        self.assertEqual(self.get_cindex().nelements, self.nrows - 40)
+        self.check(condition)
+
+    def test_reopen(self):
+        condition = '(instrument == b"NQ") & (timestamp > 75)'
+        self._reopen()
+        self.table = self.h5file.root.test
+        self.assertEqual(self.table.composite_indexes, [self.columns])
+        self.assertEqual(self.table.will_query_use_indexing(condition),
+                         frozenset(self.columns))
+        self.check(condition)
+
+    def test_copy(self):
+        newtable = self.table.copy('/', 'test2', propindexes=True)
+        self.assertEqual(newtable.composite_indexes, [self.columns])
+        self.table = newtable
+        self.check('(instrument == b"CL") & (timestamp < 30)')
+
+    def test_errors(self):
+        table = self.table
+        self.assertRaises(ValueError, table.create_composite_index,
+                          self.columns)
+        self.assertRaises(ValueError, table.create_composite_index,
+                          ['price'])
+        self.assertRaises(ValueError, table.create_composite_index,
+                          ['price', 'price'])
+        self.assertRaises(KeyError, table.create_composite_index,
+                          ['price', 'missing'])
+        # Removing a missing index does nothing
+        table.remove_composite_index(['price', 'timestamp'])
+        self.assertEqual(table.composite_indexes, [self.columns])
+
+
 # Main part
 # ---------
 def suite():
@@ -1264,6 +2465,29 @@ def suite():
         testSuite.addTest(unittest.makeSuite(IndexedTableUsage30))
         testSuite.addTest(unittest.makeSuite(IndexedTableUsage31))
         testSuite.addTest(unittest.makeSuite(IndexedTableUsage32))
+        testSuite.addTest(unittest.makeSuite(ThreadedQueryTestCase))
+        testSuite.addTest(unittest.makeSuite(SmallBufferIndexedQueryTestCase))
+        testSuite.addTest(unittest.makeSuite(AggregateQueryTestCase))
+        testSuite.addTest(unittest.makeSuite(IndexedAggregateQueryTestCase))
+        testSuite.addTest(unittest.makeSuite(ExplainQueryTestCase))
+        testSuite.addTest(unittest.makeSuite(MultiWhereTestCase))
+        testSuite.addTest(unittest.makeSuite(IndexedMultiWhereTestCase))
+        testSuite.addTest(unittest.makeSuite(AppendCacheTestCase))
+        testSuite.addTest(unittest.makeSuite(TopKQueryTestCase))
+        testSuite.addTest(unittest.makeSuite(CSITopKQueryTestCase))
+        testSuite.addTest(unittest.makeSuite(LightTopKQueryTestCase))
+        testSuite.addTest(unittest.makeSuite(MembershipTestCase))
+        testSuite.addTest(unittest.makeSuite(IndexedMembershipTestCase))
+        testSuite.addTest(unittest.makeSuite(LightMembershipTestCase))
+        testSuite.addTest(unittest.makeSuite(JoinTestCase))
+        testSuite.addTest(unittest.makeSuite(IndexedJoinTestCase))
+        testSuite.addTest(unittest.makeSuite(MergeJoinTestCase))
+        testSuite.addTest(unittest.makeSuite(GroupByTestCase))
+        testSuite.addTest(unittest.makeSuite(IndexedGroupByTestCase))
+        testSuite.addTest(unittest.makeSuite(CSIGroupByTestCase))
+        testSuite.addTest(unittest.makeSuite(ZoneMapTestCase))
+        testSuite.addTest(unittest.makeSuite(BloomFilterTestCase))
+        testSuite.addTest(unittest.makeSuite(CompositeIndexTestCase))
 
     return testSuite
 
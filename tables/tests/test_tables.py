@@ -5368,6 +5368,46 @@ class WhereAppendTestCase(common.TempFileMixin, TestCase):
             if os.path.exists(h5fname2):
                 os.remove(h5fname2)
 
+    def test06_buffers(self):
+        """Appending the matching rows of several buffers."""
+
+        tbl1 = self.h5file.root.test
+        data = np.zeros(100, dtype=tbl1.dtype)
+        data['id'] = np.arange(3, 103)
+        data['v1'] = np.arange(100) * 0.5
+        tbl1.append(data)
+        tbl1.nrowsinbuf = 7  # force several I/O buffers
+        tbl2 = self.h5file.create_table('/', 'test2', self.SrcTblDesc)
+
+        # Rows pending to be appended go before the copied ones
+        tbl2.row['id'] = -1
+        tbl2.row.append()
+        # Even rows hold odd ids (but for the first one)
+        self.assertEqual(tbl1.append_where(tbl2, '(id > 1) & (id % 2 == 1)',
+                                           step=2), 50)
+        result = tbl2.read()
+        self.assertEqual(result['id'][0], -1)
+        self.assertEqual(list(result['id'][1:]), list(range(3, 102, 2)))
+        self.assertEqual(list(result['v1'][1:]), list(data['v1'][::2]))
+
+    def test07_indexed(self):
+        """Appending rows located with an index to a compatible table."""
+
+        class DstTblDesc(tables.IsDescription):
+            v0 = IntCol(dflt=7)  # extra column
+            id = FloatCol()  # float, not int
+            v1 = FloatCol()
+            v2 = StringCol(itemsize=8)
+
+        tbl1 = self.h5file.root.test
+        tbl1.cols.id.create_index()
+        tbl2 = self.h5file.create_table('/', 'test2', DstTblDesc)
+        self.assertEqual(tbl1.append_where(tbl2, 'id == 2'), 1)
+        result = tbl2.read()
+        self.assertEqual(result['v0'].tolist(), [7])
+        self.assertEqual(result['id'].tolist(), [2.0])
+        self.assertEqual(result['v2'].tolist(), [b'b' * 6])
+
 
 class DerivedTableTestCase(common.TempFileMixin, TestCase):
     def setUp(self):
@@ -6071,6 +6111,404 @@ class ColumnIterationTestCase(common.TempFileMixin, TestCase):
         self.iterate(array, table)
 
 
+class ProjectedReadTestCase(common.TempFileMixin, TestCase):
+    """Checking reads of just some of the columns of a table."""
+
+    nrows = 100
+
+    def setUp(self):
+        super(ProjectedReadTestCase, self).setUp()
+        dtype = np.dtype([('c1', 'i4'), ('c2', 'f8'), ('c3', 'S4'),
+                          ('pos', [('x', 'i2'), ('y', 'i2')])])
+        self.array = np.empty((self.nrows, ), dtype)
+        self.array['c1'] = np.arange(self.nrows)
+        self.array['c2'] = np.arange(self.nrows) * 0.5
+        self.array['c3'] = b'abcd'
+        self.array['pos']['x'] = np.arange(self.nrows)
+        self.array['pos']['y'] = -np.arange(self.nrows)
+        self.table = self.h5file.create_table('/', 'table', dtype)
+        self.table.append(self.array)
+        self.table.nrowsinbuf = 7  # force several I/O buffers
+
+    def test_read_fields(self):
+        result = self.table.read(fields=['c3', 'c1'])
+        self.assertEqual(result.dtype.names, ('c1', 'c3'))
+        self.assertTrue(areArraysEqual(result['c1'], self.array['c1']))
+        self.assertTrue(areArraysEqual(result['c3'], self.array['c3']))
+
+    def test_read_fields_step(self):
+        result = self.table.read(3, 90, 4, fields=['c2'])
+        self.assertEqual(result.dtype.names, ('c2',))
+        self.assertTrue(areArraysEqual(result['c2'],
+                                       self.array['c2'][3:90:4]))
+
+    def test_read_nested_fields(self):
+        result = self.table.read(fields=['pos/y'])
+        self.assertEqual(result.dtype.names, ('pos',))
+        self.assertTrue(areArraysEqual(result['pos'],
+                                       self.array['pos']))
+
+    def test_read_field(self):
+        self.assertTrue(areArraysEqual(
+            self.table.read(field='pos/x'), self.array['pos']['x']))
+        self.assertTrue(areArraysEqual(
+            self.table.cols.c2[10:20], self.array['c2'][10:20]))
+        self.assertEqual(list(self.table.cols.c1), list(self.array['c1']))
+
+    def test_read_field_and_fields(self):
+        self.assertRaises(ValueError, self.table.read,
+                          field='c1', fields=['c2'])
+
+    def test_read_unknown_fields(self):
+        self.assertRaises(KeyError, self.table.read, fields=['c4'])
+
+    def test_iterrows_fields(self):
+        result = [(row['c1'], row['pos/x'])
+                  for row in self.table.iterrows(fields=['c1', 'pos'])]
+        self.assertEqual(result, [(i, i) for i in range(self.nrows)])
+
+    def test_iterrows_fields_update(self):
+        def update():
+            for row in self.table.iterrows(fields=['c1']):
+                row['c1'] = 0
+                row.update()
+        self.assertRaises(NotImplementedError, update)
+
+    def test_where_fields(self):
+        result = [row['c3'] for row in self.table.where('c1 > 89',
+                                                        fields=['c3'])]
+        self.assertEqual(result, [b'abcd'] * 10)
+        result = [row['c1'] for row in self.table.where('c1 < 5',
+                                                        fields=['c3'])]
+        self.assertEqual(result, list(range(5)))
+
+    def test_read_where_fields(self):
+        result = self.table.read_where('c2 >= 45', fields=['c3'])
+        self.assertEqual(result.dtype.names, ('c3',))
+        self.assertEqual(len(result), 10)
+        result = self.table.read_where('(c1 % 3) == 0', fields=['c2'])
+        self.assertTrue(areArraysEqual(result['c2'],
+                                       self.array['c2'][::3]))
+
+
+class PrefetchTestCase(common.TempFileMixin, TestCase):
+    """Checking iterators reading ahead in the background."""
+
+    open_kwargs = dict(io_prefetch=True)
+    nrows = 100
+
+    def setUp(self):
+        super(PrefetchTestCase, self).setUp()
+        dtype = np.dtype([('c1', 'i4'), ('c2', 'f8'), ('c3', 'i2', (2,))])
+        self.array = np.empty((self.nrows, ), dtype)
+        self.array['c1'] = np.arange(self.nrows)
+        self.array['c2'] = np.arange(self.nrows) * 0.5
+        self.array['c3'][:, 0] = np.arange(self.nrows)
+        self.array['c3'][:, 1] = -np.arange(self.nrows)
+        self.table = self.h5file.create_table('/', 'table', dtype)
+        self.table.append(self.array)
+        self.table.nrowsinbuf = 7  # force several I/O buffers
+
+    def test_iterrows(self):
+        for (start, stop, step) in [(None, None, None), (3, 95, 2),
+                                    (10, 11, 1), (90, None, 20)]:
+            result = [row['c2'] for row in self.table.iterrows(start, stop,
+                                                               step)]
+            self.assertEqual(result,
+                             list(self.array['c2'][start:stop:step]))
+
+    def test_iterrows_fields(self):
+        result = [row['c1'] for row in self.table.iterrows(fields=['c1'])]
+        self.assertEqual(result, list(range(self.nrows)))
+
+    def test_iterrows_no_prefetch(self):
+        result = [row['c1'] for row in self.table.iterrows(prefetch=False)]
+        self.assertEqual(result, list(range(self.nrows)))
+
+    def test_iterrows_break(self):
+        for row in self.table.iterrows():
+            if row['c1'] == 10:
+                break
+        result = [row['c1'] for row in self.table.iterrows(30)]
+        self.assertEqual(result, list(range(30, self.nrows)))
+
+    def test_where(self):
+        result = [row['c2'] for row in self.table.where('c1 % 3 == 0')]
+        self.assertEqual(result, list(self.array['c2'][::3]))
+        result = [row['c1'] for row in self.table.where('c1 > 20',
+                                                        step=3)]
+        self.assertEqual(result, list(range(21, self.nrows, 3)))
+
+    def test_update(self):
+        for row in self.table.iterrows():
+            row['c1'] = -row['c1']
+            row.update()
+        self.assertTrue(areArraysEqual(self.table.cols.c1[:],
+                                       -self.array['c1']))
+
+    def test_column_iter(self):
+        self.h5file.params['IO_BUFFER_SIZE'] = 64  # several I/O buffers
+        self.assertEqual(list(self.table.cols.c2), list(self.array['c2']))
+        # Items are views into the I/O buffers, so check them one by one
+        for nrow, item in enumerate(self.table.cols.c3):
+            self.assertTrue(areArraysEqual(item, self.array['c3'][nrow]))
+
+    def test_column_iter_break(self):
+        self.h5file.params['IO_BUFFER_SIZE'] = 64
+        for item in self.table.cols.c1:
+            if item == 10:
+                break
+        self.assertFalse(self.table._prefetchers)
+        self.assertEqual(list(self.table.cols.c1), list(range(self.nrows)))
+
+    def test_close_pending(self):
+        for row in self.table.iterrows():
+            if row['c1'] == 10:
+                break
+        self.assertTrue(self.table._prefetchers)
+        self._reopen()
+        self.table = self.h5file.root.table
+        self.assertEqual(self.table.cols.c1[:].tolist(),
+                         list(range(self.nrows)))
+
+
+class BatchIterationTestCase(common.TempFileMixin, TestCase):
+    """Checking iterations over batches of rows."""
+
+    nrows = 100
+
+    def setUp(self):
+        super(BatchIterationTestCase, self).setUp()
+        dtype = np.dtype([('c1', 'i4'), ('c2', 'f8'),
+                          ('pos', [('x', 'i2'), ('y', 'i2')])])
+        self.array = np.empty((self.nrows, ), dtype)
+        self.array['c1'] = np.arange(self.nrows)
+        self.array['c2'] = np.arange(self.nrows) * 0.5
+        self.array['pos']['x'] = np.arange(self.nrows)
+        self.array['pos']['y'] = -np.arange(self.nrows)
+        # Indexed queries need whole chunks in the I/O buffers
+        self.table = self.h5file.create_table('/', 'table', dtype,
+                                              chunkshape=5)
+        self.table.append(self.array)
+        self.table.nrowsinbuf = 7  # force several I/O buffers
+
+    def check_batches(self, batches, ref, batch_size):
+        for batch in batches[:-1]:
+            self.assertEqual(len(batch), batch_size)
+        self.assertTrue(0 < len(batches[-1]) <= batch_size)
+        result = np.concatenate(batches)
+        self.assertEqual(result.dtype, ref.dtype)
+        self.assertTrue(areArraysEqual(result, ref))
+
+    def test_range(self):
+        batches = list(self.table.iter_batches())
+        self.check_batches(batches, self.array, self.table.nrowsinbuf)
+        for (start, stop, step) in [(3, 95, 2), (10, 11, 1), (90, None, 20)]:
+            batches = list(self.table.iter_batches(10, start=start,
+                                                   stop=stop, step=step))
+            self.check_batches(batches, self.array[start:stop:step], 10)
+
+    def test_fields(self):
+        batches = list(self.table.iter_batches(25, fields=['c2', 'pos/y']))
+        self.check_batches(batches,
+                           self.table.read(fields=['c2', 'pos/y']), 25)
+
+    def test_condition(self):
+        batches = list(self.table.iter_batches(4, condition='c1 % 3 == 0'))
+        self.check_batches(batches, self.array[::3], 4)
+        batches = list(self.table.iter_batches(
+            condition='c1 > limit', condvars={'limit': 20}, fields=['c2'],
+            start=10, step=3))
+        ref = self.table.read(10, None, 3, fields=['c2'])
+        self.check_batches(batches, ref[ref['c2'] > 10], 7)
+
+    def test_condition_empty(self):
+        self.assertEqual(list(self.table.iter_batches(condition='c1 < 0')),
+                         [])
+        self.assertEqual(list(self.table.iter_batches(start=50, stop=50)),
+                         [])
+
+    def test_indexed_condition(self):
+        self.table.cols.c1.create_index()
+        for i in range(2):  # the second time from the sequence cache
+            batches = list(self.table.iter_batches(
+                3, condition='(c1 >= 10) & (c1 < 30)', fields=['c1']))
+            self.check_batches(batches,
+                               self.table.read(10, 30, fields=['c1']), 3)
+
+    def test_as_dict(self):
+        for batch in self.table.iter_batches(30, condition='c1 >= 50',
+                                             fields=['c1'], as_dict=True):
+            self.assertEqual(list(batch.keys()), ['c1'])
+            self.assertTrue((batch['c1'] >= 50).all())
+
+    def test_bad_batch_size(self):
+        self.assertRaises(ValueError, self.table.iter_batches, 0)
+
+
+class RemoveCoordinatesTestCase(common.TempFileMixin, TestCase):
+    """Checking removals of rows by coordinates or conditions."""
+
+    nrows = 100
+
+    def setUp(self):
+        super(RemoveCoordinatesTestCase, self).setUp()
+        dtype = np.dtype([('c1', 'i4'), ('c2', 'f8')])
+        self.array = np.empty((self.nrows, ), dtype)
+        self.array['c1'] = np.arange(self.nrows)
+        self.array['c2'] = np.arange(self.nrows) * 0.5
+        self.table = self.h5file.create_table('/', 'table', dtype)
+        self.table.append(self.array)
+        self.table.nrowsinbuf = 7  # force several I/O buffers
+
+    def check(self, removed):
+        ref = np.delete(self.array, removed)
+        self.assertEqual(self.table.nrows, len(ref))
+        self.assertTrue(areArraysEqual(self.table.read(), ref))
+
+    def test_coords(self):
+        coords = [3, 99, 10, 11, 12, 50, 10]
+        self.assertEqual(self.table.remove_rows(coords=coords), 6)
+        self.check(sorted(set(coords)))
+
+    def test_mask(self):
+        mask = self.array['c1'] % 4 == 1
+        self.assertEqual(self.table.remove_rows(coords=mask), 25)
+        self.check(mask.nonzero()[0])
+
+    def test_empty_coords(self):
+        self.assertEqual(self.table.remove_rows(coords=[]), 0)
+        self.check([])
+
+    def test_bad_coords(self):
+        self.assertRaises(IndexError, self.table.remove_rows,
+                          coords=[self.nrows])
+        self.assertRaises(ValueError, self.table.remove_rows, 10,
+                          coords=[1])
+
+    def test_step(self):
+        self.assertEqual(self.table.remove_rows(5, 90, 3), 29)
+        self.check(np.arange(5, 90, 3))
+
+    def test_remove_where(self):
+        self.assertEqual(self.table.remove_where('(c1 % 3 == 0) | (c2 > 45)'),
+                         40)
+        self.check(((self.array['c1'] % 3 == 0) |
+                    (self.array['c2'] > 45)).nonzero()[0])
+
+    def test_remove_where_range(self):
+        self.assertEqual(self.table.remove_where('c1 > 20', stop=30), 9)
+        self.check(np.arange(21, 30))
+
+    def test_remove_all(self):
+        self.assertEqual(self.table.remove_where('c1 >= 0'), self.nrows)
+        self.assertEqual(self.table.nrows, 0)
+        self.table.append(self.array[:10])
+        self.assertTrue(areArraysEqual(self.table.read(), self.array[:10]))
+
+    def test_indexed(self):
+        self.table.cols.c1.create_index()
+        self.assertEqual(self.table.remove_where('c1 < 50'), 50)
+        self.check(np.arange(50))
+        self.assertFalse(self.table.cols.c1.index.dirty)
+        result = self.table.read_where('(c1 >= 60) & (c1 < 70)')
+        self.assertTrue(areArraysEqual(result, self.array[60:70]))
+
+    def test_indexed_small_chunks(self):
+        table = self.h5file.create_table('/', 'table2', self.array.dtype,
+                                         chunkshape=(5,))
+        table.append(self.array)
+        table.nrowsinbuf = 7
+        table.cols.c1.create_index()
+        self.table = table
+        condition = '(c1 < 20) | (c1 > 80)'
+        self.assertTrue(table.will_query_use_indexing(condition))
+        self.assertEqual(table.remove_where(condition), 39)
+        self.check(((self.array['c1'] < 20) |
+                    (self.array['c1'] > 80)).nonzero()[0])
+        result = table.read_where('(c1 >= 60) & (c1 < 70)')
+        self.assertTrue(areArraysEqual(result, self.array[60:70]))
+
+
+class ModifyWhereTestCase(common.TempFileMixin, TestCase):
+    """Checking modifications of the rows fulfilling a condition."""
+
+    nrows = 100
+
+    def setUp(self):
+        super(ModifyWhereTestCase, self).setUp()
+        dtype = np.dtype([('c1', 'i4'), ('c2', 'f8'), ('c3', 'S4'),
+                          ('pos', [('x', 'i2'), ('y', 'i2')])])
+        self.array = np.zeros((self.nrows, ), dtype)
+        self.array['c1'] = np.arange(self.nrows)
+        self.array['c2'] = np.arange(self.nrows) * 0.5
+        self.array['c3'] = b'abcd'
+        self.array['pos']['x'] = np.arange(self.nrows)
+        # Indexed queries need whole chunks in the I/O buffers
+        self.table = self.h5file.create_table('/', 'table', dtype,
+                                              chunkshape=5)
+        self.table.append(self.array)
+        self.table.nrowsinbuf = 7  # force several I/O buffers
+
+    def test_expression(self):
+        count = self.table.modify_where('c1 % 3 == 0',
+                                        {'c2': 'c2 * 2 + c1', 'c1': -1})
+        self.assertEqual(count, 34)
+        mask = self.array['c1'] % 3 == 0
+        self.array['c2'][mask] = (self.array['c2'][mask] * 2 +
+                                  self.array['c1'][mask])
+        self.array['c1'][mask] = -1
+        self.assertTrue(areArraysEqual(self.table.read(), self.array))
+
+    def test_constants(self):
+        limit = 90
+        count = self.table.modify_where('c1 >= limit',
+                                        {'c3': b'zz', 'pos/y': 'pos_x * 2'},
+                                        {'limit': limit,
+                                         'pos_x': self.table.cols.pos.x})
+        self.assertEqual(count, 10)
+        self.array['c3'][90:] = b'zz'
+        self.array['pos']['y'][90:] = self.array['pos']['x'][90:] * 2
+        self.assertTrue(areArraysEqual(self.table.read(), self.array))
+
+    def test_range(self):
+        count = self.table.modify_where('c1 > 10', {'c2': 0}, start=5,
+                                        stop=50, step=4)
+        self.assertEqual(count, 10)
+        self.array['c2'][13:50:4] = 0
+        self.assertTrue(areArraysEqual(self.table.read(), self.array))
+
+    def test_no_match(self):
+        self.assertEqual(self.table.modify_where('c1 < 0', {'c2': 1}), 0)
+        self.assertTrue(areArraysEqual(self.table.read(), self.array))
+
+    def test_bad_column(self):
+        self.assertRaises(KeyError, self.table.modify_where, 'c1 < 0',
+                          {'c4': 1})
+        self.assertRaises(KeyError, self.table.modify_where, 'c1 < 0',
+                          {'pos': 1})
+
+    def test_indexes(self):
+        self.table.autoindex = False
+        self.table.cols.c1.create_index()
+        self.table.cols.c2.create_index()
+        for i in range(2):
+            self.table.modify_where('(c1 >= 20) & (c1 < 30)',
+                                    {'c1': 'c1', 'c2': 'c2 + 1'})
+        # Only the index of c2 keeps the modified rows in its delta
+        self.assertFalse(self.table.cols.c1.index.dirty)
+        self.assertEqual(self.table.cols.c1.index.ndelta, 0)
+        self.assertFalse(self.table.cols.c2.index.dirty)
+        self.assertEqual(self.table.cols.c2.index.ndelta, 10)
+        self.array['c2'][20:30] += 2
+        self.assertTrue(areArraysEqual(self.table.read(), self.array))
+        condition = 'c2 > %r' % self.array['c2'][25]
+        self.assertTrue(self.table.will_query_use_indexing(condition))
+        self.assertEqual(self.table.get_where_list(condition).tolist(),
+                         np.where(self.array['c2'] >
+                                  self.array['c2'][25])[0].tolist())
+
+
 class TestCreateTableArgs(common.TempFileMixin, TestCase):
     obj = np.array(
         [('aaaa', 1, 2.1), ('bbbb', 2, 3.2)],
@@ -6314,6 +6752,11 @@ def suite():
         theSuite.addTest(unittest.makeSuite(RowContainsTestCase))
         theSuite.addTest(unittest.makeSuite(AccessClosedTestCase))
         theSuite.addTest(unittest.makeSuite(ColumnIterationTestCase))
+        theSuite.addTest(unittest.makeSuite(ProjectedReadTestCase))
+        theSuite.addTest(unittest.makeSuite(PrefetchTestCase))
+        theSuite.addTest(unittest.makeSuite(BatchIterationTestCase))
+        theSuite.addTest(unittest.makeSuite(RemoveCoordinatesTestCase))
+        theSuite.addTest(unittest.makeSuite(ModifyWhereTestCase))
         theSuite.addTest(unittest.makeSuite(TestCreateTableArgs))
 
     if common.heavy:
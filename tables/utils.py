@@ -17,6 +17,7 @@ import os
 import sys
 import warnings
 import subprocess
+import threading
 from time import time
 
 import numpy
@@ -36,6 +37,18 @@ byteorders = {
 # lengths, row numbers, shapes, chunk shapes, byte counts...
 SizeType = numpy.int64
 
+# HDF5 is not thread-safe, so the calls into it made from background
+# threads (e.g. by prefetching iterators or `tables.aio`) must not overlap.
+hdf5_lock = threading.RLock()
+
+# Neither is Numexpr, so compiled conditions must not be evaluated in
+# several threads at the same time.  Its own lock is used if available,
+# so that calls to ``numexpr.evaluate()`` do not overlap with them either.
+try:
+    from numexpr.necompiler import evaluate_lock as numexpr_lock
+except ImportError:
+    numexpr_lock = threading.Lock()
+
 
 def correct_byteorder(ptype, byteorder):
     """Fix the byteorder depending on the PyTables types."""